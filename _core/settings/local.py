@@ -9,6 +9,20 @@ from .base import *  # noqa: F403
 load_dotenv()
 
 
+from _core.settings.settings_tweaks.ai_config import (
+    RECIPE_CONVERSATION_SUMMARY_CONFIG,
+    RECIPE_GENERATION_JOBS_CONFIG,
+    RECIPE_HISTORY_WINDOW_CONFIG,
+    RECIPE_LLM_ACCOUNTING_CONFIG,
+    RECIPE_LLM_BACKEND_CONFIG,
+    RECIPE_LLM_RATE_LIMIT_CONFIG,
+    RECIPE_LLM_RESILIENCE_CONFIG,
+    RECIPE_MODEL_ROUTING_CONFIG,
+    RECIPE_PANTRY_CONFIG,
+    RECIPE_RESPONSE_CACHE_CONFIG,
+    RECIPE_SEARCH_CONFIG,
+    RECIPE_SINGLE_FLIGHT_CONFIG,
+)
 from _core.settings.settings_tweaks.app_config import (
     CUSTOM_APP,
     DJANGO_BUILT_IN_APP,
@@ -82,6 +96,26 @@ CACHES = LOCAL_CACHE_CONFIG
 REST_FRAMEWORK = LOCAL_REST_FRAMEWORK_SETTINGS
 SIMPLE_JWT = LOCAL_SIMPLE_JWT_SETTINGG
 JAZZMIN_SETTINGS = JAZZMIN_DISPAY_SETTING
+RECIPE_RESPONSE_CACHE = RECIPE_RESPONSE_CACHE_CONFIG
+RECIPE_HISTORY_WINDOW = RECIPE_HISTORY_WINDOW_CONFIG
+RECIPE_CONVERSATION_SUMMARY = RECIPE_CONVERSATION_SUMMARY_CONFIG
+RECIPE_MODEL_ROUTING = RECIPE_MODEL_ROUTING_CONFIG
+RECIPE_LLM_RESILIENCE = RECIPE_LLM_RESILIENCE_CONFIG
+RECIPE_LLM_RATE_LIMIT = RECIPE_LLM_RATE_LIMIT_CONFIG
+RECIPE_LLM_ACCOUNTING = RECIPE_LLM_ACCOUNTING_CONFIG
+RECIPE_SINGLE_FLIGHT = RECIPE_SINGLE_FLIGHT_CONFIG
+RECIPE_SEARCH = RECIPE_SEARCH_CONFIG
+RECIPE_PANTRY = RECIPE_PANTRY_CONFIG
+# RECIPE_LLM_AGENT_CLASS=app.features.chat.fake_llm.FakeRecipeAgent serves the chat without OpenAI
+RECIPE_LLM_BACKEND = {
+    **RECIPE_LLM_BACKEND_CONFIG,
+    "AGENT_CLASS": os.getenv("RECIPE_LLM_AGENT_CLASS", RECIPE_LLM_BACKEND_CONFIG["AGENT_CLASS"]),
+    "FAKE_LATENCY": float(os.getenv("RECIPE_LLM_FAKE_LATENCY", RECIPE_LLM_BACKEND_CONFIG["FAKE_LATENCY"])),
+}
+RECIPE_GENERATION_JOBS = {
+    **RECIPE_GENERATION_JOBS_CONFIG,
+    "CALLBACK_SECRET": os.getenv("RECIPE_JOB_CALLBACK_SECRET", ""),
+}
 
 
 # Set label and color for current environment:
@@ -4,6 +4,11 @@ import os
 
 from dotenv import load_dotenv
 
+from _core.settings.settings_tweaks.ai_config import (
+    RECIPE_CONVERSATION_SUMMARY_CONFIG, RECIPE_GENERATION_JOBS_CONFIG, RECIPE_HISTORY_WINDOW_CONFIG,
+    RECIPE_LLM_ACCOUNTING_CONFIG, RECIPE_LLM_BACKEND_CONFIG, RECIPE_LLM_RATE_LIMIT_CONFIG,
+    RECIPE_LLM_RESILIENCE_CONFIG, RECIPE_MODEL_ROUTING_CONFIG, RECIPE_PANTRY_CONFIG,
+    RECIPE_RESPONSE_CACHE_CONFIG, RECIPE_SEARCH_CONFIG, RECIPE_SINGLE_FLIGHT_CONFIG)
 from _core.settings.settings_tweaks.app_config import (CUSTOM_APP,
                                                        DJANGO_BUILT_IN_APP,
                                                        PRIORITY_APP,
@@ -31,6 +36,26 @@ CORS_ALLOW_CREDENTIALS = True
 
 WSGI_APPLICATION = '_core.wsgi.application'
 REST_FRAMEWORK = LOCAL_REST_FRAMEWORK_SETTINGS
+RECIPE_RESPONSE_CACHE = RECIPE_RESPONSE_CACHE_CONFIG
+RECIPE_HISTORY_WINDOW = RECIPE_HISTORY_WINDOW_CONFIG
+RECIPE_CONVERSATION_SUMMARY = RECIPE_CONVERSATION_SUMMARY_CONFIG
+RECIPE_MODEL_ROUTING = RECIPE_MODEL_ROUTING_CONFIG
+RECIPE_LLM_RESILIENCE = RECIPE_LLM_RESILIENCE_CONFIG
+RECIPE_LLM_RATE_LIMIT = RECIPE_LLM_RATE_LIMIT_CONFIG
+RECIPE_LLM_ACCOUNTING = RECIPE_LLM_ACCOUNTING_CONFIG
+RECIPE_SINGLE_FLIGHT = RECIPE_SINGLE_FLIGHT_CONFIG
+RECIPE_SEARCH = RECIPE_SEARCH_CONFIG
+RECIPE_PANTRY = RECIPE_PANTRY_CONFIG
+# RECIPE_LLM_AGENT_CLASS=app.features.chat.fake_llm.FakeRecipeAgent load-tests the deployment without OpenAI
+RECIPE_LLM_BACKEND = {
+    **RECIPE_LLM_BACKEND_CONFIG,
+    "AGENT_CLASS": os.getenv("RECIPE_LLM_AGENT_CLASS", RECIPE_LLM_BACKEND_CONFIG["AGENT_CLASS"]),
+    "FAKE_LATENCY": float(os.getenv("RECIPE_LLM_FAKE_LATENCY", RECIPE_LLM_BACKEND_CONFIG["FAKE_LATENCY"])),
+}
+RECIPE_GENERATION_JOBS = {
+    **RECIPE_GENERATION_JOBS_CONFIG,
+    "CALLBACK_SECRET": os.getenv("RECIPE_JOB_CALLBACK_SECRET", ""),
+}
 
 
 SESSION_COOKIE_HTTPONLY = True
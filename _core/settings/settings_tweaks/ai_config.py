@@ -0,0 +1,155 @@
+import os
+import tempfile
+
+RECIPE_RESPONSE_CACHE_CONFIG = {
+    "ENABLED": True,
+    "CACHE_ALIAS": "recipe_responses",
+    "TIMEOUT": 60 * 60 * 24,  # seconds
+    # previous turns that take part in the cache key
+    "HISTORY_TAIL": 4,
+    # token-set similarity for fresh (history-less) prompts; None disables it
+    "SIMILARITY_THRESHOLD": 0.85,
+    "SIMILARITY_INDEX_SIZE": 1000,
+}
+
+RECIPE_HISTORY_WINDOW_CONFIG = {
+    # user/assistant pairs kept verbatim; older recipes collapse to their title
+    "RECENT_TURNS": 4,
+    "TOKEN_BUDGET": 3000,
+    # most recent messages read from the database per turn
+    "FETCH_LIMIT": 50,
+}
+
+RECIPE_CONVERSATION_SUMMARY_CONFIG = {
+    "ENABLED": True,
+    # unsummarised messages older than the verbatim window that trigger an update
+    "TRIGGER_MESSAGES": 12,
+    "MODEL": "gpt-4o-mini",
+}
+
+RECIPE_MODEL_ROUTING_CONFIG = {
+    "ROUTES": {
+        "primary": {"MODEL": "gpt-4o", "TEMPERATURE": 0.7},
+        "fast": {"MODEL": "gpt-4o-mini", "TEMPERATURE": 0.7},
+    },
+    # fresh chats and new recipe requests
+    "DEFAULT_ROUTE": "primary",
+    # questions about the recipes already in the conversation
+    "FOLLOW_UP_ROUTE": "fast",
+    "RECIPE_REQUEST_PATTERNS": [
+        r"\brecipes?\b",
+        r"\bhow (do|can|would|should) (i|you|we) (make|cook|bake|prepare)\b",
+        r"\b(make|cook|bake|prepare) (me )?(a|an|some)\b",
+        r"\b(something|anything) (else|different|new)\b",
+    ],
+    # a fast-route answer of these types is redone on FALLBACK_ROUTE
+    "ESCALATE_RESPONSE_TYPES": ["recipe", "error"],
+    # also used when the chosen route fails
+    "FALLBACK_ROUTE": "primary",
+}
+
+RECIPE_LLM_RESILIENCE_CONFIG = {
+    "CALL_TIMEOUT": 30,  # seconds per provider call
+    "TOTAL_DEADLINE": 60,  # seconds for all attempts of a turn
+    "MAX_ATTEMPTS": 3,
+    # full-jitter exponential backoff between attempts, in seconds
+    "BACKOFF_INITIAL": 0.5,
+    "BACKOFF_MAX": 4,
+    # consecutive transient failures that open a model's breaker, and for how long
+    "BREAKER_FAILURE_THRESHOLD": 5,
+    "BREAKER_RESET_TIMEOUT": 30,
+    # duplicate a request still running past this latency percentile
+    "HEDGE_ENABLED": False,
+    "HEDGE_PERCENTILE": 95,
+    "HEDGE_MIN_SAMPLES": 20,
+}
+
+RECIPE_LLM_BACKEND_CONFIG = {
+    # "app.features.chat.fake_llm.FakeRecipeAgent" answers locally, for load tests
+    "AGENT_CLASS": "app.features.chat.ai_func.RecipeAgent",
+    # FakeRecipeAgent only: seconds per reply, and partial objects per streamed reply
+    "FAKE_LATENCY": 0.5,
+    "FAKE_STREAM_CHUNKS": 8,
+}
+
+RECIPE_LLM_ACCOUNTING_CONFIG = {
+    "ENABLED": True,
+    # upper bounds (ms) of the daily latency histograms behind the dashboard percentiles
+    "LATENCY_BUCKETS_MS": [
+        50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 4000, 5000,
+        7500, 10000, 15000, 20000, 30000, 60000, 120000,
+    ],
+    # USD per million tokens; keep in line with the provider's price list
+    "PRICING": {
+        "gpt-4o": {"INPUT": 2.50, "CACHED_INPUT": 1.25, "OUTPUT": 10.00},
+        "gpt-4o-mini": {"INPUT": 0.15, "CACHED_INPUT": 0.075, "OUTPUT": 0.60},
+    },
+}
+
+RECIPE_GENERATION_JOBS_CONFIG = {
+    # seconds an idle run_generation_worker thread waits before polling the queue again
+    "POLL_INTERVAL": 1.0,
+    # a running job older than this (seconds) is presumed lost with its worker and requeued
+    "STALE_AFTER": 300,
+    "MAX_ATTEMPTS": 2,
+    # longest pause (seconds) between retries while the job queue cannot be read
+    "MAX_BACKOFF": 30,
+    # hosts callback_url may point at; empty disables push delivery
+    "CALLBACK_ALLOWED_HOSTS": [],
+    "CALLBACK_TIMEOUT": 10,
+    # HMAC-SHA256 key for the X-Recipe-Signature header; set from the environment
+    "CALLBACK_SECRET": "",
+}
+
+RECIPE_SINGLE_FLIGHT_CONFIG = {
+    "ENABLED": True,
+    # identical prompts in flight on different workers share one call through a
+    # lock in this cache (Redis in production); None shares within a process only
+    "CACHE_ALIAS": "default",
+    # seconds a duplicate caller waits for the first one before calling the model itself
+    "WAIT_TIMEOUT": 60,
+    "POLL_INTERVAL": 0.1,
+}
+
+RECIPE_LLM_RATE_LIMIT_CONFIG = {
+    "ENABLED": True,
+    # the django-redis cache whose Redis keeps one budget for all workers; with
+    # any other backend the workers of one host share a budget in FILE_PATH
+    "CACHE_ALIAS": "default",
+    "FILE_PATH": os.path.join(tempfile.gettempdir(), "recipe-llm-rate-limit.sqlite3"),
+    # without either, each process keeps 1/LOCAL_WORKERS of the limits; gunicorn
+    # also reads WEB_CONCURRENCY and runs one worker without it
+    "LOCAL_WORKERS": int(os.getenv("WEB_CONCURRENCY", "1")),
+    # seconds a call may queue for budget before it is shed with a "busy" reply
+    "MAX_WAIT": 10,
+    # completion tokens charged per request on top of the tiktoken prompt count
+    "OUTPUT_TOKENS": 700,
+    # calls to one model in flight per process; None for no limit
+    "MAX_CONCURRENCY": None,
+    # the organisation's requests and tokens per minute on the provider
+    "LIMITS": {
+        "gpt-4o": {"RPM": 500, "TPM": 30000},
+        "gpt-4o-mini": {"RPM": 500, "TPM": 200000},
+    },
+}
+
+RECIPE_SEARCH_CONFIG = {
+    # PostgreSQL text search configuration for the recipe tsvector and queries
+    "TEXT_SEARCH_CONFIG": "english",
+    "DEFAULT_RESULTS": 20,
+    "MAX_RESULTS": 50,
+}
+
+RECIPE_PANTRY_CONFIG = {
+    "ENABLED": True,
+    # assumed to be in every kitchen: neither required nor counted as missing
+    "STAPLES": ["salt", "pepper", "black pepper", "water", "oil", "olive oil", "vegetable oil"],
+    # share of a recipe's ingredients the pantry must cover to be listed
+    "MIN_COVERAGE": 0.5,
+    "DEFAULT_RESULTS": 10,
+    "MAX_RESULTS": 50,
+    # a chat message listing ingredients is answered with a stored recipe the
+    # pantry covers at least this well instead of a new generation; None to
+    # always generate
+    "CHAT_MIN_COVERAGE": 1.0,
+}
@@ -3,6 +3,12 @@ LOCAL_CACHE_CONFIG = {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "",
     },
+    # LocMemCache evicts least-recently-used entries once MAX_ENTRIES is hit
+    "recipe_responses": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "recipe-responses",
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    },
 }
 
 LOCAL_REDIS_CACHES = {
@@ -12,7 +18,15 @@ LOCAL_REDIS_CACHES = {
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
         }
-    }
+    },
+    # run this Redis db with maxmemory-policy allkeys-lru for LRU eviction
+    'recipe_responses': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/2',
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        }
+    },
 }
 # if wanna restricted:
 # CACHES = {
@@ -27,3 +27,9 @@ class AiModelLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ai_model_logs
         fields = ['title', 'ingredients', 'ingredient_items', 'created_on', 'status']
+
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        fields = obj.recipe_fields()
+        data.update({key: fields[key] for key in ('ingredients', 'ingredient_items')})
+        return data
@@ -51,11 +51,11 @@ class DashboardView(APIView):
         } for user in recent_signups]
 
         # AI Model Logs
-        recent_logs = Ai_model_logs.objects.all().order_by('-created_on')[:5]
+        recent_logs = Ai_model_logs.objects.select_related('recipe').order_by('-created_on')[:5]
         recent_logs_data = [{
             "date": log.created_on.strftime('%d/%m/%Y'),
             "email": log.title,
-            "ingredients": log.ingredients,
+            "ingredients": log.recipe_fields()["ingredients"],
             "recipeGenerated": "Generated Recipe",  # Assuming recipe generation
             # "status": log.status
         } for log in recent_logs]
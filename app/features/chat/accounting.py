@@ -0,0 +1,223 @@
+import logging
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from app.features.chat.models import AiLatencyBucket, AiUsageDaily, Ai_model_logs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    # upper bounds of the latency histogram, in milliseconds
+    "LATENCY_BUCKETS_MS": [
+        50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 4000, 5000,
+        7500, 10000, 15000, 20000, 30000, 60000, 120000,
+    ],
+    # USD per million tokens
+    "PRICING": {},
+}
+# upper_ms of the bucket holding everything slower than the last configured bound
+OVERFLOW_MS = 2**31 - 1
+PHASES = ("history", "llm", "persist")
+HISTOGRAM_PHASES = ("llm", "total")
+
+
+def _config() -> Dict:
+    return {**DEFAULT_CONFIG, **getattr(settings, "RECIPE_LLM_ACCOUNTING", {})}
+
+
+class TurnTrace:
+    """What one chat turn cost: wall time per phase, filled in by the views,
+    and the model, token usage, cache hit and error class, filled in by
+    RecipeOrchestrator."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phase_ms: Dict[str, int] = {}
+        self.usage: Optional[Dict] = None
+        self.model: Optional[str] = None
+        self.cache_hit = False
+        self.error_class = ""
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = int((time.perf_counter() - started) * 1000)
+            self.phase_ms[name] = self.phase_ms.get(name, 0) + elapsed
+
+    @property
+    def model_name(self) -> str:
+        return (self.usage or {}).get("model") or self.model or ""
+
+    @property
+    def total_ms(self) -> int:
+        return int((time.perf_counter() - self.started) * 1000)
+
+
+def turn_cost(usage: Optional[Dict], pricing: Optional[Dict] = None) -> Optional[Decimal]:
+    """USD cost of a turn's tokens, None if the model has no configured price."""
+    if not usage:
+        return None
+    pricing = _config()["PRICING"] if pricing is None else pricing
+    prices = pricing.get(usage.get("model") or "")
+    if prices is None:
+        return None
+    cached = usage["cached_input_tokens"]
+    cached_price = prices.get("CACHED_INPUT", prices["INPUT"])
+    micro_usd = (
+        (usage["input_tokens"] - cached) * Decimal(str(prices["INPUT"]))
+        + cached * Decimal(str(cached_price))
+        + usage["output_tokens"] * Decimal(str(prices["OUTPUT"]))
+    )
+    return (micro_usd / 1_000_000).quantize(Decimal("0.000001"))
+
+
+def _bucket(elapsed_ms: int, bounds: List[int]) -> int:
+    for upper in bounds:
+        if elapsed_ms <= upper:
+            return upper
+    return OVERFLOW_MS
+
+
+def record_turn(trace: TurnTrace, log: Optional[Ai_model_logs] = None) -> None:
+    """Writes a finished turn to the daily aggregates and, if the turn produced
+    one, to its Ai_model_logs row. Two UPDATEs in the common case: the day's
+    rows are created on first use and only ever incremented afterwards."""
+    config = _config()
+    if not config["ENABLED"]:
+        return
+    no_usage = {"input_tokens": None, "cached_input_tokens": None, "output_tokens": None}
+    usage = trace.usage or no_usage
+    cost = turn_cost(trace.usage, config["PRICING"])
+    total_ms = trace.total_ms
+    phase_ms = {name: trace.phase_ms.get(name, 0) for name in PHASES}
+    try:
+        with transaction.atomic():
+            if log is not None:
+                Ai_model_logs.objects.filter(pk=log.pk).update(
+                    model_name=trace.model_name,
+                    prompt_tokens=usage["input_tokens"],
+                    cached_prompt_tokens=usage["cached_input_tokens"],
+                    completion_tokens=usage["output_tokens"],
+                    cost_usd=cost,
+                    history_ms=phase_ms["history"],
+                    llm_ms=phase_ms["llm"],
+                    persist_ms=phase_ms["persist"],
+                    total_ms=total_ms,
+                    cache_hit=trace.cache_hit,
+                    error_class=trace.error_class,
+                )
+            _add_to_daily(trace, cost or Decimal(0), phase_ms, total_ms, config)
+    except Exception as e:  # accounting must never fail the chat turn
+        logger.warning("Could not record turn accounting: %s", e)
+
+
+def _add_to_daily(trace, cost, phase_ms, total_ms, config) -> None:
+    usage = trace.usage or {"input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0}
+    day = timezone.localdate()
+    model_name = trace.model_name
+    bounds = config["LATENCY_BUCKETS_MS"]
+    daily = AiUsageDaily.objects.filter(day=day, model_name=model_name)
+    increments = dict(
+        turns=F("turns") + 1,
+        cache_hits=F("cache_hits") + int(trace.cache_hit),
+        errors=F("errors") + int(bool(trace.error_class)),
+        prompt_tokens=F("prompt_tokens") + usage["input_tokens"],
+        cached_prompt_tokens=F("cached_prompt_tokens") + usage["cached_input_tokens"],
+        completion_tokens=F("completion_tokens") + usage["output_tokens"],
+        cost_usd=F("cost_usd") + cost,
+        history_ms=F("history_ms") + phase_ms["history"],
+        llm_ms=F("llm_ms") + phase_ms["llm"],
+        persist_ms=F("persist_ms") + phase_ms["persist"],
+        total_ms=F("total_ms") + total_ms,
+    )
+    if not daily.update(**increments):
+        AiUsageDaily.objects.bulk_create(
+            [AiUsageDaily(day=day, model_name=model_name)], ignore_conflicts=True
+        )
+        AiLatencyBucket.objects.bulk_create(
+            [
+                AiLatencyBucket(day=day, model_name=model_name, phase=phase, upper_ms=upper)
+                for phase in HISTOGRAM_PHASES
+                for upper in [*bounds, OVERFLOW_MS]
+            ],
+            ignore_conflicts=True,
+        )
+        daily.update(**increments)
+
+    AiLatencyBucket.objects.filter(
+        Q(phase="llm", upper_ms=_bucket(phase_ms["llm"], bounds))
+        | Q(phase="total", upper_ms=_bucket(total_ms, bounds)),
+        day=day,
+        model_name=model_name,
+    ).update(count=F("count") + 1)
+
+
+def _percentile(buckets: List[tuple], pct: float, bounds: List[int]) -> Optional[int]:
+    """Upper bound of the histogram bucket holding the pct-th percentile; the
+    largest configured bound when it falls in the overflow bucket."""
+    total = sum(count for _upper, count in buckets)
+    if not total:
+        return None
+    threshold = total * pct / 100
+    seen = 0
+    for upper, count in buckets:
+        seen += count
+        if seen >= threshold:
+            break
+    return max(bounds) if upper == OVERFLOW_MS else upper
+
+
+def ai_usage_daily_stats(days: int = 30) -> List[Dict]:
+    """One entry per day (newest first) with turns, tokens, cost, mean phase
+    times and p50/p95/p99 latency, summed over models and read from the
+    aggregate tables only."""
+    bounds = _config()["LATENCY_BUCKETS_MS"]
+    since = timezone.localdate() - timedelta(days=days - 1)
+    per_day: Dict = {}
+    for row in AiUsageDaily.objects.filter(day__gte=since).order_by("-day", "model_name"):
+        entry = per_day.setdefault(row.day, {
+            "day": row.day.isoformat(), "turns": 0, "cache_hits": 0, "errors": 0,
+            "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0,
+            "cost_usd": Decimal(0), "history_ms": 0, "llm_ms": 0, "persist_ms": 0, "total_ms": 0,
+            "models": {},
+        })
+        for field in ("turns", "cache_hits", "errors", "prompt_tokens", "cached_prompt_tokens",
+                      "completion_tokens", "cost_usd", "history_ms", "llm_ms", "persist_ms", "total_ms"):
+            entry[field] += getattr(row, field)
+        if row.model_name:
+            entry["models"][row.model_name] = {"turns": row.turns, "cost_usd": str(row.cost_usd)}
+
+    histograms: Dict = {}
+    buckets = (
+        AiLatencyBucket.objects.filter(day__gte=since, count__gt=0)
+        .order_by("upper_ms")
+        .values_list("day", "phase", "upper_ms", "count")
+    )
+    for day, phase, upper, count in buckets:
+        merged = histograms.setdefault((day, phase), {})
+        merged[upper] = merged.get(upper, 0) + count
+
+    stats = []
+    for day, entry in per_day.items():
+        turns = entry["turns"]
+        for phase in ("history", "llm", "persist", "total"):
+            entry[f"avg_{phase}_ms"] = round(entry.pop(f"{phase}_ms") / turns, 1) if turns else 0.0
+        for phase in HISTOGRAM_PHASES:
+            histogram = sorted(histograms.get((day, phase), {}).items())
+            for pct in (50, 95, 99):
+                entry[f"{phase}_p{pct}_ms"] = _percentile(histogram, pct, bounds)
+        entry["cost_usd"] = str(entry["cost_usd"])
+        stats.append(entry)
+    return stats
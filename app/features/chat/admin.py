@@ -1,8 +1,11 @@
 from django.contrib import admin
 
-from .models import ChatMessage, ChatSession
+from .models import AiUsageDaily, ChatMessage, ChatSession, GenerationJob, Recipe
 
 # Register your models here.
 
 admin.site.register(ChatSession)
 admin.site.register(ChatMessage)
+admin.site.register(AiUsageDaily)
+admin.site.register(GenerationJob)
+admin.site.register(Recipe)
@@ -1,14 +1,40 @@
 import os
-from typing import Dict, List, Optional, Literal
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Literal, Tuple, Union
 
+import httpx
+import openai
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from pydantic import BaseModel, Field
+from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from pydantic import BaseModel, Field, ValidationError
+
+from app.features.chat.intent_router import IntentRouter
+from app.features.chat.metrics import increment, read_counters
+from app.features.chat.pantry import PantryMatcher, get_pantry_matcher
+from app.features.chat.rate_limit import MESSAGE_OVERHEAD_TOKENS, LoadShedError
+from app.features.chat.resilience import CircuitOpenError, ResilientAgent, resilience_config
+from app.features.chat.response_cache import RecipeResponseCache, get_response_cache
+from app.features.chat.single_flight import SingleFlight, get_single_flight, single_flight_key
+from app.features.chat.tokens import count_tokens
 
 # --- Configuration ---
 load_dotenv()
 
+DEFAULT_MODEL = "gpt-4o"
+DEFAULT_TEMPERATURE = 0.7
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_TEMPERATURE = 0.2
+DEFAULT_BACKEND_CONFIG = {"AGENT_CLASS": "app.features.chat.ai_func.RecipeAgent"}
+# Connection pool shared by every request served by one worker process.
+HTTP_POOL_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+
 # ==============================================================================
 # 1. PYDANTIC SCHEMAS
 # ==============================================================================
@@ -79,152 +105,775 @@ class RecipeBotOutput(BaseModel):
     )
 
 
+# --- Compact wire format: what the model is actually asked to produce ---
+# One small variant per response type, plain field names and strict JSON-schema
+# mode. expand_reply() maps it back onto the RecipeBotOutput shape above.
+
+
+class RecipeReply(BaseModel):
+    type: Literal["recipe"]
+    title: str
+    overview: str = Field(description="1-2 sentences.")
+    rating: str = Field(description="Like '4.7/5'.")
+    ingredients: List[str] = Field(description="Each with its quantity.")
+    items: List[str] = Field(description="Ingredient names only.")
+    instructions: str = Field(description="Numbered steps separated by '\\n'.")
+
+
+class ConversationReply(BaseModel):
+    type: Literal["conversation"]
+    response: str
+    items: Optional[List[str]] = Field(description="Only if the user asked for a list, else null.")
+
+
+class ErrorReply(BaseModel):
+    type: Literal["error"]
+    title: str
+    reason: str = Field(description="Why the request is impossible or contradictory.")
+    items: List[str] = Field(description="Ingredients the user mentioned.")
+
+
+class BotReply(BaseModel):
+    reply: Union[RecipeReply, ConversationReply, ErrorReply]
+
+
+def expand_reply(data: Dict) -> Dict:
+    """Maps a (possibly partial) BotReply dictionary onto the RecipeBotOutput
+    dictionary shape (by alias) that the API returns and stores."""
+    reply = data.get("reply") or {}
+    response_type = reply.get("type")
+    if response_type == "recipe":
+        fields = {"title": "title", "overview": "overview/details", "rating": "rating",
+                  "ingredients": "ingredients", "items": "ingrediants items",
+                  "instructions": "instructions"}
+        details_key = "recipe_details"
+    elif response_type == "conversation":
+        fields = {"response": "response", "items": "items_list"}
+        details_key = "conversation_details"
+    elif response_type == "error":
+        fields = {"title": "title", "reason": "overview", "items": "ingrediants items"}
+        details_key = "error_details"
+    else:
+        return {}
+    details = {
+        target: reply[source]
+        for source, target in fields.items()
+        if reply.get(source) is not None
+    }
+    return {"response_type": response_type, details_key: details}
+
+
+def to_recipe_bot_output(reply: BotReply) -> RecipeBotOutput:
+    return RecipeBotOutput.model_validate(expand_reply(reply.model_dump()))
+
+
 # ==============================================================================
 # 2. THE SPECIALIST AGENT
 # ==============================================================================
 
 
+class AgentResult(NamedTuple):
+    output: RecipeBotOutput
+    # normalize_usage() of the call's token counts, if the provider reported them
+    usage: Optional[Dict]
+
+
+def normalize_usage(usage_metadata: Optional[Dict], model: Optional[str]) -> Optional[Dict]:
+    """Token counts of one call from AIMessage.usage_metadata. input_tokens
+    includes cached_input_tokens, the part served from the provider's prompt cache."""
+    if not usage_metadata:
+        return None
+    details = usage_metadata.get("input_token_details") or {}
+    return {
+        "model": model,
+        "input_tokens": usage_metadata.get("input_tokens", 0),
+        "cached_input_tokens": details.get("cache_read") or 0,
+        "output_tokens": usage_metadata.get("output_tokens", 0),
+    }
+
+
+def add_usage(first: Optional[Dict], second: Optional[Dict]) -> Optional[Dict]:
+    """Usage of a turn that took two calls (fallback or escalation); the model
+    is the one that produced the final answer."""
+    if not first or not second:
+        return second or first
+    return {
+        "model": second["model"],
+        **{key: first[key] + second[key] for key in ("input_tokens", "cached_input_tokens", "output_tokens")},
+    }
+
+
 class RecipeAgent:
-    def __init__(self):
-        llm = ChatOpenAI(
-            model="gpt-4o", temperature=0.7, openai_api_key=os.getenv("OPENAI_API_KEY")
-        )
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        temperature: float = DEFAULT_TEMPERATURE,
+        http_client: Optional[httpx.Client] = None,
+        http_async_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.model = model
+        self.temperature = temperature
+        self.http_client = http_client
+        self.http_async_client = http_async_client
+        self.timeout = resilience_config()["CALL_TIMEOUT"]
+        llm = self._llm(self.timeout)
 
-        # --- UPDATED: The system prompt now includes the new error handling logic ---
+        # The response format carries the field layout, so the prompt only
+        # describes how to choose between the three reply types.
         prompt = ChatPromptTemplate.from_messages(
             [
                 (
                     "system",
-                    """You are a versatile recipe and conversational assistant. Your task is to analyze the user's input and conversation history to determine the correct response. Your output MUST be a single, valid JSON object that conforms to the `RecipeBotOutput` schema.
+                    """You are a versatile recipe and conversational assistant. Analyze the user's input and the conversation history and answer with exactly one reply of the right `type`.
 **Decision Logic (follow this exact order):**
-1.  **Generate an Error (`response_type: "error"`)**: 
-    FIRST, carefully check if the recipe request contains any contradictions, impossibilities, or nonsensical elements.
-    
-    When to use this:
+1.  **`error`**: FIRST, check if the recipe request contains any contradictions, impossibilities, or nonsensical elements.
     - Religious/dietary contradictions (e.g., "Islamic pork recipe" - pork is haram in Islam)
     - Impossible combinations (e.g., "vegan beef steak" - beef cannot be vegan)
     - Physically impossible requests (e.g., "recipe that cooks in -10 minutes")
     - Nonsensical ingredients (e.g., "concrete sandwich recipe")
-    
-    What to do:
-    - Set `response_type` to "error"
-    - Fill ONLY the `error_details` field
-    - In `title`: Write a clear error title like "Recipe Request Invalid"
-    - In `overview`: Explain in simple terms WHY this request is impossible or contradictory
-    - In `ingredient_items`: List any actual ingredients the user mentioned (even problematic ones)
-    - DO NOT fill `recipe_details` or `conversation_details`
-2.  **Generate a Recipe (`response_type: "recipe"`)**: 
-    Use this ONLY when the user is explicitly asking for a NEW recipe AND the request is valid.
-    
-    Clear signs the user wants a new recipe:
-    - "Give me a recipe for..."
-    - "How do I make..."
-    - "Can you show me how to cook..."
-    - "I want a recipe for..."
-    
-    What to do:
-    - Set `response_type` to "recipe"
-    - Fill ONLY the `recipe_details` field with complete recipe information
-    - Make sure ALL fields are filled: title, overview, rating, ingredients, ingredient_items, instructions
-    - Write step-by-step instructions that a beginner can easily follow
-    - Use clear measurements and cooking terms
-    - DO NOT fill `error_details` or `conversation_details`
-3.  **Have a Conversation (`response_type: "conversation"`)**: 
-    Use this for EVERYTHING ELSE. This is your default choice when not generating recipes or errors.
-    
-    When to use this:
-    - Greetings ("hello", "hi", "good morning")
-    - Questions about existing recipes already discussed
-    - General cooking questions
-    - Requests for cooking tips or advice
-    - Follow-up questions about recipes from conversation history
-    - Requests for ingredient substitutions
-    - Storage or preparation questions
-    
-    What to do:
-    - Set `response_type` to "conversation"
-    - Fill ONLY the `conversation_details` field
-    - In `response`: Write a helpful, friendly response
-    - If user asks for a simple list (like "just the ingredient names"), put the list in `items_list`
-    - When answering follow-ups, refer to the conversation history to give contextual answers
-    - DO NOT create new recipes in conversation mode
-    - DO NOT fill `recipe_details` or `error_details`
+    Give a clear `title` like "Recipe Request Invalid", explain in simple terms WHY in `reason`, and list the ingredients the user mentioned (even problematic ones) in `items`.
+2.  **`recipe`**: ONLY when the user explicitly asks for a NEW recipe AND the request is valid ("Give me a recipe for...", "How do I make...", "Can you show me how to cook...", "I want a recipe for...").
+    Fill every field. Write step-by-step instructions that a beginner can easily follow, with clear measurements and cooking terms.
+3.  **`conversation`**: EVERYTHING ELSE. This is your default choice.
+    Greetings, questions about recipes already discussed, general cooking questions, tips, substitutions, storage or preparation questions.
+    Write a helpful, friendly `response`, referring to the conversation history for follow-ups. If the user asks for a simple list (like "just the ingredient names"), put it in `items`. DO NOT create new recipes in conversation mode.
 **Important Rules:**
-- Always fill exactly ONE of the three detail fields (recipe_details, conversation_details, or error_details)
-- Never fill multiple detail fields at the same time
 - When in doubt between recipe and conversation, choose conversation
 - Always be helpful and beginner-friendly in your responses""",
                 ),
-                (
-                    "human",
-                    """Here is the conversation history:
-<history>
-{history}
-</history>
-Analyze the latest user message and generate the appropriate response based on your decision logic.
-Latest User Message: '{user_input}'""",
-                ),
+                # Everything above is identical on every call and forms the prefix
+                # that provider-side prompt caching reuses. History follows as
+                # real messages, so each turn's prompt extends the previous one.
+                MessagesPlaceholder("history"),
+                ("human", "{user_input}"),
             ]
         )
-        self.chain = prompt | llm.with_structured_output(
-            RecipeBotOutput, method="function_calling"
+        self.prompt = prompt
+        self.chain = self._structured_chain(llm)
+        # whole seconds of timeout: chain, see _chain_within
+        self._deadline_chains: Dict[int, object] = {}
+        # Same response format, parsed as plain JSON so that partial objects can
+        # be emitted while the model is still generating.
+        self.stream_chain = prompt | llm.bind(response_format=BotReply)
+        self.stream_parser = JsonOutputParser()
+
+    def _llm(self, timeout: float) -> ChatOpenAI:
+        return ChatOpenAI(
+            model=self.model,
+            temperature=self.temperature,
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+            # retries are handled by ResilientAgent, across the whole deadline
+            timeout=timeout,
+            max_retries=0,
+            # the last streamed chunk carries the token usage
+            stream_usage=True,
         )
 
-    def _format_history(self, history: List[Dict[str, str]]) -> str:
+    def _structured_chain(self, llm: ChatOpenAI):
+        # include_raw keeps the AIMessage so token usage can be read off it
+        return self.prompt | llm.with_structured_output(
+            BotReply, method="json_schema", strict=True, include_raw=True
+        )
+
+    def _chain_within(self, timeout: Optional[float]):
+        """The compiled chain, or for a call that only has what is left of the
+        turn's deadline, one whose HTTP timeout is that many whole seconds (at
+        least one). A bound timeout would not reach the model inside
+        with_structured_output, so these are compiled once per agent as well."""
+        if timeout is None or timeout >= self.timeout:
+            return self.chain
+        seconds = max(1, int(timeout))
+        chain = self._deadline_chains.get(seconds)
+        if chain is None:
+            chain = self._deadline_chains.setdefault(
+                seconds, self._structured_chain(self._llm(seconds))
+            )
+        return chain
+
+    @staticmethod
+    def _format_history(history: List[Dict[str, str]]) -> str:
         if not history:
             return "No history yet."
         formatted_lines = []
         for message in history:
-            sender = message.get("sender", "unknown").capitalize()
+            sender = message.get("sender", "unknown")
             content = message.get("content", "")
-            formatted_lines.append(f"{sender}: {content}")
+            if sender == "summary":
+                formatted_lines.append(f"Summary of the earlier conversation: {content}")
+                continue
+            formatted_lines.append(f"{sender.capitalize()}: {content}")
         return "\n".join(formatted_lines)
 
+    @staticmethod
+    def _history_messages(
+        history: List[Dict[str, str]], user_input: str
+    ) -> List[Tuple[str, str]]:
+        # The views append the current user message as the last history entry;
+        # the prompt template adds it itself.
+        if history and history[-1].get("sender") == "user" and history[-1].get("content") == user_input:
+            history = history[:-1]
+        messages = []
+        for message in history:
+            sender = message.get("sender", "unknown")
+            content = str(message.get("content", ""))
+            if sender == "summary":
+                messages.append(("system", f"Summary of the earlier conversation: {content}"))
+            else:
+                messages.append(("ai" if sender == "assistant" else "human", content))
+        return messages
+
+    def _chain_input(self, user_input: str, conversation_history: List[Dict[str, str]]) -> Dict:
+        return {
+            "history": self._history_messages(conversation_history, user_input),
+            "user_input": user_input,
+        }
+
+    def prompt_tokens(self, user_input: str, conversation_history: List[Dict[str, str]]) -> int:
+        """tiktoken count of the prompt a call sends, charged to the rate limiter."""
+        messages = self.prompt.format_messages(**self._chain_input(user_input, conversation_history))
+        return sum(
+            count_tokens(str(message.content), self.model) + MESSAGE_OVERHEAD_TOKENS
+            for message in messages
+        )
+
+    def _agent_result(self, response: Dict) -> AgentResult:
+        if response.get("parsing_error"):
+            raise response["parsing_error"]
+        return AgentResult(
+            to_recipe_bot_output(response["parsed"]),
+            normalize_usage(getattr(response["raw"], "usage_metadata", None), self.model),
+        )
+
+    def invoke(
+        self,
+        user_input: str,
+        conversation_history: List[Dict[str, str]],
+        timeout: Optional[float] = None,
+    ) -> AgentResult:
+        return self._agent_result(
+            self._chain_within(timeout).invoke(self._chain_input(user_input, conversation_history))
+        )
+
+    async def ainvoke(
+        self, user_input: str, conversation_history: List[Dict[str, str]]
+    ) -> AgentResult:
+        return self._agent_result(
+            await self.chain.ainvoke(self._chain_input(user_input, conversation_history))
+        )
+
     def run(
         self, user_input: str, conversation_history: List[Dict[str, str]]
     ) -> RecipeBotOutput:
-        history_str = self._format_history(conversation_history)
-        return self.chain.invoke({"history": history_str, "user_input": user_input})
+        return self.invoke(user_input, conversation_history).output
+
+    async def arun(
+        self, user_input: str, conversation_history: List[Dict[str, str]]
+    ) -> RecipeBotOutput:
+        return (await self.ainvoke(user_input, conversation_history)).output
+
+    def stream(
+        self,
+        user_input: str,
+        conversation_history: List[Dict[str, str]],
+        on_usage: Optional[Callable[[Dict], None]] = None,
+    ) -> Iterator[Dict]:
+        """Yields the accumulated (partial) output dictionary after every chunk.
+        on_usage receives normalize_usage() of the call once the provider reports it."""
+
+        def chunks():
+            for chunk in self.stream_chain.stream(self._chain_input(user_input, conversation_history)):
+                if chunk.usage_metadata and on_usage is not None:
+                    on_usage(normalize_usage(chunk.usage_metadata, self.model))
+                yield chunk
+
+        for partial in self.stream_parser.transform(chunks()):
+            expanded = expand_reply(partial)
+            if expanded:
+                yield expanded
+
+
+class SummaryAgent:
+    """Folds older chat turns into a short rolling summary of the conversation."""
+
+    def __init__(
+        self,
+        model: str = SUMMARY_MODEL,
+        temperature: float = SUMMARY_TEMPERATURE,
+        http_client: Optional[httpx.Client] = None,
+        http_async_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.model = model
+        self.temperature = temperature
+        llm = ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=http_client,
+            http_async_client=http_async_client,
+            # retries are handled by ResilientAgent, across the whole deadline
+            timeout=resilience_config()["CALL_TIMEOUT"],
+            max_retries=0,
+        )
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                (
+                    "system",
+                    """You maintain a running summary of a conversation between a user and a recipe assistant.
+Merge the new messages into the existing summary. Keep: the user's dietary needs, allergies, tastes and equipment, the titles of recipes already shared, and any open questions.
+Drop greetings and small talk. Write at most 150 words of plain prose.""",
+                ),
+                (
+                    "human",
+                    """Existing summary:
+<summary>
+{summary}
+</summary>
+New messages:
+<messages>
+{messages}
+</messages>
+Return the updated summary only.""",
+                ),
+            ]
+        )
+        self.chain = prompt | llm | StrOutputParser()
+
+    def run(self, summary: str, messages: List[Dict[str, str]]) -> str:
+        return self.chain.invoke(
+            {
+                "summary": summary or "No summary yet.",
+                "messages": RecipeAgent._format_history(messages),
+            }
+        ).strip()
 
 
 # ==============================================================================
-# 3. THE ORCHESTRATOR
+# 3. PER-PROCESS AGENT REGISTRY
+# ==============================================================================
+
+# One warm agent (compiled chain + pooled HTTP client) per model configuration.
+# Gunicorn forks its workers, so the registry is keyed to the owning PID and is
+# emptied in the child after a fork: sockets and locks are never shared.
+_agent_registry: Dict[Tuple[type, str, float], object] = {}
+_agent_registry_lock = threading.Lock()
+_agent_registry_pid = os.getpid()
+
+
+def _reset_agent_registry() -> None:
+    global _agent_registry_lock, _agent_registry_pid
+    # Clients inherited from the parent are dropped, not closed: their
+    # connections still belong to the parent process.
+    _agent_registry.clear()
+    _agent_registry_lock = threading.Lock()
+    _agent_registry_pid = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_agent_registry)
+
+
+def _get_agent(agent_cls: type, model: str, temperature: float):
+    if _agent_registry_pid != os.getpid():
+        _reset_agent_registry()
+
+    key = (agent_cls, model, temperature)
+    agent = _agent_registry.get(key)
+    if agent is None:
+        with _agent_registry_lock:
+            agent = _agent_registry.get(key)
+            if agent is None:
+                agent = agent_cls(
+                    model=model,
+                    temperature=temperature,
+                    http_client=httpx.Client(limits=HTTP_POOL_LIMITS),
+                    http_async_client=httpx.AsyncClient(limits=HTTP_POOL_LIMITS),
+                )
+                _agent_registry[key] = agent
+    return agent
+
+
+def recipe_agent_class() -> type:
+    """The agent class configured in RECIPE_LLM_BACKEND["AGENT_CLASS"]; any class
+    with RecipeAgent's constructor and invoke/ainvoke/stream methods will do."""
+    config = {**DEFAULT_BACKEND_CONFIG, **getattr(settings, "RECIPE_LLM_BACKEND", {})}
+    return import_string(config["AGENT_CLASS"])
+
+
+def get_recipe_agent(
+    model: str = DEFAULT_MODEL, temperature: float = DEFAULT_TEMPERATURE
+) -> RecipeAgent:
+    """Returns the process-wide recipe agent for the given model configuration,
+    building it on first use."""
+    return _get_agent(recipe_agent_class(), model, temperature)
+
+
+def get_summary_agent(
+    model: str = SUMMARY_MODEL, temperature: float = SUMMARY_TEMPERATURE
+) -> "SummaryAgent":
+    """Returns the process-wide SummaryAgent for the given model configuration."""
+    return _get_agent(SummaryAgent, model, temperature)
+
+
+# ==============================================================================
+# 4. MODEL ROUTING
+# ==============================================================================
+
+DEFAULT_ROUTING_CONFIG = {
+    "ROUTES": {
+        "primary": {"MODEL": DEFAULT_MODEL, "TEMPERATURE": DEFAULT_TEMPERATURE},
+    },
+    "DEFAULT_ROUTE": "primary",
+    "FOLLOW_UP_ROUTE": "primary",
+    "RECIPE_REQUEST_PATTERNS": [],
+    "ESCALATE_RESPONSE_TYPES": [],
+    "FALLBACK_ROUTE": None,
+}
+ROUTE_METRIC_PREFIX = "model-route"
+ROUTE_STATS = (
+    "calls", "ms", "input_tokens", "cached_input_tokens", "output_tokens", "escalations", "fallbacks",
+)
+
+
+class ModelRouter:
+    """Chooses which configured model (route) answers a turn.
+
+    Fresh conversations and anything that looks like a new recipe request go
+    to DEFAULT_ROUTE. Follow-ups inside an existing conversation go to
+    FOLLOW_UP_ROUTE. If that route returns one of ESCALATE_RESPONSE_TYPES,
+    or fails, the turn is redone on FALLBACK_ROUTE. Every route produces the
+    same RecipeBotOutput. Configured through settings.RECIPE_MODEL_ROUTING.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = {
+            **DEFAULT_ROUTING_CONFIG,
+            **(config or getattr(settings, "RECIPE_MODEL_ROUTING", {})),
+        }
+        self.recipe_request = (
+            re.compile("|".join(self.config["RECIPE_REQUEST_PATTERNS"]), re.IGNORECASE)
+            if self.config["RECIPE_REQUEST_PATTERNS"]
+            else None
+        )
+
+    def choose(self, user_input: str, conversation_history: List[Dict]) -> str:
+        # The views append the current user message as the last history entry.
+        has_history = len(conversation_history or []) > 1
+        if not has_history:
+            return self.config["DEFAULT_ROUTE"]
+        if self.recipe_request and self.recipe_request.search(user_input or ""):
+            return self.config["DEFAULT_ROUTE"]
+        return self.config["FOLLOW_UP_ROUTE"]
+
+    def fallback_for(self, route: str) -> Optional[str]:
+        fallback = self.config["FALLBACK_ROUTE"]
+        return fallback if fallback and fallback != route else None
+
+    def should_escalate(self, route: str, output: RecipeBotOutput) -> bool:
+        return (
+            self.fallback_for(route) is not None
+            and output.response_type in self.config["ESCALATE_RESPONSE_TYPES"]
+        )
+
+    def agent_for(self, route: str) -> RecipeAgent:
+        route_config = self.config["ROUTES"][route]
+        return get_recipe_agent(
+            model=route_config["MODEL"],
+            temperature=route_config.get("TEMPERATURE", DEFAULT_TEMPERATURE),
+        )
+
+    def record(self, route: str, stat: str, amount: int = 1) -> None:
+        increment(f"{ROUTE_METRIC_PREFIX}:{route}:{stat}", amount)
+
+    def record_call(self, route: str, elapsed_seconds: float, usage: Optional[Dict]) -> None:
+        self.record(route, "calls")
+        self.record(route, "ms", int(elapsed_seconds * 1000))
+        if usage:
+            self.record(route, "input_tokens", usage["input_tokens"])
+            self.record(route, "cached_input_tokens", usage["cached_input_tokens"])
+            self.record(route, "output_tokens", usage["output_tokens"])
+
+    def stats(self) -> Dict:
+        stats = {}
+        for route, route_config in self.config["ROUTES"].items():
+            values = read_counters(
+                f"{ROUTE_METRIC_PREFIX}:{route}:{stat}" for stat in ROUTE_STATS
+            )
+            counts = {stat: values[f"{ROUTE_METRIC_PREFIX}:{route}:{stat}"] for stat in ROUTE_STATS}
+            calls = counts.pop("calls")
+            total_ms = counts.pop("ms")
+            stats[route] = {
+                "model": route_config["MODEL"],
+                "calls": calls,
+                "avg_latency_ms": round(total_ms / calls, 1) if calls else 0.0,
+                "avg_input_tokens": round(counts["input_tokens"] / calls, 1) if calls else 0.0,
+                "avg_output_tokens": round(counts["output_tokens"] / calls, 1) if calls else 0.0,
+                "prompt_cache_ratio": (
+                    round(counts["cached_input_tokens"] / counts["input_tokens"], 4)
+                    if counts["input_tokens"] else 0.0
+                ),
+                **counts,
+            }
+        return stats
+
+
+# ==============================================================================
+# 5. THE ORCHESTRATOR
 # ==============================================================================
 
 
 class RecipeOrchestrator:
-    def __init__(self):
-        self.recipe_agent = RecipeAgent()
+    def __init__(
+        self,
+        recipe_agent: Optional[RecipeAgent] = None,
+        response_cache: Optional[RecipeResponseCache] = None,
+        intent_router: Optional[IntentRouter] = None,
+        model_router: Optional[ModelRouter] = None,
+        single_flight: Optional[SingleFlight] = None,
+        pantry: Optional[PantryMatcher] = None,
+    ):
+        # An explicit agent answers every route (tests, benchmarks, fake backends).
+        self.recipe_agent = recipe_agent
+        self.response_cache = response_cache or get_response_cache()
+        self.intent_router = intent_router or IntentRouter()
+        self.model_router = model_router or ModelRouter()
+        self.single_flight = single_flight or get_single_flight()
+        self.pantry = pantry or get_pantry_matcher()
+
+    def _agent_for(self, route: str) -> ResilientAgent:
+        return ResilientAgent(self.recipe_agent or self.model_router.agent_for(route))
+
+    def _answer_without_model(
+        self, user_input: str, conversation_history: List[Dict], trace=None
+    ) -> Optional[Dict]:
+        """Template reply for trivial turns, else a cached response, else a
+        stored recipe the ingredients the user listed fully cover, else None."""
+        routed = self.intent_router.route(user_input, conversation_history)
+        if routed is not None:
+            return routed
+        answered = self.response_cache.get(user_input, conversation_history)
+        if answered is None:
+            answered = self.pantry.offer(user_input, conversation_history)
+        if answered is not None and trace is not None:
+            trace.cache_hit = True
+        return answered
+
+    def _record_call(self, route: str, started: float, usage: Optional[Dict]) -> None:
+        elapsed = time.perf_counter() - started
+        self.intent_router.record_llm_call(elapsed)
+        self.model_router.record_call(route, elapsed, usage)
+
+    def _invoke_route(
+        self, route: str, user_input: str, conversation_history: List[Dict]
+    ) -> AgentResult:
+        started = time.perf_counter()
+        usage = None
+        try:
+            agent_result = self._agent_for(route).invoke(
+                user_input=user_input, conversation_history=conversation_history
+            )
+            usage = agent_result.usage
+            return agent_result
+        finally:
+            self._record_call(route, started, usage)
 
-    def run_analysis(self, user_input: str, conversation_history: List[Dict]) -> Dict:
-        """Processes the user input against the conversation history and returns a structured dictionary."""
+    async def _ainvoke_route(
+        self, route: str, user_input: str, conversation_history: List[Dict]
+    ) -> AgentResult:
+        started = time.perf_counter()
+        usage = None
         try:
-            structured_result = self.recipe_agent.run(
+            agent_result = await self._agent_for(route).ainvoke(
                 user_input=user_input, conversation_history=conversation_history
             )
-            return structured_result.model_dump(by_alias=True, exclude_none=True)
+            usage = agent_result.usage
+            return agent_result
+        finally:
+            await sync_to_async(self._record_call)(route, started, usage)
+
+    def _invoke(self, user_input: str, conversation_history: List[Dict]) -> AgentResult:
+        route = self.model_router.choose(user_input, conversation_history)
+        fallback = self.model_router.fallback_for(route)
+        try:
+            first = self._invoke_route(route, user_input, conversation_history)
+        except Exception:
+            if fallback is None:
+                raise
+            self.model_router.record(route, "fallbacks")
+            return self._invoke_route(fallback, user_input, conversation_history)
+        if self.model_router.should_escalate(route, first.output):
+            self.model_router.record(route, "escalations")
+            second = self._invoke_route(fallback, user_input, conversation_history)
+            return AgentResult(second.output, add_usage(first.usage, second.usage))
+        return first
+
+    async def _ainvoke(
+        self, user_input: str, conversation_history: List[Dict]
+    ) -> AgentResult:
+        route = self.model_router.choose(user_input, conversation_history)
+        fallback = self.model_router.fallback_for(route)
+        try:
+            first = await self._ainvoke_route(route, user_input, conversation_history)
+        except Exception:
+            if fallback is None:
+                raise
+            await sync_to_async(self.model_router.record)(route, "fallbacks")
+            return await self._ainvoke_route(fallback, user_input, conversation_history)
+        if self.model_router.should_escalate(route, first.output):
+            await sync_to_async(self.model_router.record)(route, "escalations")
+            second = await self._ainvoke_route(fallback, user_input, conversation_history)
+            return AgentResult(second.output, add_usage(first.usage, second.usage))
+        return first
+
+    @staticmethod
+    def _answer(agent_result: AgentResult) -> Dict:
+        # plain data, so concurrent callers in other workers can share it through the cache
+        return {
+            "result": agent_result.output.model_dump(by_alias=True, exclude_none=True),
+            "usage": agent_result.usage,
+        }
+
+    @staticmethod
+    def _trace_answer(trace, answer: Dict, led: bool) -> None:
+        if trace is None:
+            return
+        if led:
+            trace.usage = answer["usage"]
+        else:
+            # answered by a concurrent identical call, like a response-cache hit
+            trace.cache_hit = True
+
+    def run_analysis(
+        self, user_input: str, conversation_history: List[Dict], trace=None
+    ) -> Dict:
+        """Processes the user input against the conversation history and returns a structured dictionary.
+        An accounting.TurnTrace, if given, receives the model, token usage, cache hit and error class."""
+        answered = self._answer_without_model(user_input, conversation_history, trace)
+        if answered is not None:
+            return answered
+        try:
+            # identical prompts already in flight share that call (see single_flight)
+            answer, led = self.single_flight.do(
+                single_flight_key(user_input, conversation_history),
+                lambda: self._answer(self._invoke(user_input, conversation_history)),
+            )
+        except Exception as e:
+            return self._error_response(e, trace)
+        result = answer["result"]
+        self._trace_answer(trace, answer, led)
+        if led:
+            self.response_cache.set(user_input, conversation_history, result)
+        return result
+
+    async def arun_analysis(
+        self, user_input: str, conversation_history: List[Dict], trace=None
+    ) -> Dict:
+        """Async counterpart of run_analysis; awaits the model instead of blocking a thread."""
+        answered = await sync_to_async(self._answer_without_model)(
+            user_input, conversation_history, trace
+        )
+        if answered is not None:
+            return answered
+        async def answer_once():
+            return self._answer(await self._ainvoke(user_input, conversation_history))
+
+        try:
+            answer, led = await self.single_flight.ado(
+                single_flight_key(user_input, conversation_history), answer_once
+            )
+        except Exception as e:
+            return self._error_response(e, trace)
+        result = answer["result"]
+        self._trace_answer(trace, answer, led)
+        if led:
+            await sync_to_async(self.response_cache.set)(
+                user_input, conversation_history, result
+            )
+        return result
+
+    def stream_analysis(
+        self, user_input: str, conversation_history: List[Dict], trace=None
+    ) -> Iterator[Tuple[str, Dict]]:
+        """Yields ("partial", dict) events while the model generates, followed by
+        exactly one ("result", dict) event shaped like run_analysis' return value.
+        Template replies and cache hits skip straight to the result. Streamed
+        turns are not escalated: the client has already seen the output."""
+        answered = self._answer_without_model(user_input, conversation_history, trace)
+        if answered is not None:
+            yield "result", answered
+            return
+        route = self.model_router.choose(user_input, conversation_history)
+        partial = None
+        usage = {}
+        started = time.perf_counter()
+        agent = self._agent_for(route)
+        if trace is not None:
+            trace.model = getattr(agent, "model", None)
+        try:
+            for partial in agent.stream(
+                user_input=user_input, conversation_history=conversation_history, on_usage=usage.update
+            ):
+                yield "partial", partial
+            structured_result = RecipeBotOutput.model_validate(partial)
+            result = structured_result.model_dump(by_alias=True, exclude_none=True)
         except Exception as e:
-            print(f"Error during analysis: {e}")
-            error_details = str(e)
-            if "OUTPUT_PARSING_FAILURE" in error_details:
-                return {
-                    "error": "Failed to process the request due to an invalid format from the model.",
-                    "details": "The AI model's response was malformed and could not be parsed.",
-                }
-            return {"error": "An unexpected error occurred.", "details": error_details}
+            yield "result", self._error_response(e, trace)
+            return
+        finally:
+            if trace is not None:
+                trace.usage = usage or None
+            self._record_call(route, started, usage or None)
+        self.response_cache.set(user_input, conversation_history, result)
+        yield "result", result
+
+    @staticmethod
+    def _error_response(e: Exception, trace=None) -> Dict:
+        print(f"Error during analysis: {e}")
+        if trace is not None:
+            trace.error_class = type(e).__name__
+        error_details = str(e)
+        if isinstance(e, CircuitOpenError):
+            return {
+                "error": "The recipe assistant is temporarily unavailable.",
+                "details": "Please try again in a minute.",
+            }
+        if isinstance(e, LoadShedError):
+            return {
+                "error": "The recipe assistant is busy right now.",
+                "details": f"Please try again in {e.retry_after_seconds} seconds.",
+                "error_type": "rate_limited",
+                "retry_after": e.retry_after_seconds,
+            }
+        if isinstance(e, openai.RateLimitError):
+            # the provider's own limit, still hit after the retries
+            return {
+                "error": "The recipe assistant is busy right now.",
+                "details": "Please try again in a few seconds.",
+                "error_type": "rate_limited",
+            }
+        if "OUTPUT_PARSING_FAILURE" in error_details or isinstance(e, ValidationError):
+            return {
+                "error": "Failed to process the request due to an invalid format from the model.",
+                "details": "The AI model's response was malformed and could not be parsed.",
+            }
+        return {"error": "An unexpected error occurred.", "details": error_details}
 
 
 # ==============================================================================
-# 4. REUSABLE FUNCTION (PUBLIC API ENTRY POINT)
+# 6. REUSABLE FUNCTION (PUBLIC API ENTRY POINT)
 # ==============================================================================
 
 
-def get_recipe_response(user_input: str, conversation_history: List[Dict]) -> Dict:
+def get_recipe_response(
+    user_input: str, conversation_history: List[Dict], trace=None
+) -> Dict:
     """
     Handles an incoming message, processes it, and returns the structured action.
     Args:
         user_input: The user's current message.
         conversation_history: A list of previous message dictionaries.
+        trace: Optional accounting.TurnTrace that records what the turn cost.
 
     Returns:
         A dictionary containing the full analysis and response.
@@ -234,5 +883,52 @@ def get_recipe_response(user_input: str, conversation_history: List[Dict]) -> Di
 
     orchestrator = RecipeOrchestrator()
     return orchestrator.run_analysis(
-        user_input=user_input, conversation_history=conversation_history
+        user_input=user_input, conversation_history=conversation_history, trace=trace
+    )
+
+
+
+async def aget_recipe_response(
+    user_input: str, conversation_history: List[Dict], trace=None
+) -> Dict:
+    """
+    Async counterpart of get_recipe_response for the ASGI deployment.
+    Args:
+        user_input: The user's current message.
+        conversation_history: A list of previous message dictionaries.
+        trace: Optional accounting.TurnTrace that records what the turn cost.
+
+    Returns:
+        A dictionary containing the full analysis and response.
+    """
+    if not user_input:
+        return {"error": "User input cannot be empty."}
+
+    orchestrator = RecipeOrchestrator()
+    return await orchestrator.arun_analysis(
+        user_input=user_input, conversation_history=conversation_history, trace=trace
+    )
+
+
+def stream_recipe_response(
+    user_input: str, conversation_history: List[Dict], trace=None
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    Streaming counterpart of get_recipe_response.
+    Args:
+        user_input: The user's current message.
+        conversation_history: A list of previous message dictionaries.
+        trace: Optional accounting.TurnTrace that records what the turn cost.
+
+    Yields:
+        ("partial", dict) tuples as the model output grows, then a final
+        ("result", dict) tuple with the same payload get_recipe_response returns.
+    """
+    if not user_input:
+        yield "result", {"error": "User input cannot be empty."}
+        return
+
+    orchestrator = RecipeOrchestrator()
+    yield from orchestrator.stream_analysis(
+        user_input=user_input, conversation_history=conversation_history, trace=trace
     )
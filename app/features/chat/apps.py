@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ChatConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "app.features.chat"
+
+    def ready(self):
+        # GIN indexes on PostgreSQL that Recipe.Meta cannot declare (see search.py)
+        post_migrate.connect(_create_search_indexes, sender=self)
+
+
+def _create_search_indexes(using="default", **kwargs):
+    from app.features.chat.search import ensure_search_indexes
+
+    ensure_search_indexes(using)
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+import httpx
+from django.conf import settings
+
+from app.features.chat.ai_func import AgentResult, RecipeBotOutput, normalize_usage
+from app.features.chat.response_cache import normalize_text
+
+DEFAULT_CONFIG = {
+    # seconds a fake blocking call takes
+    "FAKE_LATENCY": 0.5,
+    # partial objects a fake stream yields, spread evenly over FAKE_LATENCY
+    "FAKE_STREAM_CHUNKS": 8,
+}
+
+_RECIPE_WORDS = frozenset("recipe recipes cook make bake prepare dinner lunch breakfast".split())
+_FILLER = frozenset("and the for what with have some give want please that this from your".split())
+_DISHES = ("Fried Rice", "Frittata", "Stir-Fry", "Soup", "Pasta Bake", "Salad")
+
+
+def backend_config() -> Dict:
+    return {**DEFAULT_CONFIG, **getattr(settings, "RECIPE_LLM_BACKEND", {})}
+
+
+def fake_output(user_input: str) -> Dict:
+    """Deterministic RecipeBotOutput payload (by alias) for a prompt: recipe
+    requests get a recipe built from the prompt's words, anything else a
+    conversational reply."""
+    words = normalize_text(user_input).split()
+    if not _RECIPE_WORDS.intersection(words):
+        return {
+            "response_type": "conversation",
+            "conversation_details": {"response": f"You said: {user_input.strip()}"},
+        }
+    digest = int(hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest(), 16)
+    items = [
+        w for w in words if len(w) > 2 and w not in _RECIPE_WORDS and w not in _FILLER
+    ][:4] or ["rice", "egg"]
+    return {
+        "response_type": "recipe",
+        "recipe_details": {
+            "title": f"{items[0].capitalize()} {_DISHES[digest % len(_DISHES)]}",
+            "overview/details": "A quick weeknight dish made from what you have.",
+            "rating": f"{4 + digest % 10 / 10:.1f}/5",
+            "ingredients": [f"{100 + 50 * i} g {item}" for i, item in enumerate(items)],
+            "ingrediants items": items,
+            "instructions": "\n".join(
+                f"{i}. Prepare the {item}." for i, item in enumerate(items, start=1)
+            ) + f"\n{len(items) + 1}. Combine, season and serve.",
+        },
+    }
+
+
+def _partials(output: Dict, chunks: int) -> List[Dict]:
+    """Growing prefixes of the output, key by key, ending with the full object,
+    the same shape RecipeAgent.stream yields."""
+    steps = []
+    partial: Dict = {}
+    for key, value in output.items():
+        if isinstance(value, dict):
+            partial[key] = {}
+            for inner_key, inner_value in value.items():
+                partial[key][inner_key] = inner_value
+                steps.append({**partial, key: dict(partial[key])})
+        else:
+            partial[key] = value
+            steps.append(dict(partial))
+    if chunks < len(steps):
+        stride = len(steps) / chunks
+        steps = [steps[min(len(steps) - 1, int((i + 1) * stride) - 1)] for i in range(chunks)]
+    return steps
+
+
+class FakeRecipeAgent:
+    """Local stand-in for RecipeAgent used for benchmarks and load tests.
+    Selected with RECIPE_LLM_BACKEND["AGENT_CLASS"].
+
+    Same constructor and invoke/ainvoke/stream interface, no network: replies
+    come from fake_output() after FAKE_LATENCY seconds, and streams yield
+    FAKE_STREAM_CHUNKS partial objects over the same period.
+    """
+
+    def __init__(
+        self,
+        model: str = "fake",
+        temperature: float = 0.0,
+        http_client=None,
+        http_async_client=None,
+        latency: Optional[float] = None,
+        stream_chunks: Optional[int] = None,
+    ):
+        config = backend_config()
+        self.model = model
+        self.temperature = temperature
+        self.latency = config["FAKE_LATENCY"] if latency is None else latency
+        self.stream_chunks = config["FAKE_STREAM_CHUNKS"] if stream_chunks is None else stream_chunks
+
+    def _usage(self, user_input: str, conversation_history: List[Dict]) -> Dict:
+        prompt_chars = len(user_input) + sum(len(str(m.get("content", ""))) for m in conversation_history)
+        input_tokens = 400 + prompt_chars // 4
+        return normalize_usage(
+            {"input_tokens": input_tokens, "output_tokens": 150, "total_tokens": input_tokens + 150},
+            self.model,
+        )
+
+    def _result(self, user_input: str, conversation_history: List[Dict]) -> AgentResult:
+        return AgentResult(
+            RecipeBotOutput.model_validate(fake_output(user_input)),
+            self._usage(user_input, conversation_history),
+        )
+
+    def invoke(
+        self, user_input: str, conversation_history: List[Dict], timeout: Optional[float] = None
+    ) -> AgentResult:
+        if timeout is not None and self.latency > timeout:
+            time.sleep(timeout)
+            raise httpx.TimeoutException("Fake model call exceeded its timeout")
+        time.sleep(self.latency)
+        return self._result(user_input, conversation_history)
+
+    async def ainvoke(self, user_input: str, conversation_history: List[Dict]) -> AgentResult:
+        await asyncio.sleep(self.latency)
+        return self._result(user_input, conversation_history)
+
+    def run(self, user_input: str, conversation_history: List[Dict]) -> RecipeBotOutput:
+        return self.invoke(user_input, conversation_history).output
+
+    async def arun(self, user_input: str, conversation_history: List[Dict]) -> RecipeBotOutput:
+        return (await self.ainvoke(user_input, conversation_history)).output
+
+    def stream(
+        self, user_input: str, conversation_history: List[Dict], on_usage: Optional[Callable[[Dict], None]] = None
+    ) -> Iterator[Dict]:
+        partials = _partials(fake_output(user_input), max(1, self.stream_chunks))
+        delay = self.latency / len(partials)
+        for partial in partials:
+            time.sleep(delay)
+            yield partial
+        if on_usage is not None:
+            on_usage(self._usage(user_input, conversation_history))
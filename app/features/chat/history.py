@@ -0,0 +1,168 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from django.conf import settings
+
+from app.features.chat.metrics import increment, read_counters
+from app.features.chat.tokens import count_tokens, estimate_tokens
+
+DEFAULT_CONFIG = {
+    # user/assistant pairs kept verbatim at the end of the history
+    "RECENT_TURNS": 4,
+    # tokens available to the history, including the latest user message
+    "TOKEN_BUDGET": 3000,
+    # most recent messages read from the database per turn
+    "FETCH_LIMIT": 50,
+}
+
+METRIC_PREFIX = "history-window"
+STATS = ("turns", "prompt_tokens", "tokens_saved")
+
+
+class HistoryRow(NamedTuple):
+    """The ChatMessage columns the history window needs, read with values_list().
+    extra_data holds the linked Recipe's details for recipe messages."""
+
+    sender: str
+    message_type: str
+    content: Optional[str]
+    extra_data: Optional[Dict]
+
+
+# recipe__details is a LEFT JOIN on the recipe store, in the same query
+_COLUMNS = ("sender", "message_type", "content", "extra_data", "recipe__details")
+
+
+def _row(sender, message_type, content, extra_data, recipe_details) -> HistoryRow:
+    return HistoryRow(
+        sender, message_type, content, extra_data if recipe_details is None else recipe_details
+    )
+
+
+def _details(msg) -> Optional[Dict]:
+    # ChatMessage resolves its recipe in .details; HistoryRow already has it
+    return getattr(msg, "details", msg.extra_data)
+
+
+class HistoryWindow(NamedTuple):
+    messages: List[Dict[str, str]]
+    prompt_tokens: int
+    tokens_saved: int
+
+
+def _verbatim(msg) -> Optional[str]:
+    if msg.content:
+        return msg.content
+    details = _details(msg)
+    if details:
+        return str(details)
+    return None
+
+
+def compact_content(msg) -> Optional[str]:
+    """Compact stand-in for an older message: recipes and declined requests keep
+    only their title, plain text is kept as is."""
+    if msg.content:
+        return msg.content
+    details = _details(msg)
+    if details and msg.message_type in ("recipe", "error"):
+        title = details.get("title") or "untitled"
+        label = "Recipe shared earlier" if msg.message_type == "recipe" else "Request declined earlier"
+        return f"[{label}: {title}]"
+    return None
+
+
+def _config(config: Optional[Dict] = None) -> Dict:
+    return {**DEFAULT_CONFIG, **(config or getattr(settings, "RECIPE_HISTORY_WINDOW", {}))}
+
+
+def recent_message_count(config: Optional[Dict] = None) -> int:
+    """Number of trailing messages that are always candidates for verbatim use."""
+    return _config(config)["RECENT_TURNS"] * 2
+
+
+def _history_rows_queryset(messages, config: Optional[Dict] = None):
+    # Newest first so the LIMIT is applied by the database; served by the
+    # (chat, created_at) index on ChatMessage.
+    limit = _config(config)["FETCH_LIMIT"]
+    return messages.order_by("-created_at", "-id").values_list(*_COLUMNS)[:limit]
+
+
+def fetch_history_rows(messages, config: Optional[Dict] = None) -> List[HistoryRow]:
+    """Reads the last FETCH_LIMIT messages of a ChatMessage queryset, oldest first."""
+    rows = [_row(*row) for row in _history_rows_queryset(messages, config)]
+    rows.reverse()
+    return rows
+
+
+async def afetch_history_rows(messages, config: Optional[Dict] = None) -> List[HistoryRow]:
+    rows = [_row(*row) async for row in _history_rows_queryset(messages, config)]
+    rows.reverse()
+    return rows
+
+
+def build_history_window(
+    messages: Iterable, user_input: str, config: Optional[Dict] = None, summary: str = ""
+) -> HistoryWindow:
+    """Builds the conversation history for the prompt from ChatMessage rows or
+    HistoryRow tuples (oldest first), ending with the latest user message.
+
+    The last RECENT_TURNS turns are kept verbatim as long as they fit in
+    TOKEN_BUDGET. Older recipe and error messages collapse to title-only stubs.
+    Everything older than the first message that does not fit is dropped.
+    A rolling summary of the messages before `messages` opens the history.
+    """
+    config = _config(config)
+    messages = list(messages)
+    verbatim_limit = recent_message_count(config)
+    summary_tokens = count_tokens(summary)
+    budget = config["TOKEN_BUDGET"] - count_tokens(user_input) - summary_tokens
+
+    kept: List[Dict[str, str]] = []
+    used = 0
+    saved = 0
+    exhausted = False
+    for position, msg in enumerate(reversed(messages)):
+        full = _verbatim(msg)
+        if full is None:
+            continue
+        if exhausted:
+            # Not worth tokenising what will never be sent; estimate what it would have cost.
+            saved += estimate_tokens(full)
+            continue
+        full_tokens = count_tokens(full)
+        content, tokens = full, full_tokens
+        if position >= verbatim_limit or used + full_tokens > budget:
+            content = compact_content(msg)
+            if content != full:
+                tokens = count_tokens(content) if content else 0
+        if content is None or used + tokens > budget:
+            exhausted = True
+            saved += full_tokens
+            continue
+        kept.append({"sender": msg.sender, "content": content})
+        used += tokens
+        saved += full_tokens - tokens
+
+    kept.reverse()
+    if summary:
+        kept.insert(0, {"sender": "summary", "content": summary})
+        used += summary_tokens
+    kept.append({"sender": "user", "content": user_input})
+    window = HistoryWindow(kept, used + count_tokens(user_input), saved)
+    _record(window)
+    return window
+
+
+def _record(window: HistoryWindow) -> None:
+    increment(f"{METRIC_PREFIX}:turns")
+    increment(f"{METRIC_PREFIX}:prompt_tokens", window.prompt_tokens)
+    increment(f"{METRIC_PREFIX}:tokens_saved", window.tokens_saved)
+
+
+def history_window_stats() -> Dict:
+    values = read_counters(f"{METRIC_PREFIX}:{stat}" for stat in STATS)
+    counts = {stat: values[f"{METRIC_PREFIX}:{stat}"] for stat in STATS}
+    turns = counts["turns"]
+    counts["avg_prompt_tokens"] = round(counts["prompt_tokens"] / turns, 1) if turns else 0.0
+    counts["avg_tokens_saved"] = round(counts["tokens_saved"] / turns, 1) if turns else 0.0
+    return counts
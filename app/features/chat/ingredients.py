@@ -0,0 +1,206 @@
+import functools
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# canonical unit -> spellings seen in recipe lines (matched case-insensitively)
+UNITS: Dict[str, List[str]] = {
+    "tsp": ["teaspoons", "teaspoon", "tsps", "tsp"],
+    "tbsp": ["tablespoons", "tablespoon", "tbsps", "tbsp", "tbs", "tbl"],
+    "cup": ["cups", "cup", "c"],
+    "fl oz": ["fluid ounces", "fluid ounce", "fl oz", "fl. oz"],
+    "ml": ["milliliters", "millilitres", "milliliter", "millilitre", "ml"],
+    "l": ["liters", "litres", "liter", "litre", "l"],
+    "pint": ["pints", "pint", "pt"],
+    "quart": ["quarts", "quart", "qt"],
+    "gallon": ["gallons", "gallon", "gal"],
+    "g": ["grams", "gram", "gr", "g"],
+    "kg": ["kilograms", "kilogram", "kilos", "kilo", "kg"],
+    "mg": ["milligrams", "milligram", "mg"],
+    "oz": ["ounces", "ounce", "oz"],
+    "lb": ["pounds", "pound", "lbs", "lb"],
+    "pinch": ["pinches", "pinch"],
+    "dash": ["dashes", "dash"],
+    "drop": ["drops", "drop"],
+    "clove": ["cloves", "clove"],
+    "can": ["cans", "can", "tins", "tin"],
+    "jar": ["jars", "jar"],
+    "package": ["packages", "package", "packets", "packet", "pkgs", "pkg"],
+    "bag": ["bags", "bag"],
+    "box": ["boxes", "box"],
+    "bottle": ["bottles", "bottle"],
+    "stick": ["sticks", "stick"],
+    "slice": ["slices", "slice"],
+    "piece": ["pieces", "piece"],
+    "sprig": ["sprigs", "sprig"],
+    "stalk": ["stalks", "stalk"],
+    "bunch": ["bunches", "bunch"],
+    "head": ["heads", "head"],
+    "handful": ["handfuls", "handful"],
+    "sheet": ["sheets", "sheet"],
+    "fillet": ["fillets", "fillet"],
+    "scoop": ["scoops", "scoop"],
+}
+
+# Size, state and preparation words: kept as notes, not part of the name.
+DESCRIPTORS = frozenset("""
+    large medium small big extra jumbo whole ripe overripe fresh freshly frozen thawed dried
+    raw cooked uncooked leftover boneless skinless bone-in lean firm soft softened melted cold warm
+    hot lukewarm chilled room temperature chopped diced minced sliced grated shredded crushed
+    mashed peeled cored seeded pitted trimmed halved quartered cubed julienned beaten whisked
+    sifted packed heaping level rounded finely roughly coarsely thinly thickly lightly
+    toasted roasted divided rinsed drained unsalted salted virgin good quality organic plain
+""".split())
+
+# Trailing phrases that say how much or what for rather than what.
+_NOTE_SUFFIX = re.compile(
+    r"\b(?:to taste|as needed|if needed|for (?:garnish(?:ing)?|serving|greasing|dusting|frying|"
+    r"drizzling|topping|decoration|the \w+)|optional|plus (?:more|extra)\b.*)$"
+)
+_PARENTHESES = re.compile(r"\s*\(([^)]*)\)")
+_SPACES = re.compile(r"\s+")
+_HYPHEN = re.compile(r"(?<=[a-z])-(?=[a-z])")
+_QUANTITY = r"\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?"
+_UNIT_ALTERNATIVES = "|".join(
+    re.escape(spelling)
+    for spelling in sorted(
+        (spelling for spellings in UNITS.values() for spelling in spellings), key=len, reverse=True
+    )
+)
+_LINE = re.compile(
+    rf"^(?:(?P<quantity>{_QUANTITY})(?:\s*(?:-|–|to)\s*(?P<quantity_max>{_QUANTITY}))?)?\s*"
+    rf"(?:(?P<unit>{_UNIT_ALTERNATIVES})\.?(?![a-z]))?\s*(?:of\s+)?(?P<rest>.*)$"
+)
+# "a pinch of salt", "one can of beans"
+_ARTICLE_QUANTITY = re.compile(rf"^(?:a|an|one)\s+(?=(?:{_UNIT_ALTERNATIVES})\b)")
+_AND = re.compile(r" and | & ")
+# "juice of 1 lemon" -> "lemon juice"
+_PART_OF = re.compile(rf"^(?P<part>juice|zest|zest and juice) of (?:(?:{_QUANTITY})\s+)?(?P<whole>.+)$")
+_UNIT_BY_SPELLING = {
+    spelling: unit for unit, spellings in UNITS.items() for spelling in spellings
+}
+_UNICODE_FRACTIONS = str.maketrans({
+    "½": " 1/2", "⅓": " 1/3", "⅔": " 2/3", "¼": " 1/4", "¾": " 3/4",
+    "⅕": " 1/5", "⅛": " 1/8", "⅜": " 3/8", "⅝": " 5/8", "⅞": " 7/8", "⁄": "/",
+})
+
+# Plurals the suffix rules get wrong, and words that only look plural.
+_IRREGULAR_PLURALS = {
+    "leaves": "leaf", "loaves": "loaf", "halves": "half", "knives": "knife",
+    "cookies": "cookie", "pies": "pie", "brownies": "brownie", "anchovies": "anchovy",
+    "potatoes": "potato", "tomatoes": "tomato", "mangoes": "mango", "avocados": "avocado",
+    "chives": "chives", "olives": "olive", "cloves": "clove", "shoes": "shoe",
+}
+_INVARIANT = frozenset(
+    "molasses asparagus hummus couscous swiss oats grits greens bass citrus lemongrass "
+    "hibiscus octopus schnapps watercress".split()
+)
+# Names that mean the same ingredient, after descriptors are removed.
+ALIASES = {
+    "all purpose flour": "flour", "plain flour": "flour",
+    "granulated sugar": "sugar", "white sugar": "sugar",
+    "kosher salt": "salt", "sea salt": "salt", "table salt": "salt",
+    "scallion": "green onion", "spring onion": "green onion",
+    "garlic clove": "garlic",
+}
+
+
+class ParsedIngredient(NamedTuple):
+    """One recipe ingredient line split into its parts; unit is canonical
+    (see UNITS) and name is singular, lower case and free of descriptors."""
+
+    quantity: Optional[float]
+    quantity_max: Optional[float]
+    unit: Optional[str]
+    name: str
+    notes: str
+
+
+def _number(text: Optional[str]) -> Optional[float]:
+    if not text:
+        return None
+    total = 0.0
+    for part in text.split():
+        if "/" in part:
+            numerator, denominator = part.split("/")
+            if int(denominator) == 0:
+                return None
+            total += int(numerator) / int(denominator)
+        else:
+            total += float(part)
+    return round(total, 3)
+
+
+def singularize(word: str) -> str:
+    if word in _IRREGULAR_PLURALS:
+        return _IRREGULAR_PLURALS[word]
+    if len(word) < 4 or word in _INVARIANT or not word.endswith("s") or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "xes", "zes", "oes")):
+        return word[:-2]
+    return word[:-1]
+
+
+def _singularize_last(name: str) -> str:
+    head, _space, last = name.rpartition(" ")
+    return f"{head} {singularize(last)}" if head else singularize(last)
+
+
+@functools.lru_cache(maxsize=8192)
+def parse_ingredient(line: str) -> ParsedIngredient:
+    """Parses a line such as "1 1/2 cups all-purpose flour, sifted" into
+    (1.5, None, "cup", "flour", "sifted"). Lines repeat a lot
+    across recipes ("1 tsp salt"), so results are memoised."""
+    text = _SPACES.sub(" ", (line or "").translate(_UNICODE_FRACTIONS).lower()).strip()
+    notes = [match.strip() for match in _PARENTHESES.findall(text)]
+    text = _PARENTHESES.sub("", text)
+    text, _comma, after = text.partition(",")
+    suffix = _NOTE_SUFFIX.search(text)
+    if suffix:
+        notes.append(suffix.group(0))
+        text = text[: suffix.start()]
+
+    match = _LINE.match(_ARTICLE_QUANTITY.sub("1 ", text.strip()))
+    rest = _HYPHEN.sub(" ", match["rest"])
+    rest, _or, alternative = rest.partition(" or ")
+    name_words, descriptors = [], []
+    for word in rest.split():
+        word = word.strip(".;:")
+        (descriptors if word in DESCRIPTORS else name_words).append(word)
+    name = _singularize_last(" ".join(name_words))
+    part_of = _PART_OF.match(name)
+    if part_of:
+        name = f"{_singularize_last(part_of['whole'])} {part_of['part']}"
+
+    notes[:0] = [" ".join(descriptors)] if descriptors else []
+    if alternative:
+        notes.append(f"or {alternative.strip()}")
+    if after.strip():
+        notes.append(after.strip())
+    unit = match["unit"]
+    return ParsedIngredient(
+        quantity=_number(match["quantity"]),
+        quantity_max=_number(match["quantity_max"]),
+        unit=_UNIT_BY_SPELLING[unit] if unit else None,
+        name=ALIASES.get(name, name),
+        notes=", ".join(note for note in notes if note),
+    )
+
+
+def parse_ingredients(lines: Iterable[str]) -> List[ParsedIngredient]:
+    """Parses a whole recipe's ingredient list."""
+    parse = parse_ingredient
+    return [parse(line) for line in lines if isinstance(line, str)]
+
+
+def ingredient_names(parsed: Iterable[ParsedIngredient]) -> List[str]:
+    """Distinct ingredient names in recipe order; "salt and pepper" counts as two."""
+    names = {}
+    for ingredient in parsed:
+        for name in _AND.split(ingredient.name):
+            name = _singularize_last(name.strip())
+            name = ALIASES.get(name, name)
+            if name:
+                names.setdefault(name, None)
+    return list(names)
@@ -0,0 +1,98 @@
+import re
+from typing import Dict, Optional, Sequence
+
+from app.features.chat.metrics import increment, read_counters
+from app.features.chat.response_cache import normalize_text
+
+METRIC_PREFIX = "intent-router"
+STATS = ("local", "llm", "llm_ms")
+
+# Whole-message patterns only: anything that also mentions food goes to the model.
+_INTENTS = (
+    (
+        "greeting",
+        re.compile(
+            r"^(hi+|hello+|hey+|hiya|howdy|yo|greetings|good (morning|afternoon|evening))"
+            r"( there)?( (chef|bot|assistant))?$"
+        ),
+        "Hello! I'm your recipe assistant. Tell me what you'd like to cook, or "
+        "list the ingredients you have and I'll suggest a recipe.",
+    ),
+    (
+        "thanks",
+        re.compile(
+            r"^((ok(ay)? )?(thanks+|thank you|thank u|thx|ty|cheers)( (so|very) much)?( a lot)?"
+            r"|(that s |that was )?(great|perfect|awesome|amazing|lovely)( thanks| thank you)?)$"
+        ),
+        "You're welcome! Let me know if you'd like another recipe or any cooking tips.",
+    ),
+    (
+        "goodbye",
+        re.compile(r"^(bye+|goodbye|good bye|see you( later)?|see ya|good night)$"),
+        "Goodbye, and happy cooking! Come back anytime you need a recipe.",
+    ),
+    (
+        "acknowledgement",
+        re.compile(r"^(ok(ay)?|k|cool|nice|got it|sounds good|alright|all right|sure)$"),
+        "Great! What would you like to cook next?",
+    ),
+)
+# After a question or offer from the assistant, these are answers to it
+# ("Would you like a vegan version?" - "sure") and go to the model.
+_ANSWER_INTENTS = frozenset({"acknowledgement"})
+_OFFER = re.compile(
+    r"\?|\b(would you like|do you want|want me to|shall i|should i|i can also|happy to)\b",
+    re.IGNORECASE,
+)
+
+
+def _last_assistant_message(conversation_history: Sequence[Dict]) -> str:
+    for message in reversed(conversation_history):
+        if message.get("sender") == "assistant":
+            return str(message.get("content", ""))
+    return ""
+
+
+def _asked_user(conversation_history: Sequence[Dict]) -> bool:
+    """True if the assistant's previous turn asked a question or offered something."""
+    return bool(_OFFER.search(_last_assistant_message(conversation_history)))
+
+
+class IntentRouter:
+    """Cheap rule-based stage in front of the model: greetings, thanks, goodbyes
+    and bare acknowledgements get a template reply, everything else is sent on.
+    An acknowledgement that answers the assistant's question is sent on too."""
+
+    def route(self, user_input: str, conversation_history: Sequence[Dict] = ()) -> Optional[Dict]:
+        """Returns a RecipeBotOutput-shaped reply, or None if the model is needed."""
+        text = normalize_text(user_input)
+        for intent, pattern, reply in _INTENTS:
+            if pattern.match(text):
+                if intent in _ANSWER_INTENTS and _asked_user(conversation_history):
+                    return None
+                increment(f"{METRIC_PREFIX}:local")
+                return {
+                    "response_type": "conversation",
+                    "conversation_details": {"response": reply},
+                }
+        return None
+
+    @staticmethod
+    def record_llm_call(elapsed_seconds: float) -> None:
+        increment(f"{METRIC_PREFIX}:llm")
+        increment(f"{METRIC_PREFIX}:llm_ms", int(elapsed_seconds * 1000))
+
+
+def intent_router_stats() -> Dict:
+    values = read_counters(f"{METRIC_PREFIX}:{stat}" for stat in STATS)
+    counts = {stat: values[f"{METRIC_PREFIX}:{stat}"] for stat in STATS}
+    total = counts["local"] + counts["llm"]
+    avg_llm_ms = counts["llm_ms"] / counts["llm"] if counts["llm"] else 0.0
+    return {
+        "answered_locally": counts["local"],
+        "sent_to_llm": counts["llm"],
+        "avoided_ratio": round(counts["local"] / total, 4) if total else 0.0,
+        "avg_llm_latency_ms": round(avg_llm_ms, 1),
+        # what the skipped calls would have cost at the observed average
+        "latency_saved_ms": round(counts["local"] * avg_llm_ms),
+    }
@@ -0,0 +1,207 @@
+import hashlib
+import hmac
+import json
+import logging
+import time
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from app.features.chat.accounting import TurnTrace, record_turn
+from app.features.chat.ai_func import get_recipe_response
+from app.features.chat.models import GenerationJob
+from app.features.chat.quota import GenerationSlot
+from app.features.chat.services import build_history, persist_turn
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    # seconds an idle worker waits before looking at the queue again
+    "POLL_INTERVAL": 1.0,
+    # seconds after which a running job is presumed lost with its worker
+    "STALE_AFTER": 300,
+    # claims per job, counting the ones lost with a worker
+    "MAX_ATTEMPTS": 2,
+    # longest wait, in seconds, between tries while the queue cannot be read
+    "MAX_BACKOFF": 30,
+    # hosts a callback_url may point at; empty turns push delivery off
+    "CALLBACK_ALLOWED_HOSTS": [],
+    "CALLBACK_TIMEOUT": 10,
+    # key of the X-Recipe-Signature HMAC-SHA256 header on callbacks
+    "CALLBACK_SECRET": "",
+}
+# queued jobs looked at per claim, so racing workers fall through to the next one
+CLAIM_BATCH = 5
+PENDING = (GenerationJob.QUEUED, GenerationJob.RUNNING)
+
+
+def jobs_config() -> Dict:
+    return {**DEFAULT_CONFIG, **getattr(settings, "RECIPE_GENERATION_JOBS", {})}
+
+
+def callback_allowed(url: str) -> bool:
+    """Callbacks only go to the configured hosts, so clients cannot make the
+    worker POST to arbitrary (e.g. internal) addresses."""
+    parts = urlsplit(url)
+    allowed = jobs_config()["CALLBACK_ALLOWED_HOSTS"]
+    return parts.scheme in ("http", "https") and parts.hostname in allowed
+
+
+def enqueue_generation(user, chat, message: str, slot: GenerationSlot, callback_url: str = "") -> GenerationJob:
+    """Queues a send_message turn; a single INSERT, the model is never awaited here."""
+    return GenerationJob.objects.create(
+        user=user,
+        chat=chat,
+        message=message,
+        generation_reserved=slot.reserved,
+        callback_url=callback_url,
+    )
+
+
+def job_payload(job: GenerationJob) -> Dict:
+    """What polling returns and callbacks carry; `result` is the send_message payload."""
+    return {
+        "job_id": str(job.id),
+        "status": job.status,
+        "chat_id": job.chat_id,
+        "result": job.result,
+        "error": job.error or None,
+    }
+
+
+def claim_next_job() -> Optional[GenerationJob]:
+    """Takes the oldest queued job. The conditional UPDATE ... WHERE status =
+    'queued' only succeeds for one worker, so no job is ever run twice at once."""
+    candidates = (
+        GenerationJob.objects.filter(status=GenerationJob.QUEUED)
+        .order_by("created_at")
+        .values_list("id", flat=True)[:CLAIM_BATCH]
+    )
+    for job_id in list(candidates):
+        claimed = GenerationJob.objects.filter(pk=job_id, status=GenerationJob.QUEUED).update(
+            status=GenerationJob.RUNNING, started_at=timezone.now(), attempts=F("attempts") + 1
+        )
+        if claimed:
+            return GenerationJob.objects.select_related("chat", "user__profile").get(pk=job_id)
+    return None
+
+
+def requeue_stale_jobs() -> int:
+    """Puts jobs whose worker died back in the queue, or fails them once they
+    have used up MAX_ATTEMPTS. Returns how many were requeued."""
+    config = jobs_config()
+    stale = GenerationJob.objects.filter(
+        status=GenerationJob.RUNNING,
+        started_at__lt=timezone.now() - timedelta(seconds=config["STALE_AFTER"]),
+    )
+    error = "The job was lost with its worker."
+    for job in stale.filter(attempts__gte=config["MAX_ATTEMPTS"]).select_related("user__profile"):
+        # conditional like claim_next_job: of two workers sweeping at once only
+        # one fails the job, so its quota slot is released once
+        job.finished_at = timezone.now()
+        failed = stale.filter(pk=job.pk).update(
+            status=GenerationJob.FAILED, result=None, error=error, finished_at=job.finished_at
+        )
+        if not failed:
+            continue
+        job.status, job.result, job.error = GenerationJob.FAILED, None, error
+        GenerationSlot(job.user.profile.pk, job.generation_reserved).release()
+        if job.callback_url:
+            deliver_callback(job)
+    return stale.filter(attempts__lt=config["MAX_ATTEMPTS"]).update(
+        status=GenerationJob.QUEUED, started_at=None
+    )
+
+
+def run_job(job: GenerationJob) -> None:
+    """Runs a claimed job the way send_message runs a turn and stores the payload."""
+    trace = TurnTrace()
+    user, chat = job.user, job.chat
+    profile = user.profile
+    slot = GenerationSlot(profile.pk, job.generation_reserved)
+    try:
+        with trace.phase("history"):
+            history = build_history(chat, job.message)
+        with trace.phase("llm"):
+            result = get_recipe_response(
+                user_input=job.message, conversation_history=history, trace=trace
+            )
+        slot.settle(result)
+        with trace.phase("persist"):
+            log = persist_turn(
+                user, profile, chat, job.message, result,
+                generation_reserved=slot.reserved, usage=trace.usage,
+            )
+    except Exception as e:
+        logger.exception("Generation job %s failed", job.id)
+        slot.release()
+        _finish(job, GenerationJob.FAILED, error=str(e))
+        return
+    record_turn(trace, log)
+    result["chat_id"] = chat.id
+    _finish(job, GenerationJob.DONE, result=result)
+
+
+def _finish(job: GenerationJob, status: str, result: Optional[Dict] = None, error: str = "") -> None:
+    job.status, job.result, job.error = status, result, error
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error", "finished_at"])
+    if job.callback_url:
+        deliver_callback(job)
+
+
+def deliver_callback(job: GenerationJob) -> bool:
+    """POSTs the job payload to its callback_url once; polling stays available
+    if that fails, so there is no retry."""
+    config = jobs_config()
+    body = json.dumps(job_payload(job), cls=DjangoJSONEncoder).encode()
+    headers = {"Content-Type": "application/json"}
+    if config["CALLBACK_SECRET"]:
+        signature = hmac.new(config["CALLBACK_SECRET"].encode(), body, hashlib.sha256).hexdigest()
+        headers["X-Recipe-Signature"] = f"sha256={signature}"
+    try:
+        response = httpx.post(
+            job.callback_url, content=body, headers=headers, timeout=config["CALLBACK_TIMEOUT"]
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.warning("Callback for generation job %s failed: %s", job.id, e)
+        return False
+    return True
+
+
+def run_worker(should_stop: Callable[[], bool], once: bool = False) -> int:
+    """Claims and runs jobs until should_stop() is true, or until the queue is
+    empty when `once` is set. Returns the number of jobs run."""
+    config = jobs_config()
+    poll_interval = config["POLL_INTERVAL"]
+    processed = failures = 0
+    while not should_stop():
+        try:
+            job = claim_next_job()
+            requeued = requeue_stale_jobs() if job is None else 0
+        except Exception:
+            # e.g. a dropped connection: keep the worker alive for the queued jobs
+            logger.exception("Generation worker could not read the job queue")
+            close_old_connections()
+            failures += 1
+            time.sleep(min(config["MAX_BACKOFF"], poll_interval * 2 ** failures))
+            continue
+        failures = 0
+        if job is None:
+            if requeued:
+                continue
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        processed += 1
+    return processed
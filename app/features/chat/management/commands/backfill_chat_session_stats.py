@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from app.features.chat.models import ChatMessage, ChatSession
+from app.features.chat.services import annotate_latest_message
+
+FIELDS = [
+    "last_message_preview", "last_message_type", "message_count", "last_activity_at",
+    "summarized_message_count",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute ChatSession.last_message_preview, last_message_type, "
+        "message_count, last_activity_at and summarized_message_count from the "
+        "messages, in batches. "
+        "updated_at is left alone, so the chat list order does not change."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        size = options["batch_size"]
+        summarized = (
+            ChatMessage.objects.filter(chat=OuterRef("pk"), id__lte=OuterRef("summary_until_message_id"))
+            .order_by()
+            .values("chat")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        last_id, done = 0, 0
+        while True:
+            batch = list(
+                annotate_latest_message(ChatSession.objects.filter(pk__gt=last_id))
+                .annotate(latest_summarized_count=Coalesce(Subquery(summarized), 0))
+                .order_by("pk")
+                .only("id", *FIELDS)[:size]
+            )
+            if not batch:
+                break
+            for chat in batch:
+                chat.last_message_preview = chat.latest_message_preview or ""
+                chat.last_message_type = chat.latest_message_type or ""
+                chat.message_count = chat.latest_message_count
+                chat.last_activity_at = chat.latest_message_at
+                chat.summarized_message_count = chat.latest_summarized_count
+            ChatSession.objects.bulk_update(batch, FIELDS)
+            last_id = batch[-1].pk
+            done += len(batch)
+        self.stdout.write(f"updated {done} chat sessions")
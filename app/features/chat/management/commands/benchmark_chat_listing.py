@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.accounts.models import User
+from app.features.chat import views
+from app.features.chat.models import ChatMessage, ChatSession
+from app.features.chat.recipes import store_recipe
+
+RECIPE = {
+    "title": "Banana Bread",
+    "overview/details": "Moist, sweet and easy to make.",
+    "rating": "4.7/5",
+    "ingredients": ["3 ripe bananas, mashed", "1/3 cup melted butter", "3/4 cup sugar"],
+    "ingrediants items": ["bananas", "butter", "sugar"],
+    "instructions": "Preheat the oven.\nMix everything.\nBake for 60 minutes.",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the chat sidebar for a user with many sessions: list_chats, which "
+        "returns every message of every session, versus the first page of "
+        "list_chat_sessions. Test data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=200)
+        parser.add_argument("--messages", type=int, default=40)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        with transaction.atomic():
+            user = User.objects.create_user(email="listing-benchmark@example.invalid")
+            self._make_sessions(user, options["sessions"], options["messages"])
+            auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+            for label, view, path in (
+                ("list_chats", views.list_chats, "/api/v1/chats/list/"),
+                ("list_chat_sessions", views.list_chat_sessions, "/api/v1/chats/sessions/"),
+            ):
+                best, queries, size = None, 0, 0
+                for _ in range(options["repeat"]):
+                    request = factory.get(path, **auth)
+                    with CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        response = view(request)
+                        response.render()
+                        elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                    queries, size = len(captured), len(response.content)
+                self.stdout.write(
+                    f"{label:<20} {best * 1000:9.2f} ms  {queries:>3} queries  {size / 1024:10.1f} KiB"
+                )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _make_sessions(user, sessions, messages):
+        recipe = store_recipe(RECIPE)
+        for number in range(sessions):
+            chat = ChatSession.objects.create(
+                user=user, title=f"benchmark {number}", message_count=messages,
+                last_message_preview=RECIPE["title"], last_message_type="recipe", last_activity_at=timezone.now(),
+            )
+            ChatMessage.objects.bulk_create(
+                ChatMessage(chat=chat, sender="user", content="Give me another recipe please")
+                if i % 2 == 0
+                else ChatMessage(chat=chat, sender="assistant", message_type="recipe", recipe=recipe)
+                for i in range(messages)
+            )
@@ -0,0 +1,86 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from app.features.chat.ai_func import AgentResult, RecipeBotOutput, RecipeOrchestrator
+from app.features.chat.pantry import PantryMatcher
+from app.features.chat.response_cache import RecipeResponseCache
+from app.features.chat.single_flight import SingleFlight
+
+# not a greeting, so the intent router sends it on to the (stubbed) model
+PROMPT = "What can I cook with rice and eggs?"
+STUB_OUTPUT = RecipeBotOutput(
+    response_type="conversation",
+    conversation_details={"response": "Happy cooking!"},
+)
+
+
+class StubRecipeAgent:
+    """Stands in for RecipeAgent with a fixed reply after a fixed model latency."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def invoke(self, user_input, conversation_history, timeout=None):
+        time.sleep(self.latency)
+        return AgentResult(STUB_OUTPUT, None)
+
+    async def ainvoke(self, user_input, conversation_history):
+        await asyncio.sleep(self.latency)
+        return AgentResult(STUB_OUTPUT, None)
+
+
+class Command(BaseCommand):
+    help = "Compare the sync (thread pool) and async chat pipelines against a stubbed LLM."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--latency", type=float, default=0.5, help="Stubbed LLM latency in seconds.")
+        parser.add_argument(
+            "--threads", type=int, default=8,
+            help="Sync concurrency; gunicorn --workers 4 --threads 2 gives 8.",
+        )
+
+    def handle(self, *args, **options):
+        orchestrator = RecipeOrchestrator(
+            recipe_agent=StubRecipeAgent(options["latency"]),
+            # every stubbed request is identical, so the cache would short-circuit it
+            response_cache=RecipeResponseCache({"ENABLED": False}),
+            # ...and single flight would merge them into one stub call
+            single_flight=SingleFlight({"ENABLED": False}),
+            # the prompt lists ingredients; keep pantry matching off the measured path
+            pantry=PantryMatcher({"ENABLED": False}),
+        )
+        total = options["requests"]
+
+        # Every request is issued at once, so latency includes time spent queued
+        # behind busy threads, as a client would see it.
+        def timed_sync(started):
+            orchestrator.run_analysis(PROMPT, [])
+            return time.perf_counter() - started
+
+        async def timed_async(started):
+            await orchestrator.arun_analysis(PROMPT, [])
+            return time.perf_counter() - started
+
+        async def run_async(started):
+            return await asyncio.gather(*(timed_async(started) for _ in range(total)))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+            sync_latencies = list(pool.map(timed_sync, [started] * total))
+        self._report(f"sync ({options['threads']} threads)", sync_latencies, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        async_latencies = asyncio.run(run_async(started))
+        self._report("async (1 event loop)", async_latencies, time.perf_counter() - started)
+
+    def _report(self, label, latencies, elapsed):
+        self.stdout.write(
+            f"{label:<22} {len(latencies) / elapsed:8.1f} req/s  "
+            f"mean {statistics.mean(latencies) * 1000:8.1f} ms  "
+            f"max {max(latencies) * 1000:8.1f} ms"
+        )
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.accounts.models import User
+from app.features.chat.history import build_history_window, fetch_history_rows
+from app.features.chat.models import ChatMessage, ChatSession
+
+RECIPE = {
+    "title": "Banana Bread",
+    "overview/details": "Moist, sweet and easy to make.",
+    "rating": "4.7/5",
+    "ingredients": ["3 ripe bananas, mashed", "1/3 cup melted butter", "3/4 cup sugar"] * 4,
+    "ingrediants items": ["bananas", "butter", "sugar"] * 4,
+    "instructions": "Preheat the oven.\nMix everything.\nBake for 60 minutes.\n" * 5,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time history building for sessions of 10, 1k and 10k messages: full model "
+        "instances versus the capped values_list fetch. Test data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create_user(email="history-benchmark@example.invalid")
+            for size in options["sizes"]:
+                chat = self._make_chat(user, size)
+                full = self._time(lambda: self._full_instances(chat), options["repeat"])
+                capped = self._time(lambda: self._capped_rows(chat), options["repeat"])
+                self.stdout.write(
+                    f"{size:>6} messages  instances {full[0] * 1000:8.2f} ms ({full[1]} rows)  "
+                    f"values_list {capped[0] * 1000:8.2f} ms ({capped[1]} rows)"
+                )
+            transaction.set_rollback(True)
+
+    def _make_chat(self, user, size):
+        chat = ChatSession.objects.create(user=user, title=f"benchmark {size}")
+        ChatMessage.objects.bulk_create(
+            ChatMessage(chat=chat, sender="user", content="Give me another recipe please")
+            if i % 2 == 0
+            else ChatMessage(chat=chat, sender="assistant", message_type="recipe", extra_data=RECIPE)
+            for i in range(size)
+        )
+        return chat
+
+    def _full_instances(self, chat):
+        messages = list(chat.messages.all().order_by("created_at"))
+        build_history_window(messages, "and a dessert?")
+        return len(messages)
+
+    def _capped_rows(self, chat):
+        rows = fetch_history_rows(chat.messages.all())
+        build_history_window(rows, "and a dessert?")
+        return len(rows)
+
+    def _time(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, rows
@@ -0,0 +1,86 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.features.chat.ingredients import parse_ingredient, parse_ingredients
+
+TEMPLATES = [
+    "{n} ripe bananas, mashed",
+    "{f} cup melted butter",
+    "{n} 1/2 cups all-purpose flour, sifted",
+    "{n}-{m} cloves garlic, minced",
+    "{n} (14 oz) can diced tomatoes",
+    "Salt and pepper to taste",
+    "{g}g spaghetti",
+    "½ tsp. baking soda",
+    "{n} large eggs, beaten",
+    "a pinch of salt",
+    "{n} tbsp extra-virgin olive oil, plus more for drizzling",
+    "Fresh parsley, chopped, for garnish",
+    "{n} boneless skinless chicken breasts",
+    "{n} cups cherry tomatoes, halved",
+    "{n} tablespoons butter or margarine",
+    "Juice of {n} lemon",
+    "{g} ml whole milk",
+    "{n} medium onions, finely chopped",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time ingredient-line parsing: the old last-word split, the parser on unique "
+        "lines (memo cleared) and on recipes whose lines repeat, in lines per second."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, default=50000)
+        parser.add_argument("--recipe-size", type=int, default=12)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        unique = [
+            rng.choice(TEMPLATES).format(
+                n=rng.randint(1, 400), m=rng.randint(401, 800),
+                f=f"{rng.randint(1, 9)}/{rng.randint(2, 16)}", g=rng.randint(10, 5000),
+            )
+            for _ in range(options["lines"])
+        ]
+        realistic = [
+            rng.choice(TEMPLATES).format(n=rng.randint(1, 4), m=rng.randint(5, 6), f="1/2", g=200)
+            for _ in range(options["lines"])
+        ]
+        size = options["recipe_size"]
+
+        def last_word(lines):
+            return [line.split(" ")[-1].lower() for line in lines]
+
+        def parse_cold(lines):
+            parse_ingredient.cache_clear()
+            for start in range(0, len(lines), size):
+                parse_ingredients(lines[start:start + size])
+
+        def parse_recipes(lines):
+            for start in range(0, len(lines), size):
+                parse_ingredients(lines[start:start + size])
+
+        for label, func, lines in (
+            ("last-word split", last_word, unique),
+            ("parser, unique lines", parse_cold, unique),
+            ("parser, repeated lines", parse_recipes, realistic),
+        ):
+            best = self._time(lambda: func(lines), options["repeat"])
+            self.stdout.write(
+                f"{label:<24} {len(lines) / best:>12,.0f} lines/s  ({best * 1000:.1f} ms)"
+            )
+
+    @staticmethod
+    def _time(func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,76 @@
+import heapq
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.features.chat.management.commands.benchmark_recipe_search import (BASES, FLAVOURS, PROTEINS,
+                                                                          VEGETABLES, make_recipes)
+from app.features.chat.models import Recipe
+from app.features.chat.pantry import PantryMatcher
+
+
+class Command(BaseCommand):
+    help = (
+        "Time top-k pantry matching over a synthetic corpus: coverage computed per "
+        "recipe in a Python scan versus the per-process inverted index. Test data "
+        "is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=100000)
+        parser.add_argument("--queries", type=int, default=100)
+        parser.add_argument("--scan-queries", type=int, default=5)
+        parser.add_argument("--pantry-size", type=int, default=8)
+        parser.add_argument("--limit", type=int, default=10)
+
+    def handle(self, *args, **options):
+        rng = random.Random(5)
+        vocabulary = PROTEINS + BASES + VEGETABLES + FLAVOURS
+        pantries = [rng.sample(vocabulary, options["pantry_size"]) for _ in range(options["queries"])]
+        limit = options["limit"]
+        with transaction.atomic():
+            make_recipes(rng, options["recipes"])
+            matcher = PantryMatcher()
+            started = time.perf_counter()
+            matcher.index.refresh()
+            self.stdout.write(
+                f"{options['recipes']:,} recipes indexed in {time.perf_counter() - started:.1f} s"
+            )
+
+            scan = [self._timed(lambda: self._scan(matcher, pantry, limit)) for pantry in
+                    pantries[:options["scan_queries"]]]
+            indexed = [self._timed(lambda: matcher.match(pantry, limit=limit)) for pantry in pantries]
+            self._report("full scan", scan)
+            self._report("indexed", indexed)
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _scan(matcher, pantry, limit):
+        pantry_words = [set(item.split()) for item in pantry]
+        staples = matcher.index.staples
+        scored = []
+        for recipe_id, names in Recipe.objects.values_list("id", "ingredient_items").iterator(chunk_size=5000):
+            names = [name for name in names if name not in staples]
+            covered = sum(1 for name in names if any(words <= set(name.split()) for words in pantry_words))
+            if names and covered >= len(names) * matcher.config["MIN_COVERAGE"]:
+                scored.append((covered / len(names), covered, recipe_id))
+        return heapq.nlargest(limit, scored)
+
+    @staticmethod
+    def _timed(func):
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
+
+    def _report(self, label, timings):
+        if not timings:
+            return
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{label:<10} {len(timings):>4} queries  p50 {statistics.median(timings) * 1000:9.2f} ms  "
+            f"p95 {p95 * 1000:9.2f} ms"
+        )
@@ -0,0 +1,147 @@
+import hashlib
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from app.features.chat.models import Recipe
+from app.features.chat.search import (InMemoryRecipeSearch, PostgresRecipeSearch,
+                                      ensure_search_indexes, index_recipes, ingredient_terms,
+                                      is_postgres, query_ingredients, text_terms)
+
+PROTEINS = [
+    "chicken breast", "chicken thigh", "beef", "ground beef", "pork", "salmon", "shrimp", "tofu",
+    "egg", "lentil", "chickpea", "turkey", "lamb", "cod", "tuna", "black bean", "sausage", "bacon",
+]
+BASES = ["rice", "pasta", "noodle", "quinoa", "potato", "bread", "tortilla", "couscous", "barley", "polenta"]
+VEGETABLES = [
+    "onion", "garlic", "tomato", "carrot", "spinach", "bell pepper", "broccoli", "mushroom",
+    "zucchini", "kale", "pea", "corn", "cabbage", "celery", "cauliflower", "eggplant", "leek",
+    "sweet potato", "green bean", "cucumber", "avocado", "green onion", "asparagus", "squash",
+]
+FLAVOURS = [
+    "salt", "pepper", "olive oil", "butter", "soy sauce", "lemon juice", "cumin", "paprika", "ginger",
+    "chili flake", "basil", "parsley", "cilantro", "honey", "thyme", "oregano", "coconut milk",
+    "parmesan", "cheddar", "yogurt", "lime juice", "sesame oil", "mustard", "vinegar", "cream",
+]
+STYLES = ["Roasted", "Spicy", "Creamy", "Garlic", "Lemon", "Crispy", "Smoky", "Herbed", "One-Pan", "Quick"]
+DISHES = ["Stir Fry", "Curry", "Casserole", "Salad", "Soup", "Tacos", "Bowl", "Skillet", "Stew", "Bake"]
+STEPS = [
+    "Heat the oil in a large pan over medium heat.", "Season generously and simmer until tender.",
+    "Roast in a hot oven until golden and crisp.", "Whisk the sauce and toss everything together.",
+    "Serve warm, garnished with fresh herbs.", "Grill until charred on both sides.",
+]
+
+
+def make_recipes(rng, count, batch=5000):
+    """Bulk-inserts `count` synthetic recipes with search and pantry keys filled."""
+    for start in range(0, count, batch):
+        recipes = []
+        for i in range(start, min(start + batch, count)):
+            protein = rng.choice(PROTEINS)
+            names = [protein, rng.choice(BASES), *rng.sample(VEGETABLES, 4), *rng.sample(FLAVOURS, 4)]
+            title = f"{rng.choice(STYLES)} {protein.title()} {rng.choice(DISHES)}"
+            details = {
+                "title": title,
+                "overview/details": f"A {rng.choice(STYLES).lower()} weeknight dish with {names[1]} and {names[2]}.",
+                "rating": f"{rng.randint(35, 50) / 10}/5",
+                "ingredients": [f"{rng.randint(1, 4)} cups {name}" for name in names],
+                "ingrediants items": names,
+                "instructions": "\n".join(rng.sample(STEPS, 4)),
+            }
+            recipes.append(Recipe(
+                fingerprint=hashlib.sha256(f"benchmark-{i}".encode()).hexdigest(),
+                title=title,
+                details=details,
+                ingredient_items=names,
+                ingredient_terms=ingredient_terms(names),
+            ))
+        Recipe.objects.bulk_create(recipes)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time recipe search over a synthetic corpus (use --recipes 1000000 for the 1M "
+        "case): a full scan filtered in Python, as the JSON log columns allowed, versus "
+        "the GIN indexes on PostgreSQL or the in-process inverted index elsewhere. "
+        "Test data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=100000)
+        parser.add_argument("--queries", type=int, default=100)
+        parser.add_argument("--scan-queries", type=int, default=3)
+        parser.add_argument("--limit", type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(11)
+        queries = [self._query(rng) for _ in range(options["queries"])]
+        limit = options["limit"]
+        with transaction.atomic():
+            started = time.perf_counter()
+            make_recipes(rng, options["recipes"])
+            self.stdout.write(
+                f"{options['recipes']:,} recipes inserted in {time.perf_counter() - started:.1f} s "
+                f"({connection.vendor})"
+            )
+
+            started = time.perf_counter()
+            if is_postgres():
+                index_recipes(Recipe.objects.all())
+                ensure_search_indexes()
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ANALYZE {Recipe._meta.db_table}")
+                backend = PostgresRecipeSearch()
+            else:
+                backend = InMemoryRecipeSearch()
+                backend.refresh()
+            self.stdout.write(f"{type(backend).__name__} built in {time.perf_counter() - started:.1f} s")
+
+            scan = [self._timed(lambda: self._scan(query, ingredients, limit)) for query, ingredients in
+                    queries[:options["scan_queries"]]]
+            indexed = [self._timed(lambda: backend.search(query, ingredients, limit)) for query, ingredients in
+                       queries]
+            self._report("full scan", scan)
+            self._report("indexed", indexed)
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _query(rng):
+        words = " ".join(rng.sample([rng.choice(STYLES), rng.choice(DISHES)], k=rng.randint(1, 2)))
+        ingredients = query_ingredients(rng.sample(PROTEINS + BASES + VEGETABLES, k=rng.randint(0, 2)))
+        return words.lower() if ingredients == [] or rng.random() < 0.5 else "", ingredients
+
+    @staticmethod
+    def _scan(query, ingredients, limit):
+        terms = set(text_terms(query))
+        matches = []
+        rows = Recipe.objects.order_by("-id").values_list("id", "title", "details", "ingredient_items")
+        for recipe_id, title, details, items in rows.iterator(chunk_size=5000):
+            words = " ".join(items).split()
+            if not all(name in items or name in words for name in ingredients):
+                continue
+            text = f"{title} {details.get('overview/details', '')} {details.get('instructions', '')}"
+            if terms and not terms <= set(text_terms(text)):
+                continue
+            matches.append(recipe_id)
+            if len(matches) == limit and not terms:
+                break
+        return matches
+
+    @staticmethod
+    def _timed(func):
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
+
+    def _report(self, label, timings):
+        if not timings:
+            return
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{label:<10} {len(timings):>4} queries  p50 {statistics.median(timings) * 1000:9.2f} ms  "
+            f"p95 {p95 * 1000:9.2f} ms"
+        )
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.features.chat.models import Ai_model_logs, ChatMessage
+from app.features.chat.recipes import store_recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Move recipes embedded in ChatMessage.extra_data and Ai_model_logs rows "
+        "into the shared Recipe store and link the rows to it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        size = options["batch_size"]
+        messages = self._backfill(
+            ChatMessage.objects.filter(
+                message_type="recipe", recipe__isnull=True, extra_data__isnull=False
+            ),
+            size,
+            self._link_message,
+            ["recipe", "extra_data"],
+        )
+        # error logs have no instructions; their log row is the only copy
+        logs = self._backfill(
+            Ai_model_logs.objects.filter(recipe__isnull=True).exclude(instructions=""),
+            size,
+            self._link_log,
+            ["recipe", "overview", "ingredients", "ingredient_items", "instructions"],
+        )
+        self.stdout.write(f"linked {messages} chat messages and {logs} logs to shared recipes")
+
+    @staticmethod
+    def _backfill(queryset, size, link, fields):
+        done = 0
+        while True:
+            # linked rows drop out of the filter, so each batch is the next one
+            with transaction.atomic():
+                batch = list(queryset.order_by("pk")[:size])
+                if not batch:
+                    return done
+                for row in batch:
+                    link(row)
+                queryset.model.objects.bulk_update(batch, fields)
+            done += len(batch)
+
+    @staticmethod
+    def _link_message(message):
+        message.recipe = store_recipe(message.extra_data)
+        message.extra_data = None
+
+    @staticmethod
+    def _link_log(log):
+        # the chat message of the same turn already counted this generation
+        log.recipe = store_recipe(
+            {
+                "title": log.title,
+                "overview/details": log.overview,
+                "rating": log.rating,
+                "ingredients": log.ingredients,
+                "ingrediants items": log.ingredient_items,
+                "instructions": log.instructions,
+            },
+            count=False,
+        )
+        log.overview, log.ingredients, log.ingredient_items, log.instructions = "", [], [], ""
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from app.features.chat.models import Recipe
+from app.features.chat.search import ensure_search_indexes, index_recipes, ingredient_terms
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the recipe search GIN indexes on PostgreSQL and fill ingredient "
+        "terms and tsvectors for recipes stored before search existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        size = options["batch_size"]
+        terms = 0
+        while True:
+            batch = list(
+                Recipe.objects.filter(ingredient_terms=[])
+                .exclude(ingredient_items=[])
+                .only("id", "ingredient_items")[:size]
+            )
+            if not batch:
+                break
+            for recipe in batch:
+                recipe.ingredient_terms = ingredient_terms(recipe.ingredient_items)
+            Recipe.objects.bulk_update(batch, ["ingredient_terms"])
+            terms += len(batch)
+
+        vectors = index_recipes(Recipe.objects.filter(search_vector__isnull=True))
+        indexes = "created or present" if ensure_search_indexes() else "not used off PostgreSQL"
+        self.stdout.write(f"ingredient terms for {terms} recipes, tsvectors for {vectors}; GIN indexes {indexes}")
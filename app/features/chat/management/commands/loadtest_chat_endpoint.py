@@ -0,0 +1,102 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.accounts.models import User, UserProfile
+
+ENDPOINTS = {
+    "sync": "/api/v1/chats/send_message/",
+    "stream": "/api/v1/chats/send_message/stream/",
+    "async": "/api/v1/chats/send_message/async/",
+}
+LOADTEST_EMAIL = "loadtest@example.com"
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive a running server's send_message endpoint at a fixed concurrency and "
+        "report throughput and p50/p95/p99 latency. Start the server in the deployment "
+        "mode under test with RECIPE_LLM_AGENT_CLASS=app.features.chat.fake_llm.FakeRecipeAgent, "
+        "e.g. `gunicorn _core.wsgi --workers 4 --threads 2` or "
+        "`gunicorn _core.asgi -k uvicorn.workers.UvicornWorker --workers 4`. Run it with DEBUG "
+        "off (or from outside INTERNAL_IPS): the debug toolbar otherwise dominates the latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="sync")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds.")
+        parser.add_argument("--label", default="", help="Deployment mode shown in the report.")
+
+    def handle(self, *args, **options):
+        token = self._access_token()
+        latencies, errors, elapsed = asyncio.run(self._run(options, token))
+        if not latencies:
+            raise CommandError(f"All {errors} requests failed.")
+        self._report(options, sorted(latencies), errors, elapsed)
+
+    @staticmethod
+    def _access_token():
+        # A subscriber, so the free-tier quota never turns requests away.
+        user, created = User.objects.get_or_create(email=LOADTEST_EMAIL)
+        if created:
+            user.set_unusable_password()
+            user.save(update_fields=["password"])
+        UserProfile.objects.update_or_create(user=user, defaults={"is_subs": True})
+        return str(RefreshToken.for_user(user).access_token)
+
+    async def _run(self, options, token):
+        url = options["base_url"].rstrip("/") + ENDPOINTS[options["endpoint"]]
+        headers = {"Authorization": f"Bearer {token}"}
+        limits = httpx.Limits(max_connections=options["concurrency"])
+        semaphore = asyncio.Semaphore(options["concurrency"])
+        latencies, errors = [], 0
+        run_id = uuid.uuid4().hex[:8]
+
+        async def one(client, index):
+            nonlocal errors
+            # Distinct prompts, across runs too, so the response cache does not answer them.
+            payload = {"message": f"What can I cook with rice and eggs? (run {run_id} request {index})"}
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json=payload)
+                    response.raise_for_status()
+                    # streamed responses are complete once the body has been read
+                    await response.aread()
+                except httpx.HTTPError as e:
+                    errors += 1
+                    self.stderr.write(f"request {index} failed: {e}")
+                    return
+                latencies.append(time.perf_counter() - started)
+
+        async with httpx.AsyncClient(
+            headers=headers, limits=limits, timeout=options["timeout"]
+        ) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(one(client, i) for i in range(options["requests"])))
+            return latencies, errors, time.perf_counter() - started
+
+    def _report(self, options, ordered, errors, elapsed):
+        label = options["label"] or options["base_url"]
+        ms = [value * 1000 for value in ordered]
+        self.stdout.write(
+            f"{label} {options['endpoint']} x{options['concurrency']}: "
+            f"{len(ordered) / elapsed:.1f} req/s  "
+            f"p50 {percentile(ms, 50):.1f} ms  p95 {percentile(ms, 95):.1f} ms  "
+            f"p99 {percentile(ms, 99):.1f} ms  mean {statistics.mean(ms):.1f} ms  "
+            f"errors {errors}/{len(ordered) + errors}"
+        )
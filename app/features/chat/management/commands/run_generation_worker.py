@@ -0,0 +1,43 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app.features.chat.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued send_message jobs (POST chats/send_message/job/) outside the web "
+        "workers. Each thread claims one job at a time from the database queue, so "
+        "several processes or hosts can share it. SIGTERM/SIGINT let running jobs finish."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4, help="Jobs run concurrently by this process.")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stop.set())
+        processed = []
+
+        def work():
+            try:
+                processed.append(run_worker(stop.is_set, once=options["once"]))
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=work, name=f"generation-worker-{i}")
+            for i in range(max(1, options["threads"]))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            # join with a timeout so the main thread keeps receiving signals
+            while thread.is_alive():
+                thread.join(timeout=1)
+        self.stdout.write(f"Ran {sum(processed)} generation jobs.")
@@ -0,0 +1,28 @@
+import logging
+from typing import Dict, Iterable
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+def increment(name: str, amount: int = 1, cache_alias: str = "default") -> None:
+    """Adds `amount` to a counter shared by all workers through the Django cache.
+
+    Counters are best-effort: a cache outage is logged and the sample dropped.
+    """
+    cache = caches[cache_alias]
+    try:
+        cache.add(name, 0, timeout=None)
+        try:
+            cache.incr(name, amount)
+        except ValueError:  # evicted between add() and incr()
+            cache.set(name, amount, timeout=None)
+    except Exception as e:
+        logger.warning("Could not record metric %s: %s", name, e)
+
+
+def read_counters(names: Iterable[str], cache_alias: str = "default") -> Dict[str, int]:
+    names = list(names)
+    values = caches[cache_alias].get_many(names)
+    return {name: int(values.get(name, 0)) for name in names}
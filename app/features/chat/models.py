@@ -1,4 +1,7 @@
+import uuid
+
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 
@@ -9,13 +12,72 @@ class ChatSession(models.Model):
         related_name="chat_sessions"
     )
     title = models.CharField(max_length=255, blank=True)
+    # Rolling summary of every message up to and including summary_until_message_id
+    summary = models.TextField(blank=True, default="")
+    summary_until_message_id = models.BigIntegerField(null=True, blank=True)
+    summary_updated_at = models.DateTimeField(null=True, blank=True)
+    # messages up to summary_until_message_id; message_count minus this is the
+    # unsummarised backlog (see summary.schedule_summary_update)
+    summarized_message_count = models.PositiveIntegerField(default=0)
+    # Denormalised from the newest message by services.persist_turn, in the
+    # same UPDATE that bumps updated_at, so chat lists need no per-row query.
+    # backfill_chat_session_stats recomputes them from the messages.
+    last_message_preview = models.CharField(max_length=255, blank=True, default="")
+    last_message_type = models.CharField(max_length=20, blank=True, default="")
+    message_count = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # chat list pages: WHERE user_id = ? ORDER BY updated_at DESC, id DESC
+            models.Index(fields=["user", "-updated_at", "-id"], name="chat_session_user_updated_idx"),
+        ]
+
     def __str__(self):
         return self.title or f"Chat {self.id}"
 
-    
+
+class Recipe(models.Model):
+    """One distinct generated recipe, shared by every chat message and log
+    that produced it (see recipes.store_recipe).
+
+    `fingerprint` hashes the normalised title and the set of canonical
+    ingredient names, so the same dish generated again for another user or
+    session maps to the existing row. `details` is the recipe exactly as the
+    model returned it, which is what chat messages render."""
+
+    fingerprint = models.CharField(max_length=64, unique=True)
+    title = models.CharField(max_length=255)
+    details = models.JSONField()
+    # canonical names and parsed lines of details["ingredients"] (see ingredients.py)
+    ingredient_items = models.JSONField(default=list, blank=True)
+    parsed_ingredients = models.JSONField(default=list, blank=True)
+    # search keys (see search.py): ingredient names and their words, and on
+    # PostgreSQL the weighted tsvector of title, overview and instructions.
+    # Both get GIN indexes from search.ensure_search_indexes.
+    ingredient_terms = models.JSONField(default=list, blank=True)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    times_generated = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_generated_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.title
+
+    def log_fields(self):
+        """The recipe columns of Ai_model_logs, read from the canonical row."""
+        details = self.details
+        return {
+            "overview": details.get("overview/details", details.get("overview", "")),
+            "rating": details.get("rating", "N/A"),
+            "ingredients": details.get("ingredients", []),
+            "ingredient_items": self.ingredient_items,
+            "instructions": details.get("instructions", ""),
+        }
+
+
 
 class ChatMessage(models.Model):
     MESSAGE_TYPES = [
@@ -35,27 +97,172 @@ class ChatMessage(models.Model):
     )
     message_type = models.CharField(max_length=20, choices=MESSAGE_TYPES, default="conversation")
     content = models.TextField(null=True, blank=True)  # for plain text messages
-    extra_data = models.JSONField(null=True, blank=True)  # for recipes or errors
+    extra_data = models.JSONField(null=True, blank=True)  # for errors; recipes live in `recipe`
+    recipe = models.ForeignKey(
+        Recipe, null=True, blank=True, on_delete=models.PROTECT, related_name="messages"
+    )
+    # Token usage of the model call(s) behind an assistant message; empty for
+    # user messages, template replies and cache hits.
+    model_name = models.CharField(max_length=64, blank=True, default="")
+    input_tokens = models.PositiveIntegerField(null=True, blank=True)  # includes cached ones
+    cached_input_tokens = models.PositiveIntegerField(null=True, blank=True)
+    output_tokens = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # history reads: WHERE chat_id = ? ORDER BY created_at DESC LIMIT n
+            models.Index(fields=["chat", "created_at"], name="chat_message_chat_created_idx"),
+        ]
+
     def __str__(self):
         return f"[{self.message_type}] {self.sender}: {self.content[:40] if self.content else ''}"
 
+    @property
+    def details(self):
+        """The structured payload: the shared recipe, or extra_data for errors
+        and for recipe messages saved before the recipe store existed."""
+        return self.recipe.details if self.recipe_id else self.extra_data
+
 
 class Ai_model_logs(models.Model):
     email = models.EmailField(null=True)
     title = models.CharField(max_length=255)
-    overview = models.TextField()
-    rating = models.CharField(max_length=10)
+    rating = models.CharField(max_length=10, blank=True, default="")
+    # Recipe logs reference the shared Recipe; the columns below are only
+    # filled for error logs (and for recipe logs older than the recipe store).
+    recipe = models.ForeignKey(
+        Recipe, null=True, blank=True, on_delete=models.PROTECT, related_name="logs"
+    )
+    overview = models.TextField(blank=True, default="")
     
     # Store ingredients list as JSON
-    ingredients = models.JSONField()
-    ingredient_items = models.JSONField()
-    
-    instructions = models.TextField()
+    ingredients = models.JSONField(default=list, blank=True)
+    ingredient_items = models.JSONField(default=list, blank=True)
     
+    instructions = models.TextField(blank=True, default="")
+
+    # Accounting for the turn that produced this log (see accounting.record_turn)
+    model_name = models.CharField(max_length=64, blank=True, default="")
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)  # includes cached ones
+    cached_prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    completion_tokens = models.PositiveIntegerField(null=True, blank=True)
+    cost_usd = models.DecimalField(max_digits=12, decimal_places=6, null=True, blank=True)
+    history_ms = models.PositiveIntegerField(null=True, blank=True)
+    llm_ms = models.PositiveIntegerField(null=True, blank=True)
+    persist_ms = models.PositiveIntegerField(null=True, blank=True)
+    total_ms = models.PositiveIntegerField(null=True, blank=True)
+    cache_hit = models.BooleanField(default=False)
+    error_class = models.CharField(max_length=100, blank=True, default="")
+
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+    def recipe_fields(self):
+        """overview, rating, ingredients, ingredient_items and instructions,
+        from the shared Recipe when the log has one."""
+        if self.recipe_id:
+            return self.recipe.log_fields()
+        return {
+            "overview": self.overview,
+            "rating": self.rating,
+            "ingredients": self.ingredients,
+            "ingredient_items": self.ingredient_items,
+            "instructions": self.instructions,
+        }
+
+
+class AiUsageDaily(models.Model):
+    """Per day and model totals of every chat turn, for the admin dashboard.
+    Rows are only ever incremented with F() expressions by accounting.record_turn;
+    model_name is empty for turns answered without a model call."""
+
+    day = models.DateField()
+    model_name = models.CharField(max_length=64, blank=True, default="")
+    turns = models.PositiveIntegerField(default=0)
+    cache_hits = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    cached_prompt_tokens = models.PositiveBigIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)
+    cost_usd = models.DecimalField(max_digits=14, decimal_places=6, default=0)
+    history_ms = models.PositiveBigIntegerField(default=0)
+    llm_ms = models.PositiveBigIntegerField(default=0)
+    persist_ms = models.PositiveBigIntegerField(default=0)
+    total_ms = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "model_name"], name="ai_usage_daily_day_model_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.model_name or 'no model'}: {self.turns} turns"
+
+
+class AiLatencyBucket(models.Model):
+    """Latency histogram per day, model and phase ("llm" or "total"): `count`
+    turns took at most `upper_ms` and more than the next lower bucket."""
+
+    day = models.DateField()
+    model_name = models.CharField(max_length=64, blank=True, default="")
+    phase = models.CharField(max_length=10)
+    upper_ms = models.PositiveIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "model_name", "phase", "upper_ms"], name="ai_latency_bucket_uniq"
+            ),
+        ]
+
+
+class GenerationJob(models.Model):
+    """A send_message turn queued for the generation worker (see jobs.py).
+
+    The web request only reserves the quota slot and inserts this row; the
+    worker claims it, runs the turn exactly like send_message and stores the
+    response payload in `result` for polling or the callback."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="generation_jobs"
+    )
+    chat = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name="generation_jobs")
+    message = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    # whether the web request took a free-tier quota slot the worker must settle
+    generation_reserved = models.BooleanField(default=False)
+    callback_url = models.URLField(blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # worker claims: WHERE status = 'queued' ORDER BY created_at LIMIT n
+            models.Index(fields=["status", "created_at"], name="generation_job_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.id} [{self.status}]"
@@ -0,0 +1,278 @@
+import re
+import threading
+from array import array
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set
+
+from django.conf import settings
+
+from app.features.chat.metrics import increment, read_counters
+from app.features.chat.models import Recipe
+from app.features.chat.search import query_ingredients
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "STAPLES": ["salt", "pepper", "black pepper", "water", "oil", "olive oil", "vegetable oil"],
+    "MIN_COVERAGE": 0.5,
+    "DEFAULT_RESULTS": 10,
+    "MAX_RESULTS": 50,
+    "CHAT_MIN_COVERAGE": 1.0,
+}
+
+METRIC_PREFIX = "pantry"
+# result["source"] of a reply served from a stored recipe (see quota.GenerationSlot.settle)
+SOURCE = "pantry"
+STATS = ("offered", "no_match")
+
+# "I have chicken, rice and broccoli", "what can I cook with eggs and spinach?"
+_PANTRY_MESSAGE = re.compile(
+    r"^\s*(?:i (?:only )?(?:have|got)|i(?: ha)?ve got|i've got|my (?:fridge|pantry|kitchen) has"
+    r"|in my (?:fridge|pantry|kitchen)(?: i have| there (?:is|are))?"
+    r"|(?:(?:what|which) (?:can|could|should) i (?:make|cook)"
+    r"|(?:make|cook|suggest|give) (?:me )?(?:something|anything|a recipe|a dish|a meal)"
+    r"|(?:a )?(?:recipes?|dish|meal|something|anything)) (?:with|using|from))"
+    r"\s*:?\s*(?P<items>[^.?!]+)"
+)
+_ITEM_SEPARATOR = re.compile(r",|;|\n|&|\band\b|\bplus\b")
+_ITEM_ARTICLE = re.compile(r"^(?:some|a few|a little|a bit of|a|an)\s+")
+
+
+class PantryMatch(NamedTuple):
+    recipe: Recipe
+    # share of the recipe's non-staple ingredients the pantry covers
+    coverage: float
+    missing: List[str]
+
+
+def pantry_config() -> Dict:
+    return {**DEFAULT_CONFIG, **getattr(settings, "RECIPE_PANTRY", {})}
+
+
+def parse_pantry_message(user_input: str) -> Optional[List[str]]:
+    """Canonical ingredient names from a message that lists what the user has,
+    or None when the message is not a pantry list."""
+    match = _PANTRY_MESSAGE.match((user_input or "").lower())
+    if match is None:
+        return None
+    items = [_ITEM_ARTICLE.sub("", item.strip()) for item in _ITEM_SEPARATOR.split(match["items"])]
+    names = query_ingredients(items)
+    return names if len(names) >= 2 else None
+
+
+def _with_bits(bits: int, positions) -> int:
+    """bits with every position in the ascending `positions` set."""
+    if len(positions) < 32:
+        for position in positions:
+            bits |= 1 << position
+        return bits
+    buffer = bytearray((positions[-1] >> 3) + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return bits | int.from_bytes(buffer, "little")
+
+
+class PantryIndex:
+    """Bitsets over the shared Recipe table: bit p of a name's bitset is set
+    when the recipe at position p uses that ingredient. Recipes are immutable
+    once stored, so refresh() only reads rows with an id above the last one.
+
+    A pantry item covers every ingredient whose name contains all its words
+    ("chicken" covers "chicken breast"). Matching adds up the covered names'
+    bitsets with bit-sliced adders, so plane j holds bit j of every recipe's
+    covered-ingredient count, then reads recipes off per (size, count) group
+    in order of coverage until `limit` are found.
+
+    Names used by at least 1/DENSE_FRACTION of the recipes keep their bitset
+    between calls, which costs at most twice their postings; rarer names are
+    rebuilt from their postings on each call."""
+
+    DENSE_FRACTION = 64
+
+    def __init__(self, staples: Iterable[str]):
+        self.staples: FrozenSet[str] = frozenset(staples)
+        self._lock = threading.Lock()
+        self._name_ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._words: Dict[str, Set[int]] = {}
+        # per name: ascending positions of the recipes using it, and cached bitsets
+        self._postings: List[array] = []
+        self._bitsets: Dict[int, int] = {}
+        # per position: recipe id; per non-staple ingredient count: bitset of recipes
+        self._recipe_ids = array("q")
+        self._by_size: Dict[int, int] = {}
+        self._last_id = 0
+
+    def _name_id(self, name: str) -> int:
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+            self._postings.append(array("I"))
+            for word in name.split():
+                self._words.setdefault(word, set()).add(name_id)
+        return name_id
+
+    def refresh(self) -> None:
+        rows = (
+            Recipe.objects.filter(id__gt=self._last_id)
+            .order_by("id")
+            .values_list("id", "ingredient_items")
+        )
+        by_size: Dict[int, List[int]] = {}
+        cached: Dict[int, List[int]] = {}
+        for recipe_id, names in rows.iterator(chunk_size=5000):
+            names = [name for name in dict.fromkeys(names) if name not in self.staples]
+            position = len(self._recipe_ids)
+            self._recipe_ids.append(recipe_id)
+            by_size.setdefault(len(names), []).append(position)
+            for name in names:
+                name_id = self._name_id(name)
+                self._postings[name_id].append(position)
+                if name_id in self._bitsets:
+                    cached.setdefault(name_id, []).append(position)
+            self._last_id = recipe_id
+        for name_id, positions in cached.items():
+            self._bitsets[name_id] = _with_bits(self._bitsets[name_id], positions)
+        for size, positions in by_size.items():
+            self._by_size[size] = _with_bits(self._by_size.get(size, 0), positions)
+
+    def _bitset(self, name_id: int) -> int:
+        bits = self._bitsets.get(name_id)
+        if bits is None:
+            postings = self._postings[name_id]
+            bits = _with_bits(0, postings)
+            if len(postings) * self.DENSE_FRACTION >= len(self._recipe_ids):
+                self._bitsets[name_id] = bits
+        return bits
+
+    def covered_names(self, pantry: Iterable[str]) -> Set[str]:
+        with self._lock:
+            return {self._names[name_id] for name_id in self._covered_ids(pantry)}
+
+    def _covered_ids(self, pantry: Iterable[str]) -> Set[int]:
+        covered = set()
+        for item in pantry:
+            word_sets = sorted((self._words.get(word, set()) for word in item.split()), key=len)
+            if word_sets:
+                covered |= set.intersection(*word_sets)
+        return covered
+
+    def match(self, pantry: Iterable[str], limit: int, min_coverage: float) -> List[tuple]:
+        """(recipe id, coverage) of the best `limit` recipes: highest coverage,
+        then most covered ingredients, then newest."""
+        with self._lock:
+            self.refresh()
+            planes: List[int] = []
+            for name_id in self._covered_ids(pantry):
+                carry = self._bitset(name_id)
+                for j, plane in enumerate(planes):
+                    planes[j], carry = plane ^ carry, plane & carry
+                    if not carry:
+                        break
+                else:
+                    planes.append(carry)
+            if not planes:
+                return []
+
+            groups = sorted(
+                (
+                    (count / size, count, size)
+                    for size in self._by_size
+                    if size
+                    for count in range(min(size, (1 << len(planes)) - 1), 0, -1)
+                    if count >= size * min_coverage
+                ),
+                reverse=True,
+            )
+            results = []
+            for coverage, count, size in groups:
+                matched = self._by_size[size]
+                for j, plane in enumerate(planes):
+                    matched &= plane if count >> j & 1 else ~plane
+                    if not matched:
+                        break
+                while matched and len(results) < limit:
+                    position = matched.bit_length() - 1
+                    results.append((self._recipe_ids[position], coverage))
+                    matched ^= 1 << position
+                if len(results) >= limit:
+                    break
+            return results
+
+
+class PantryMatcher:
+    """Ranks stored recipes by how much of them a user's pantry covers, for the
+    pantry API and for answering ingredient-list chat messages without a
+    model call (see RecipeOrchestrator._answer_without_model)."""
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = {**pantry_config(), **(config or {})}
+        self.index = PantryIndex(self.config["STAPLES"])
+
+    def match(
+        self, pantry: Iterable[str], limit: Optional[int] = None, min_coverage: Optional[float] = None
+    ) -> List[PantryMatch]:
+        names = query_ingredients(pantry)
+        if not names:
+            return []
+        limit = min(limit or self.config["DEFAULT_RESULTS"], self.config["MAX_RESULTS"])
+        if min_coverage is None:
+            min_coverage = self.config["MIN_COVERAGE"]
+        ranked = self.index.match(names, limit, min_coverage)
+        if not ranked:
+            return []
+        recipes = Recipe.objects.only("id", "title", "details", "ingredient_items", "times_generated").in_bulk(
+            [recipe_id for recipe_id, _coverage in ranked]
+        )
+        covered = self.index.covered_names(names)
+        return [
+            PantryMatch(
+                recipes[recipe_id],
+                round(coverage, 4),
+                [
+                    name for name in recipes[recipe_id].ingredient_items
+                    if name not in covered and name not in self.index.staples
+                ],
+            )
+            for recipe_id, coverage in ranked
+            if recipe_id in recipes
+        ]
+
+    def offer(self, user_input: str, conversation_history: List[Dict]) -> Optional[Dict]:
+        """A stored recipe the listed ingredients fully make, as a
+        RecipeBotOutput-shaped reply, or None to generate one. Recipes already
+        shown in this conversation are skipped."""
+        min_coverage = self.config["CHAT_MIN_COVERAGE"]
+        if not self.config["ENABLED"] or min_coverage is None:
+            return None
+        pantry = parse_pantry_message(user_input)
+        if pantry is None:
+            return None
+        shown = " ".join(str(message.get("content", "")) for message in conversation_history).lower()
+        for found in self.match(pantry, limit=5, min_coverage=min_coverage):
+            if found.recipe.title.lower() not in shown:
+                increment(f"{METRIC_PREFIX}:offered")
+                return {"response_type": "recipe", "recipe_details": found.recipe.details, "source": SOURCE}
+        increment(f"{METRIC_PREFIX}:no_match")
+        return None
+
+
+def pantry_stats() -> Dict:
+    values = read_counters(f"{METRIC_PREFIX}:{stat}" for stat in STATS)
+    counts = {stat: values[f"{METRIC_PREFIX}:{stat}"] for stat in STATS}
+    asked = counts["offered"] + counts["no_match"]
+    counts["offered_ratio"] = round(counts["offered"] / asked, 4) if asked else 0.0
+    return counts
+
+
+_matcher: Optional[PantryMatcher] = None
+_matcher_lock = threading.Lock()
+
+
+def get_pantry_matcher() -> PantryMatcher:
+    """Returns the process-wide matcher (its index is per process)."""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = PantryMatcher()
+    return _matcher
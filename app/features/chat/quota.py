@@ -0,0 +1,54 @@
+from django.db.models import F
+
+from app.accounts.models import UserProfile
+
+FREE_RECIPE_LIMIT = 3
+
+PLAN_UPDATE_RESPONSE = {
+    "error": "You have already generated your free 3 recipe. Please upgrade your plan",
+    "error_type": "plan_update_message",
+}
+
+
+class GenerationSlot:
+    """A free-tier recipe generation reserved before the model is called.
+
+    The slot is kept when the model generates a recipe and released otherwise,
+    so only generated recipes count against the quota; a stored recipe served
+    without a model call (result["source"], e.g. a pantry match) does not.
+    Subscribers get an unmetered slot.
+    """
+
+    def __init__(self, profile_id, reserved):
+        self.profile_id = profile_id
+        self.reserved = reserved
+
+    def release(self):
+        if not self.reserved:
+            return
+        UserProfile.objects.filter(pk=self.profile_id, recipe_generate__gt=0).update(
+            recipe_generate=F("recipe_generate") - 1
+        )
+        self.reserved = False
+
+    def settle(self, result):
+        """Keeps the slot for a generated recipe, gives it back for anything else."""
+        if result.get("response_type") != "recipe" or result.get("source"):
+            self.release()
+
+
+def reserve_generation_slot(profile):
+    """Atomically takes one free generation before any model call is made.
+
+    A single conditional UPDATE ... WHERE recipe_generate < limit both checks and
+    increments the counter, so concurrent requests cannot all pass the check.
+    Returns None when the free quota is used up.
+    """
+    if profile.is_subs is not False:
+        return GenerationSlot(profile.pk, reserved=False)
+    reserved = UserProfile.objects.filter(
+        pk=profile.pk, recipe_generate__lt=FREE_RECIPE_LIMIT
+    ).update(recipe_generate=F("recipe_generate") + 1)
+    if not reserved:
+        return None
+    return GenerationSlot(profile.pk, reserved=True)
@@ -0,0 +1,422 @@
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from app.features.chat.metrics import increment, read_counters
+from app.features.chat.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    # django-redis cache alias whose Redis holds buckets shared by all workers;
+    # None (or any other cache backend) falls back to FILE_PATH
+    "CACHE_ALIAS": None,
+    # SQLite file holding buckets shared by the workers of one host; None keeps
+    # the buckets in each process
+    "FILE_PATH": os.path.join(tempfile.gettempdir(), "recipe-llm-rate-limit.sqlite3"),
+    # per-process buckets get 1/LOCAL_WORKERS of each limit
+    "LOCAL_WORKERS": int(os.getenv("WEB_CONCURRENCY", "1")),
+    # seconds a call may queue for budget before it is shed
+    "MAX_WAIT": 10,
+    # completion tokens counted against TPM per request, on top of the prompt
+    "OUTPUT_TOKENS": 700,
+    # calls to one model in flight per process; None for no limit
+    "MAX_CONCURRENCY": None,
+    # {"model": {"RPM": requests, "TPM": tokens}} per minute; unlisted models are not limited
+    "LIMITS": {},
+}
+
+KEY_PREFIX = "llm-rate-limit"
+STATS = ("calls", "queued", "shed", "wait_ms")
+# tokens per chat message the API adds around its content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+Bucket = Tuple[str, float, float, float]  # key, capacity, refill per second, cost
+
+# Takes `cost` from every bucket in KEYS, or from none of them. Returns the
+# seconds until all of them could pay, "0" when they just did.
+TAKE_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end  -- needed before writes after TIME on Redis < 5
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local wait = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+  local capacity, rate, cost = tonumber(ARGV[i*3-2]), tonumber(ARGV[i*3-1]), tonumber(ARGV[i*3])
+  local state = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(state[1]) or capacity
+  local ts = tonumber(state[2]) or now
+  tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+  levels[i] = tokens
+  if tokens < cost then wait = math.max(wait, (cost - tokens) / rate) end
+end
+for i, key in ipairs(KEYS) do
+  local capacity, rate, cost = tonumber(ARGV[i*3-2]), tonumber(ARGV[i*3-1]), tonumber(ARGV[i*3])
+  local tokens = levels[i]
+  if wait == 0 then tokens = tokens - cost end
+  redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+  redis.call('EXPIRE', key, math.ceil(capacity / rate) + 60)
+end
+return tostring(wait)
+"""
+
+
+class LoadShedError(Exception):
+    """A model call refused locally, before it reached the provider, because
+    waiting for capacity would take longer than MAX_WAIT."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_seconds(self) -> int:
+        return max(1, math.ceil(self.retry_after))
+
+
+class RateLimitExceeded(LoadShedError):
+    """The model's requests- or tokens-per-minute budget is used up."""
+
+
+class ConcurrencyLimitExceeded(LoadShedError):
+    """MAX_CONCURRENCY calls to the model are already in flight in this process."""
+
+
+def rate_limit_config() -> Dict:
+    return {**DEFAULT_CONFIG, **getattr(settings, "RECIPE_LLM_RATE_LIMIT", {})}
+
+
+def estimate_prompt_tokens(user_input: str, conversation_history: List[Dict]) -> int:
+    """tiktoken count of the messages a prompt is built from, for agents that
+    cannot count their own prompt (see RecipeAgent.prompt_tokens)."""
+    contents = [str(message.get("content", "")) for message in conversation_history]
+    return sum(
+        count_tokens(content) + MESSAGE_OVERHEAD_TOKENS for content in [*contents, user_input]
+    )
+
+
+Levels = Dict[str, Tuple[float, float]]  # key: tokens, timestamp
+
+
+def _take_from(levels: Levels, buckets: List[Bucket], now: float) -> Tuple[float, Levels]:
+    """TAKE_SCRIPT over `levels`: the seconds until every bucket could pay, 0.0
+    when they just did, and the levels to store back."""
+    current, wait = {}, 0.0
+    for key, capacity, rate, cost in buckets:
+        tokens, ts = levels.get(key, (capacity, now))
+        tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+        current[key] = tokens
+        if tokens < cost:
+            wait = max(wait, (cost - tokens) / rate)
+    if wait == 0:
+        for key, _capacity, _rate, cost in buckets:
+            current[key] -= cost
+    return wait, {key: (tokens, now) for key, tokens in current.items()}
+
+
+class LocalBucketStore:
+    """Token buckets in this process; same semantics as TAKE_SCRIPT."""
+
+    def __init__(self):
+        self._levels: Levels = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets: List[Bucket]) -> float:
+        with self._lock:
+            wait, levels = _take_from(self._levels, buckets, time.monotonic())
+            self._levels.update(levels)
+        return wait
+
+
+class FileBucketStore:
+    """Token buckets in a SQLite file, shared by every worker process on the
+    host; BEGIN IMMEDIATE serialises their takes. Same semantics as TAKE_SCRIPT."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connection()  # an unusable path fails here, at startup
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def take(self, buckets: List[Bucket]) -> float:
+        connection = self._connection()
+        keys = [key for key, *_ in buckets]
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                f"SELECT key, tokens, ts FROM buckets WHERE key IN ({', '.join('?' * len(keys))})", keys
+            )
+            # wall-clock time: monotonic clocks are not comparable between processes
+            wait, levels = _take_from({key: (tokens, ts) for key, tokens, ts in rows}, buckets, time.time())
+            connection.executemany(
+                "INSERT OR REPLACE INTO buckets (key, tokens, ts) VALUES (?, ?, ?)",
+                [(key, tokens, ts) for key, (tokens, ts) in levels.items()],
+            )
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return wait
+
+
+class RedisBucketStore:
+    """Token buckets in Redis, taken atomically by TAKE_SCRIPT."""
+
+    def __init__(self, client):
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    def take(self, buckets: List[Bucket]) -> float:
+        keys = [key for key, *_ in buckets]
+        args = [value for _key, *values in buckets for value in values]
+        return float(self._take(keys=keys, args=args))
+
+
+class ConcurrencyGate:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def try_enter(self) -> bool:
+        with self._condition:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def enter(self, timeout: float) -> bool:
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.in_flight < self.limit, timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+
+class RateLimiter:
+    """Keeps calls to each model within its RPM/TPM limits and MAX_CONCURRENCY.
+
+    A call takes one request and its estimated tokens from the model's two
+    token buckets. When they cannot pay yet the call queues for up to MAX_WAIT
+    seconds, then it is shed with a LoadShedError instead of being sent into a
+    429. Buckets live in Redis when CACHE_ALIAS is a django-redis cache, so all
+    workers share one budget; otherwise in the FILE_PATH SQLite file, shared by
+    the workers of one host; and only without either in this process, with
+    1/LOCAL_WORKERS of each limit.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = {**DEFAULT_CONFIG, **(config or rate_limit_config())}
+        self.local_store = LocalBucketStore()
+        self.shared_store = self._shared_store() or self._file_store()
+        if self.shared_store is None and self.config["ENABLED"] and self.config["LIMITS"]:
+            logger.warning(
+                "Rate limit buckets are per process; each worker gets 1/%s of the limits (LOCAL_WORKERS)",
+                self.config["LOCAL_WORKERS"],
+            )
+        self._gates: Dict[str, ConcurrencyGate] = {}
+        self._gates_lock = threading.Lock()
+
+    def _file_store(self) -> Optional[FileBucketStore]:
+        path = self.config["FILE_PATH"]
+        if not path:
+            return None
+        try:
+            return FileBucketStore(path)
+        except sqlite3.Error as e:
+            logger.warning("Rate limit bucket file %s unavailable: %s", path, e)
+            return None
+
+    def _shared_store(self) -> Optional[RedisBucketStore]:
+        alias = self.config["CACHE_ALIAS"]
+        if not alias:
+            return None
+        client = getattr(caches[alias], "client", None)
+        if not hasattr(client, "get_client"):
+            return None  # not django-redis
+        try:
+            return RedisBucketStore(client.get_client(write=True))
+        except Exception as e:
+            logger.warning("Shared rate limit buckets unavailable: %s", e)
+            return None
+
+    def _buckets(self, model: str, tokens: int, shared: bool) -> List[Bucket]:
+        limits = self.config["LIMITS"].get(model)
+        if not limits:
+            return []
+        share = 1 if shared else max(1, self.config["LOCAL_WORKERS"])
+        buckets = []
+        for name, cost in (("RPM", 1), ("TPM", tokens + self.config["OUTPUT_TOKENS"])):
+            if limits.get(name):
+                capacity = limits[name] / share
+                # a call larger than the whole bucket waits for a full one
+                buckets.append((f"{KEY_PREFIX}:{model}:{name}", capacity, capacity / 60, min(cost, capacity)))
+        return buckets
+
+    def _take(self, model: str, tokens: int) -> float:
+        if self.shared_store is not None:
+            buckets = self._buckets(model, tokens, shared=True)
+            if not buckets:
+                return 0.0
+            try:
+                return self.shared_store.take(buckets)
+            except Exception as e:  # a Redis outage degrades to per-process buckets
+                logger.warning("Shared rate limit buckets failed, using per-process ones: %s", e)
+        buckets = self._buckets(model, tokens, shared=False)
+        return self.local_store.take(buckets) if buckets else 0.0
+
+    def _shed(self, model: str, wait: float) -> RateLimitExceeded:
+        self._count("shed")
+        return RateLimitExceeded(
+            f"Rate limit budget for {model} is used up; retry in {wait:.1f}s.", retry_after=wait
+        )
+
+    def acquire(self, model: str, tokens: int) -> None:
+        """Blocks until the call fits the model's limits, or raises RateLimitExceeded."""
+        if not self.config["ENABLED"]:
+            return
+        self._count("calls")
+        deadline = time.monotonic() + self.config["MAX_WAIT"]
+        started = time.monotonic()
+        while True:
+            wait = self._take(model, tokens)
+            if wait == 0:
+                break
+            if time.monotonic() + wait > deadline:
+                raise self._shed(model, wait)
+            time.sleep(wait)
+        self._record_wait(started)
+
+    async def aacquire(self, model: str, tokens: int) -> None:
+        """Async counterpart of acquire(); queues with asyncio.sleep."""
+        if not self.config["ENABLED"]:
+            return
+        await sync_to_async(self._count)("calls")
+        deadline = time.monotonic() + self.config["MAX_WAIT"]
+        started = time.monotonic()
+        while True:
+            wait = await sync_to_async(self._take)(model, tokens)
+            if wait == 0:
+                break
+            if time.monotonic() + wait > deadline:
+                raise await sync_to_async(self._shed)(model, wait)
+            await asyncio.sleep(wait)
+        await sync_to_async(self._record_wait)(started)
+
+    def try_acquire(self, model: str, tokens: int) -> bool:
+        """Takes the budget only if it is there right now (for optional calls such as hedges)."""
+        return not self.config["ENABLED"] or self._take(model, tokens) == 0
+
+    def _gate(self, model: str) -> Optional[ConcurrencyGate]:
+        limit = self.config["MAX_CONCURRENCY"]
+        if not self.config["ENABLED"] or not limit:
+            return None
+        with self._gates_lock:
+            if model not in self._gates:
+                self._gates[model] = ConcurrencyGate(limit)
+            return self._gates[model]
+
+    def _busy(self, model: str) -> ConcurrencyLimitExceeded:
+        self._count("shed")
+        return ConcurrencyLimitExceeded(
+            f"Too many {model} calls in flight.", retry_after=self.config["MAX_WAIT"]
+        )
+
+    @contextmanager
+    def slot(self, model: str):
+        """Holds one of the model's MAX_CONCURRENCY in-flight slots."""
+        gate = self._gate(model)
+        if gate is None:
+            yield
+            return
+        if not gate.enter(self.config["MAX_WAIT"]):
+            raise self._busy(model)
+        try:
+            yield
+        finally:
+            gate.leave()
+
+    @asynccontextmanager
+    async def aslot(self, model: str):
+        gate = self._gate(model)
+        if gate is None:
+            yield
+            return
+        deadline = time.monotonic() + self.config["MAX_WAIT"]
+        while not gate.try_enter():
+            if time.monotonic() >= deadline:
+                raise await sync_to_async(self._busy)(model)
+            await asyncio.sleep(0.05)
+        try:
+            yield
+        finally:
+            gate.leave()
+
+    def _record_wait(self, started: float) -> None:
+        wait_ms = int((time.monotonic() - started) * 1000)
+        if wait_ms:
+            self._count("queued")
+            self._count("wait_ms", wait_ms)
+
+    @staticmethod
+    def _count(stat: str, amount: int = 1) -> None:
+        increment(f"{KEY_PREFIX}:stats:{stat}", amount)
+
+
+def rate_limit_stats() -> Dict:
+    values = read_counters(f"{KEY_PREFIX}:stats:{stat}" for stat in STATS)
+    counts = {stat: values[f"{KEY_PREFIX}:stats:{stat}"] for stat in STATS}
+    wait_ms = counts.pop("wait_ms")
+    counts["avg_queue_ms"] = round(wait_ms / counts["queued"], 1) if counts["queued"] else 0.0
+    counts["shed_ratio"] = round(counts["shed"] / counts["calls"], 4) if counts["calls"] else 0.0
+    return counts
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide limiter; its per-process buckets and gates are shared through it."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter()
+    return _rate_limiter
+
+
+def _reset_process_state() -> None:
+    global _rate_limiter, _rate_limiter_lock
+    _rate_limiter = None
+    _rate_limiter_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_process_state)
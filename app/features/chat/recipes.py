@@ -0,0 +1,47 @@
+import hashlib
+from typing import Dict, Iterable
+
+from django.db.models import F
+from django.utils import timezone
+
+from app.features.chat.ingredients import ingredient_names, parse_ingredients
+from app.features.chat.models import Recipe
+from app.features.chat.response_cache import normalize_text
+from app.features.chat.search import index_recipes, ingredient_terms
+
+
+def recipe_fingerprint(title: str, names: Iterable[str]) -> str:
+    """sha256 of the normalised title and the sorted set of canonical
+    ingredient names: "Banana Bread!" with ["3 ripe bananas", "1/3 cup
+    melted butter"] matches "banana bread" with ["butter", "2 bananas"]."""
+    key = f"{normalize_text(title)}\n{'|'.join(sorted(set(names)))}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def store_recipe(recipe_details: Dict, count: bool = True) -> Recipe:
+    """Returns the canonical Recipe for a generated recipe, inserting it the
+    first time this fingerprint is seen. A repeat keeps the stored details
+    and, with `count`, bumps times_generated with an F() update.
+
+    Two turns inserting the same new recipe at once are safe: get_or_create
+    retries the read when the unique fingerprint insert loses the race."""
+    parsed = parse_ingredients(recipe_details.get("ingredients", []))
+    names = ingredient_names(parsed)
+    title = recipe_details.get("title", "Recipe")
+    recipe, created = Recipe.objects.get_or_create(
+        fingerprint=recipe_fingerprint(title, names),
+        defaults={
+            "title": title[:255],
+            "details": recipe_details,
+            "ingredient_items": names,
+            "parsed_ingredients": [ingredient._asdict() for ingredient in parsed],
+            "ingredient_terms": ingredient_terms(names),
+        },
+    )
+    if created:
+        index_recipes(Recipe.objects.filter(pk=recipe.pk))
+    elif count:
+        Recipe.objects.filter(pk=recipe.pk).update(
+            times_generated=F("times_generated") + 1, last_generated_at=timezone.now()
+        )
+    return recipe
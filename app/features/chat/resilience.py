@@ -0,0 +1,373 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+
+import httpx
+import openai
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from tenacity import (AsyncRetrying, Retrying, retry_if_exception_type,
+                      stop_after_attempt, stop_after_delay,
+                      wait_random_exponential)
+
+from app.features.chat.rate_limit import estimate_prompt_tokens, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    # seconds one HTTP call to the provider may take
+    "CALL_TIMEOUT": 30,
+    # seconds for all attempts of one turn together
+    "TOTAL_DEADLINE": 60,
+    "MAX_ATTEMPTS": 3,
+    # full-jitter exponential backoff between attempts, in seconds
+    "BACKOFF_INITIAL": 0.5,
+    "BACKOFF_MAX": 4,
+    # consecutive failures that open the breaker, and how long it stays open
+    "BREAKER_FAILURE_THRESHOLD": 5,
+    "BREAKER_RESET_TIMEOUT": 30,
+    # send a second identical request once the first is slower than this percentile
+    "HEDGE_ENABLED": False,
+    "HEDGE_PERCENTILE": 95,
+    "HEDGE_MIN_SAMPLES": 20,
+}
+
+# Transient provider failures worth another attempt; 4xx errors and parse failures are not.
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    httpx.TimeoutException,
+    httpx.TransportError,
+)
+
+
+def resilience_config() -> Dict:
+    return {**DEFAULT_CONFIG, **getattr(settings, "RECIPE_LLM_RESILIENCE", {})}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Per-process breaker for one model: opens after a run of consecutive
+    failures, then lets a single trial call through once the reset timeout
+    has passed (half-open) and closes again if it succeeds."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half-open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+            raise CircuitOpenError("The model provider is failing; not sending the request.")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies for one model."""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, percentile: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self.samples) < min_samples:
+                return None
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return ordered[index]
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[str, LatencyTracker] = {}
+_state_lock = threading.Lock()
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _reset_process_state() -> None:
+    global _state_lock, _hedge_pool
+    _breakers.clear()
+    _latencies.clear()
+    _state_lock = threading.Lock()
+    _hedge_pool = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_process_state)
+
+
+def get_breaker(key: str, config: Dict) -> CircuitBreaker:
+    with _state_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker(
+                config["BREAKER_FAILURE_THRESHOLD"], config["BREAKER_RESET_TIMEOUT"]
+            )
+        return _breakers[key]
+
+
+def _get_latency_tracker(key: str) -> LatencyTracker:
+    with _state_lock:
+        if key not in _latencies:
+            _latencies[key] = LatencyTracker()
+        return _latencies[key]
+
+
+def _first_success(futures):
+    """Result of the first future to succeed; once all have failed, the last error."""
+    error = None
+    while futures:
+        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                # a slower call keeps running in the pool; its result is discarded
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def _afirst_success(tasks):
+    error = None
+    while tasks:
+        done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                return task.result()
+            error = task.exception()
+    raise error
+
+
+def _get_hedge_pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    with _state_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+        return _hedge_pool
+
+
+class ResilientAgent:
+    """Wraps a RecipeAgent with a total deadline, jittered retries on transient
+    provider errors, a per-model circuit breaker and optional hedged requests.
+    Every request it sends first passes the model's rate limiter (see
+    rate_limit.RateLimiter). Exposes the same invoke/ainvoke/stream interface
+    as the agent it wraps."""
+
+    def __init__(self, agent, config: Optional[Dict] = None):
+        self.agent = agent
+        self.config = config or resilience_config()
+        self.model = getattr(agent, "model", None)
+        self.key = self.model or type(agent).__name__
+        self.breaker = get_breaker(self.key, self.config)
+        self.latency = _get_latency_tracker(self.key)
+        self.limiter = get_rate_limiter()
+
+    def _prompt_tokens(self, user_input, conversation_history) -> int:
+        count = getattr(self.agent, "prompt_tokens", None)
+        if count is None:
+            return estimate_prompt_tokens(user_input, conversation_history)
+        return count(user_input, conversation_history)
+
+    def _retry_kwargs(self) -> Dict:
+        return {
+            "stop": stop_after_attempt(self.config["MAX_ATTEMPTS"])
+            | stop_after_delay(self.config["TOTAL_DEADLINE"]),
+            "wait": wait_random_exponential(
+                multiplier=self.config["BACKOFF_INITIAL"], max=self.config["BACKOFF_MAX"]
+            ),
+            "retry": retry_if_exception_type(RETRYABLE_ERRORS),
+            "reraise": True,
+        }
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.config["HEDGE_ENABLED"]:
+            return None
+        return self.latency.percentile(
+            self.config["HEDGE_PERCENTILE"], self.config["HEDGE_MIN_SAMPLES"]
+        )
+
+    def _guarded(self, call):
+        """Runs one attempt through the breaker and records its latency."""
+        self.breaker.before_call()
+        started = time.perf_counter()
+        try:
+            result = call()
+        except Exception as e:
+            if isinstance(e, RETRYABLE_ERRORS):
+                self.breaker.record_failure()
+            else:
+                # the provider answered; the request itself was the problem
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        self.latency.add(time.perf_counter() - started)
+        return result
+
+    def _attempt_timeout(self, deadline: float) -> float:
+        """CALL_TIMEOUT, or what is left of the turn's TOTAL_DEADLINE if that is less.
+        stop_after_delay is only checked between attempts, so each attempt is
+        bounded here instead."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise httpx.TimeoutException("Model call exceeded TOTAL_DEADLINE")
+        return min(self.config["CALL_TIMEOUT"], remaining)
+
+    def _hedged(self, user_input, conversation_history, tokens, timeout):
+        def call(timeout):
+            return self.agent.invoke(
+                user_input=user_input, conversation_history=conversation_history, timeout=timeout
+            )
+
+        delay = self._hedge_delay()
+        if delay is None or delay >= timeout:
+            return call(timeout)
+        pool = _get_hedge_pool()
+        futures = {pool.submit(call, timeout)}
+        done, pending = wait(futures, timeout=delay)
+        if done:
+            return next(iter(done)).result()
+        # a hedge is optional, so it is only sent if the rate limit has room right now
+        if self.limiter.try_acquire(self.key, tokens):
+            logger.info("Hedging %s request after %.2fs", self.key, delay)
+            # started `delay` later, it gets the same deadline as the first call
+            pending.add(pool.submit(call, timeout - delay))
+        return _first_success(pending)
+
+    async def _ahedged(self, user_input, conversation_history, tokens):
+        def call():
+            return asyncio.ensure_future(
+                self.agent.ainvoke(
+                    user_input=user_input, conversation_history=conversation_history
+                )
+            )
+
+        delay = await asyncio.to_thread(self._hedge_delay)
+        if delay is None:
+            return await call()
+        tasks = {call()}
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return next(iter(done)).result()
+            if await sync_to_async(self.limiter.try_acquire)(self.key, tokens):
+                tasks.add(call())
+            return await _afirst_success(tasks)
+        finally:
+            # the slower call, or both when the attempt times out
+            for task in tasks:
+                task.cancel()
+
+    def invoke(self, user_input, conversation_history):
+        tokens = self._prompt_tokens(user_input, conversation_history)
+        deadline = time.monotonic() + self.config["TOTAL_DEADLINE"]
+        for attempt in Retrying(**self._retry_kwargs()):
+            with attempt:
+                # queued (or shed) before the breaker, so waiting is not call latency
+                self.limiter.acquire(self.key, tokens)
+                with self.limiter.slot(self.key):
+                    timeout = self._attempt_timeout(deadline)
+                    return self._guarded(
+                        lambda: self._hedged(user_input, conversation_history, tokens, timeout)
+                    )
+
+    async def ainvoke(self, user_input, conversation_history):
+        tokens = await sync_to_async(self._prompt_tokens)(user_input, conversation_history)
+        deadline = time.monotonic() + self.config["TOTAL_DEADLINE"]
+        async for attempt in AsyncRetrying(**self._retry_kwargs()):
+            with attempt:
+                await self.limiter.aacquire(self.key, tokens)
+                async with self.limiter.aslot(self.key):
+                    timeout = self._attempt_timeout(deadline)
+                    return await self._aguarded(user_input, conversation_history, tokens, timeout)
+
+    async def _aguarded(self, user_input, conversation_history, tokens, timeout):
+        self.breaker.before_call()
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                self._ahedged(user_input, conversation_history, tokens), timeout=timeout
+            )
+        except asyncio.TimeoutError as e:
+            self.breaker.record_failure()
+            raise httpx.TimeoutException("Model call exceeded its timeout") from e
+        except Exception as e:
+            if isinstance(e, RETRYABLE_ERRORS):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        self.latency.add(time.perf_counter() - started)
+        return result
+
+    def stream(self, user_input, conversation_history, on_usage=None):
+        # Partial output may already be on its way to the client, so streams are
+        # never retried; they only pass the rate limiter and respect and feed the breaker.
+        self.limiter.acquire(self.key, self._prompt_tokens(user_input, conversation_history))
+        with self.limiter.slot(self.key):
+            self.breaker.before_call()
+            failed = False
+            try:
+                yield from self.agent.stream(
+                    user_input=user_input, conversation_history=conversation_history, on_usage=on_usage
+                )
+            except RETRYABLE_ERRORS:
+                failed = True
+                self.breaker.record_failure()
+                raise
+            finally:
+                # Anything else ends the call as in _guarded: the provider answered.
+                # That includes a client disconnecting (GeneratorExit at the yield),
+                # which must not leave a half-open trial in flight.
+                if not failed:
+                    self.breaker.record_success()
+
+
+def breaker_states() -> Dict[str, Dict]:
+    with _state_lock:
+        items = list(_breakers.items())
+    return {
+        key: {"state": breaker.state, "consecutive_failures": breaker.failures}
+        for key, breaker in items
+    }
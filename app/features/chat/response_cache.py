@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from app.features.chat.metrics import increment, read_counters
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "CACHE_ALIAS": "default",
+    "TIMEOUT": 60 * 60 * 24,
+    "HISTORY_TAIL": 4,
+    "SIMILARITY_THRESHOLD": None,
+    "SIMILARITY_INDEX_SIZE": 1000,
+}
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "recipe-response"
+STATS = ("exact_hit", "similar_hit", "miss")
+
+_NON_WORD = re.compile(r"[^a-z0-9\s]+")
+_SPACES = re.compile(r"\s+")
+# Words that do not change which recipe is being asked for.
+_STOPWORDS = frozenset(
+    "a an and the for of to me my please give show recipe recipes how make "
+    "do i can you want some with".split()
+)
+
+
+def normalize_text(text: str) -> str:
+    text = _NON_WORD.sub(" ", (text or "").lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+def _keywords(text: str) -> FrozenSet[str]:
+    return frozenset(w for w in normalize_text(text).split() if w not in _STOPWORDS)
+
+
+class RecipeResponseCache:
+    """Caches RecipeBotOutput dictionaries keyed on the normalised prompt and the
+    tail of the conversation history.
+
+    Lookups try the exact hash first. Prompts sent without history can also
+    match an earlier prompt with the same keywords through a small per-process
+    similarity index. Expiry and LRU eviction come from the Django cache alias
+    in RECIPE_RESPONSE_CACHE["CACHE_ALIAS"].
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = {
+            **DEFAULT_CONFIG,
+            **(config or getattr(settings, "RECIPE_RESPONSE_CACHE", {})),
+        }
+        self.cache = caches[self.config["CACHE_ALIAS"]]
+        self._index: "OrderedDict[FrozenSet[str], str]" = OrderedDict()
+        self._index_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config["ENABLED"])
+
+    def _history_tail(self, conversation_history: List[Dict]) -> List[Dict]:
+        # The views append the current user message as the last history entry.
+        previous = conversation_history[:-1] if conversation_history else []
+        tail = self.config["HISTORY_TAIL"]
+        return previous[-tail:] if tail else []
+
+    def make_key(self, user_input: str, conversation_history: List[Dict]) -> str:
+        parts = [normalize_text(user_input)]
+        for message in self._history_tail(conversation_history):
+            parts.append(
+                f"{message.get('sender', '')}:{normalize_text(str(message.get('content', '')))}"
+            )
+        digest = hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:{digest}"
+
+    def get(self, user_input: str, conversation_history: List[Dict]) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        try:
+            return self._lookup(user_input, conversation_history)
+        except Exception as e:  # a cache outage must never fail the chat turn
+            logger.warning("Recipe response cache lookup failed: %s", e)
+            return None
+
+    def _lookup(self, user_input: str, conversation_history: List[Dict]) -> Optional[Dict]:
+        key = self.make_key(user_input, conversation_history)
+        result = self.cache.get(key)
+        if result is not None:
+            self._count("exact_hit")
+            return result
+
+        similar_key = self._find_similar(user_input, conversation_history)
+        if similar_key:
+            result = self.cache.get(similar_key)
+            if result is not None:
+                self._count("similar_hit")
+                return result
+        self._count("miss")
+        return None
+
+    def set(self, user_input: str, conversation_history: List[Dict], result: Dict) -> None:
+        # Only successful model outputs are cached, never error payloads.
+        if not self.enabled or "error" in result or "response_type" not in result:
+            return
+        key = self.make_key(user_input, conversation_history)
+        try:
+            self.cache.set(key, result, timeout=self.config["TIMEOUT"])
+        except Exception as e:
+            logger.warning("Recipe response cache write failed: %s", e)
+            return
+        self._remember(user_input, conversation_history, key)
+
+    def _similarity_enabled(self, conversation_history: List[Dict]) -> bool:
+        return (
+            self.config["SIMILARITY_THRESHOLD"] is not None
+            and not self._history_tail(conversation_history)
+        )
+
+    def _remember(self, user_input, conversation_history, key) -> None:
+        if not self._similarity_enabled(conversation_history):
+            return
+        keywords = _keywords(user_input)
+        if not keywords:
+            return
+        with self._index_lock:
+            self._index[keywords] = key
+            self._index.move_to_end(keywords)
+            while len(self._index) > self.config["SIMILARITY_INDEX_SIZE"]:
+                self._index.popitem(last=False)
+
+    def _find_similar(self, user_input, conversation_history) -> Optional[str]:
+        if not self._similarity_enabled(conversation_history):
+            return None
+        keywords = _keywords(user_input)
+        if not keywords:
+            return None
+        best_key, best_score = None, self.config["SIMILARITY_THRESHOLD"]
+        with self._index_lock:
+            for candidate, key in self._index.items():
+                score = len(keywords & candidate) / len(keywords | candidate)
+                if score >= best_score:
+                    best_key, best_score = key, score
+        return best_key
+
+    def _count(self, stat: str) -> None:
+        increment(f"{KEY_PREFIX}:stats:{stat}", cache_alias=self.config["CACHE_ALIAS"])
+
+    def stats(self) -> Dict:
+        values = read_counters(
+            (f"{KEY_PREFIX}:stats:{stat}" for stat in STATS),
+            cache_alias=self.config["CACHE_ALIAS"],
+        )
+        counts = {stat: values[f"{KEY_PREFIX}:stats:{stat}"] for stat in STATS}
+        lookups = sum(counts.values())
+        hits = counts["exact_hit"] + counts["similar_hit"]
+        counts["hit_ratio"] = round(hits / lookups, 4) if lookups else 0.0
+        return counts
+
+
+_response_cache: Optional[RecipeResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> RecipeResponseCache:
+    """Returns the process-wide response cache (its similarity index is per process)."""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = RecipeResponseCache()
+    return _response_cache
@@ -0,0 +1,222 @@
+import heapq
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F
+from django.db.models.fields.json import KeyTextTransform
+
+from app.features.chat.ingredients import parse_ingredient, singularize
+from app.features.chat.models import Recipe
+from app.features.chat.response_cache import normalize_text
+
+DEFAULT_CONFIG = {
+    "TEXT_SEARCH_CONFIG": "english",
+    "DEFAULT_RESULTS": 20,
+    "MAX_RESULTS": 50,
+}
+
+# ts_rank's default weights for the A, B and C labels of the tsvector
+FIELD_WEIGHTS = {"title": 1.0, "overview": 0.4, "instructions": 0.2}
+_STOPWORDS = frozenset(
+    "a an and the for of to in on with or at by from into is it its be then until "
+    "your you this that as are".split()
+)
+# columns a search result needs; the vector and parsed lines stay in the database
+_RESULT_DEFERRED = ("search_vector", "parsed_ingredients", "ingredient_terms")
+
+
+def search_config() -> Dict:
+    return {**DEFAULT_CONFIG, **getattr(settings, "RECIPE_SEARCH", {})}
+
+
+def text_terms(text: Optional[str]) -> List[str]:
+    """Lower-cased, singular words of text without stopwords, for the in-process index."""
+    return [singularize(word) for word in normalize_text(text).split() if word not in _STOPWORDS]
+
+
+def ingredient_terms(names: Iterable[str]) -> List[str]:
+    """Search keys for a recipe's canonical ingredient names: each name and
+    each of its words, so "chicken" finds recipes with "chicken breast"."""
+    terms = set()
+    for name in names:
+        terms.add(name)
+        terms.update(name.split())
+    return sorted(terms)
+
+
+def query_ingredients(values: Iterable[str]) -> List[str]:
+    """Canonical names for ingredients typed by a user ("Chicken Breasts" -> "chicken breast")."""
+    names = {}
+    for value in values:
+        name = parse_ingredient(value).name if value and value.strip() else ""
+        if name:
+            names.setdefault(name, None)
+    return list(names)
+
+
+def is_postgres(using: str = "default") -> bool:
+    return connections[using].vendor == "postgresql"
+
+
+def recipe_search_vector() -> SearchVector:
+    text_config = search_config()["TEXT_SEARCH_CONFIG"]
+    return (
+        SearchVector("title", weight="A", config=text_config)
+        + SearchVector(KeyTextTransform("overview/details", "details"), weight="B", config=text_config)
+        + SearchVector(KeyTextTransform("instructions", "details"), weight="C", config=text_config)
+    )
+
+
+def index_recipes(queryset) -> int:
+    """Fills search_vector for the recipes in queryset; a no-op off PostgreSQL,
+    where the in-process index reads new rows on its own."""
+    if not is_postgres(queryset.db):
+        return 0
+    return queryset.update(search_vector=recipe_search_vector())
+
+
+def ensure_search_indexes(using: str = "default") -> bool:
+    """Creates the GIN indexes behind PostgresRecipeSearch. They are kept out of
+    Recipe.Meta because SQLite, used for local runs and tests, cannot build them."""
+    if not is_postgres(using):
+        return False
+    table = Recipe._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS chat_recipe_search_vector_gin ON {table} USING GIN (search_vector)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS chat_recipe_ingredient_terms_gin "
+            f"ON {table} USING GIN (ingredient_terms jsonb_path_ops)"
+        )
+    return True
+
+
+class PostgresRecipeSearch:
+    """websearch_to_tsquery against the GIN-indexed tsvector, ranked with
+    ts_rank; ingredients filter with jsonb @> on the GIN-indexed terms."""
+
+    def search(self, query: str, ingredients: Sequence[str], limit: int, offset: int = 0) -> List[Recipe]:
+        recipes = Recipe.objects.defer(*_RESULT_DEFERRED)
+        if ingredients:
+            recipes = recipes.filter(ingredient_terms__contains=list(ingredients))
+        if query:
+            search_query = SearchQuery(
+                query, config=search_config()["TEXT_SEARCH_CONFIG"], search_type="websearch"
+            )
+            recipes = (
+                recipes.filter(search_vector=search_query)
+                .annotate(rank=SearchRank(F("search_vector"), search_query))
+                .order_by("-rank", "-id")
+            )
+        else:
+            recipes = recipes.order_by("-id")
+        return list(recipes[offset:offset + limit])
+
+
+class InMemoryRecipeSearch:
+    """Inverted index for databases without full-text search (SQLite in local
+    development). Recipes are immutable once stored, so the index only reads
+    rows with an id above the last one it has seen before each search.
+
+    Terms map to {recipe id: weight}, weighted like ts_rank's A/B/C labels;
+    all query terms and ingredients must match, best score first."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._ingredients: Dict[str, Set[int]] = defaultdict(set)
+        self._last_id = 0
+
+    def refresh(self) -> None:
+        rows = (
+            Recipe.objects.filter(id__gt=self._last_id)
+            .order_by("id")
+            .values_list("id", "title", "details", "ingredient_terms")
+        )
+        for recipe_id, title, details, terms in rows.iterator(chunk_size=2000):
+            fields = (
+                ("title", title),
+                ("overview", details.get("overview/details", details.get("overview"))),
+                ("instructions", details.get("instructions")),
+            )
+            for field, text in fields:
+                weight = FIELD_WEIGHTS[field]
+                for term in text_terms(text):
+                    postings = self._postings[term]
+                    postings[recipe_id] = postings.get(recipe_id, 0.0) + weight
+            for term in terms:
+                self._ingredients[term].add(recipe_id)
+            self._last_id = recipe_id
+
+    def _matches(self, query: str, ingredients: Sequence[str]) -> Optional[Dict[int, float]]:
+        candidates = None
+        for ids in sorted((self._ingredients.get(term, set()) for term in ingredients), key=len):
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return {}
+        postings = sorted((self._postings.get(term, {}) for term in set(text_terms(query))), key=len)
+        if not postings:
+            return None if candidates is None else dict.fromkeys(candidates, 0.0)
+        scores = {
+            recipe_id: score
+            for recipe_id, score in postings[0].items()
+            if candidates is None or recipe_id in candidates
+        }
+        for posting in postings[1:]:
+            scores = {
+                recipe_id: score + posting[recipe_id]
+                for recipe_id, score in scores.items()
+                if recipe_id in posting
+            }
+        return scores
+
+    def search(self, query: str, ingredients: Sequence[str], limit: int, offset: int = 0) -> List[Recipe]:
+        with self._lock:
+            self.refresh()
+            scores = self._matches(query, ingredients)
+            if not scores:
+                return []
+            top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], item[0]))[offset:]
+        recipes = Recipe.objects.defer(*_RESULT_DEFERRED).in_bulk([recipe_id for recipe_id, _score in top])
+        results = []
+        for recipe_id, score in top:
+            if recipe_id in recipes:
+                recipe = recipes[recipe_id]
+                recipe.rank = score
+                results.append(recipe)
+        return results
+
+
+_memory_index: Optional[InMemoryRecipeSearch] = None
+_memory_index_lock = threading.Lock()
+
+
+def get_recipe_search(using: str = "default"):
+    """PostgresRecipeSearch on PostgreSQL, else the process-wide InMemoryRecipeSearch."""
+    global _memory_index
+    if is_postgres(using):
+        return PostgresRecipeSearch()
+    if _memory_index is None:
+        with _memory_index_lock:
+            if _memory_index is None:
+                _memory_index = InMemoryRecipeSearch()
+    return _memory_index
+
+
+def search_recipes(
+    query: str = "", ingredients: Iterable[str] = (), limit: Optional[int] = None, offset: int = 0
+) -> List[Recipe]:
+    """Stored recipes matching every word of `query` (title, overview and
+    instructions) and containing every ingredient, best match first. Each
+    result carries a `rank` attribute when a query was given."""
+    config = search_config()
+    limit = min(limit or config["DEFAULT_RESULTS"], config["MAX_RESULTS"])
+    names = query_ingredients(ingredients)
+    if not (query or "").strip() and not names:
+        return []
+    return get_recipe_search().search((query or "").strip(), names, limit, offset)
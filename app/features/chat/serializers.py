@@ -1,26 +1,35 @@
 from rest_framework import serializers
 
-from .models import Ai_model_logs, ChatMessage, ChatSession
+from .models import Ai_model_logs, ChatMessage, ChatSession, Recipe
 
 
 class ChatMessageSerializer(serializers.ModelSerializer):
+    # recipe messages render their shared Recipe (select_related("recipe") to avoid N+1)
+    extra_data = serializers.JSONField(source="details", read_only=True)
+
     class Meta:
         model = ChatMessage
         fields = ["id", "sender", "message_type", "content", "extra_data", "created_at"]
 
 
 class ChatSessionSerializer(serializers.ModelSerializer):
+    """Session metadata for the chat list; the last message is read from the
+    session's denormalised columns (see services.persist_turn), not queried."""
+
     last_message = serializers.SerializerMethodField()
 
     class Meta:
         model = ChatSession
-        fields = ["id", "title", "created_at", "updated_at", "last_message"]
+        fields = ["id", "title", "created_at", "updated_at", "message_count", "last_message"]
 
     def get_last_message(self, obj):
-        last_msg = obj.messages.order_by("-created_at").first()
-        if last_msg:
-            return ChatMessageSerializer(last_msg).data
-        return None
+        if not obj.message_count:
+            return None
+        return {
+            "preview": obj.last_message_preview,
+            "message_type": obj.last_message_type,
+            "created_at": serializers.DateTimeField().to_representation(obj.last_activity_at),
+        }
 
 
 class ChatAllSessionSerializer(serializers.ModelSerializer):
@@ -36,8 +45,27 @@ class AiModelLogsSerializer(serializers.ModelSerializer):
         model = Ai_model_logs
         fields = ['id','email', 'title', 'overview', 'rating', 'ingredients', 'ingredient_items', 'instructions', 'created_on', 'updated_on',"status"]
         
+    def to_representation(self, obj):
+        # recipe logs keep their content on the shared Recipe
+        data = super().to_representation(obj)
+        data.update(obj.recipe_fields())
+        return data
+
     def get_status(self, obj):
         # Replace title with 'Failed' if it is an error log
         if obj.title == "Recipe Request Invalid":
             return "Failed"
-        return "Success"
\ No newline at end of file
+        return "Success"
+
+
+class RecipeSerializer(serializers.ModelSerializer):
+    # set by search.search_recipes when the results are ranked by a text query
+    rank = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = ["id", "title", "details", "ingredient_items", "times_generated", "rank"]
+
+    def get_rank(self, obj):
+        rank = getattr(obj, "rank", None)
+        return round(rank, 4) if rank is not None else None
@@ -0,0 +1,173 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, TextField, Value
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Coalesce, NullIf, Substr
+from django.utils import timezone
+
+from app.accounts.models import UserProfile
+from app.features.chat.history import (afetch_history_rows, build_history_window,
+                                       fetch_history_rows)
+from app.features.chat.models import Ai_model_logs, ChatMessage, ChatSession
+from app.features.chat.recipes import store_recipe
+from app.features.chat.summary import schedule_summary_update, unsummarized_messages
+
+# characters of a message shown in the chat list
+PREVIEW_LENGTH = 120
+
+def _recipe_log(user, recipe_details):
+    # the content itself is on the shared Recipe, linked in persist_turn
+    return Ai_model_logs(
+        email=user.email if user else None,  # Save the user's email if needed
+        title=recipe_details.get("title", "Recipe"),
+        rating=recipe_details.get("rating", "N/A"),
+    )
+
+
+def _error_log(user, error_details):
+    return Ai_model_logs(
+        email=user.email,
+        title=error_details.get("title", "Error"),
+        overview=error_details.get("overview", ""),
+        rating="N/A",  # Error logs might not have a rating
+        ingredients=error_details.get("ingredients", []),
+        ingredient_items=error_details.get("ingredient_items", []),
+        instructions="",  # Error logs might not have instructions
+    )
+
+
+def _apply_usage(assistant_message, usage):
+    if not usage:
+        return
+    assistant_message.model_name = usage.get("model") or ""
+    assistant_message.input_tokens = usage["input_tokens"]
+    assistant_message.cached_input_tokens = usage["cached_input_tokens"]
+    assistant_message.output_tokens = usage["output_tokens"]
+
+
+def build_history(chat, message):
+    """The conversation history sent to the model for a new message in chat."""
+    rows = fetch_history_rows(unsummarized_messages(chat))
+    return build_history_window(rows, message, summary=chat.summary).messages
+
+
+async def abuild_history(chat, message):
+    rows = await afetch_history_rows(unsummarized_messages(chat))
+    return build_history_window(rows, message, summary=chat.summary).messages
+
+
+def message_preview(message) -> str:
+    """What the chat list shows for a message: the start of its text, else
+    the recipe or error title, else the error overview."""
+    if message.content:
+        return message.content[:PREVIEW_LENGTH]
+    details = message.details or {}
+    return str(details.get("title") or details.get("overview") or "")[:PREVIEW_LENGTH]
+
+
+def annotate_latest_message(chats):
+    """Adds latest_message_preview, latest_message_type, latest_message_at and
+    latest_message_count, computed from the messages themselves, to a
+    ChatSession queryset: one correlated subquery each on the (chat,
+    created_at) index. Used to backfill the denormalised session columns."""
+    messages = ChatMessage.objects.filter(chat=OuterRef("pk"))
+    last = messages.order_by("-created_at", "-id")
+    preview = Coalesce(
+        NullIf(Substr("content", 1, PREVIEW_LENGTH), Value("")),
+        Substr("recipe__title", 1, PREVIEW_LENGTH),
+        NullIf(KeyTextTransform("title", "extra_data"), Value("")),
+        Substr(KeyTextTransform("overview", "extra_data"), 1, PREVIEW_LENGTH),
+        Value(""),
+        output_field=TextField(),
+    )
+    count = messages.order_by().values("chat").annotate(count=Count("id")).values("count")
+    return chats.annotate(
+        latest_message_preview=Subquery(last.annotate(preview=preview).values("preview")[:1]),
+        latest_message_type=Subquery(last.values("message_type")[:1]),
+        latest_message_at=Subquery(last.values("created_at")[:1]),
+        latest_message_count=Coalesce(Subquery(count), 0),
+    )
+
+
+def persist_turn(user, profile, chat, message, result, generation_reserved=False, usage=None):
+    """Saves one chat turn atomically and returns its Ai_model_logs row, if any.
+
+    Both messages go in with a single bulk INSERT; the assistant message
+    carries the turn's token usage (see ai_func.normalize_usage). The
+    Ai_model_logs row is added for recipes and errors. A recipe is stored
+    once in the shared Recipe table (see recipes.store_recipe) and both the
+    message and the log reference it instead of copying it. A single
+    update() bumps the session's updated_at, message_count and last-message
+    columns; another bumps the generation counter unless the recipe was
+    already counted by a reserved quota slot (see
+    quota.reserve_generation_slot) or was served from storage without a
+    model call (result["source"]).
+    """
+    user_message = ChatMessage(
+        chat=chat, sender="user", message_type="conversation", content=message
+    )
+    response_type = result.get("response_type")
+    log = None
+    recipe_details = None
+    counts_as_generation = False
+    generated = not result.get("source")
+
+    # --- Build assistant message depending on type ---
+    if response_type == "conversation":
+        assistant_message = ChatMessage(
+            chat=chat,
+            sender="assistant",
+            message_type="conversation",
+            content=result["conversation_details"]["response"],
+        )
+    elif response_type == "recipe":
+        recipe_details = result.get("recipe_details", {})
+        log = _recipe_log(user, recipe_details)
+        assistant_message = ChatMessage(
+            chat=chat,
+            sender="assistant",
+            message_type="recipe",
+        )
+        counts_as_generation = generated and not generation_reserved
+    elif response_type == "error":
+        error_details = result.get("error_details", {})
+        log = _error_log(user, error_details)
+        assistant_message = ChatMessage(
+            chat=chat,
+            sender="assistant",
+            message_type="error",
+            extra_data=error_details,
+        )
+    else:
+        # fallback in case of unexpected AI response
+        assistant_message = ChatMessage(
+            chat=chat,
+            sender="assistant",
+            message_type="error",
+            extra_data={"overview": "Unexpected AI response", "raw": result},
+        )
+
+    _apply_usage(assistant_message, usage)
+
+    with transaction.atomic():
+        if recipe_details is not None:
+            assistant_message.recipe = log.recipe = store_recipe(recipe_details, count=generated)
+        ChatMessage.objects.bulk_create([user_message, assistant_message])
+        if log is not None:
+            log.save()
+        if counts_as_generation:
+            UserProfile.objects.filter(pk=profile.pk).update(
+                recipe_generate=F("recipe_generate") + 1
+            )
+        now = timezone.now()
+        ChatSession.objects.filter(pk=chat.pk).update(
+            updated_at=now,
+            last_activity_at=now,
+            message_count=F("message_count") + 2,
+            last_message_preview=message_preview(assistant_message),
+            last_message_type=assistant_message.message_type,
+        )
+
+    # the same count in memory, for the summary backlog check
+    chat.message_count += 2
+    schedule_summary_update(chat)
+    return log
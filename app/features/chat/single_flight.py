@@ -0,0 +1,227 @@
+import asyncio
+import copy
+import hashlib
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from app.features.chat.metrics import increment, read_counters
+from app.features.chat.response_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    # cache alias (Redis in production) whose lock coalesces calls across
+    # workers; None coalesces within each process only
+    "CACHE_ALIAS": None,
+    # seconds a waiting caller gives the leading one before calling the model itself
+    "WAIT_TIMEOUT": 60,
+    # seconds between checks for another worker's result
+    "POLL_INTERVAL": 0.1,
+}
+
+KEY_PREFIX = "recipe-single-flight"
+STATS = ("led", "joined", "wait_timeouts")
+
+
+def single_flight_key(user_input: str, conversation_history: List[Dict]) -> str:
+    """Hash of the normalised prompt and the whole history it is answered against."""
+    parts = [normalize_text(user_input)]
+    for message in conversation_history:
+        parts.append(
+            f"{message.get('sender', '')}:{normalize_text(str(message.get('content', '')))}"
+        )
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Runs one model call per key at a time; identical concurrent callers wait
+    for the first one and get a copy of its value (or its exception).
+
+    Within a process callers wait on an Event (or an asyncio Future). With
+    CACHE_ALIAS set, the first caller across all workers also takes a lock
+    with cache.add() and publishes its value there for the others to pick up.
+    Only the caller that did the work is told it led, so token usage is
+    counted once.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = {
+            **DEFAULT_CONFIG,
+            **(config or getattr(settings, "RECIPE_SINGLE_FLIGHT", {})),
+        }
+        self._calls: Dict[str, _Call] = {}
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def shared_cache(self):
+        alias = self.config["CACHE_ALIAS"]
+        return caches[alias] if alias else None
+
+    def _lock_timeout(self) -> int:
+        # outlives the wait, so a crashed leader's lock expires on its own
+        return int(self.config["WAIT_TIMEOUT"]) + 30
+
+    def do(self, key: str, fn: Callable[[], object]) -> Tuple[object, bool]:
+        """Returns (value, led): fn()'s value, computed here or by a concurrent caller."""
+        if not self.config["ENABLED"]:
+            return fn(), True
+        with self._lock:
+            call = self._calls.get(key)
+            led = call is None
+            if led:
+                call = self._calls[key] = _Call()
+        if not led:
+            if call.done.wait(self.config["WAIT_TIMEOUT"]):
+                self._count("joined")
+                if call.error is not None:
+                    raise call.error
+                return copy.deepcopy(call.value), False
+            self._count("wait_timeouts")
+            return fn(), True
+        try:
+            call.value, led = self._across_workers(key, fn)
+            return copy.deepcopy(call.value), led
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _across_workers(self, key: str, fn) -> Tuple[object, bool]:
+        cache = self.shared_cache
+        lock_key, value_key = f"{KEY_PREFIX}:lock:{key}", f"{KEY_PREFIX}:value:{key}"
+        try:
+            acquired = cache is None or cache.add(lock_key, 1, timeout=self._lock_timeout())
+        except Exception as e:  # a cache outage only costs the coalescing
+            logger.warning("Single-flight lock failed: %s", e)
+            cache, acquired = None, True
+        if acquired:
+            return self._lead(cache, lock_key, value_key, fn), True
+
+        deadline = time.monotonic() + self.config["WAIT_TIMEOUT"]
+        while time.monotonic() < deadline:
+            time.sleep(self.config["POLL_INTERVAL"])
+            value = cache.get(value_key)
+            if value is not None:
+                self._count("joined")
+                return value, False
+            if cache.get(lock_key) is None:
+                break  # the leader failed without publishing a value
+        self._count("wait_timeouts")
+        return fn(), True
+
+    def _lead(self, cache, lock_key, value_key, fn):
+        self._count("led")
+        try:
+            value = fn()
+            if cache is not None:
+                cache.set(value_key, value, timeout=int(self.config["WAIT_TIMEOUT"]))
+            return value
+        finally:
+            if cache is not None:
+                cache.delete(lock_key)
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable]) -> Tuple[object, bool]:
+        """Async counterpart of do() for callers on one event loop."""
+        if not self.config["ENABLED"]:
+            return await fn(), True
+        future = self._futures.get(key)
+        if future is not None and future.get_loop() is asyncio.get_running_loop():
+            try:
+                value = await asyncio.wait_for(
+                    asyncio.shield(future), self.config["WAIT_TIMEOUT"]
+                )
+            except asyncio.TimeoutError:
+                await sync_to_async(self._count)("wait_timeouts")
+                return await fn(), True
+            await sync_to_async(self._count)("joined")
+            return copy.deepcopy(value), False
+
+        future = self._futures[key] = asyncio.get_running_loop().create_future()
+        try:
+            value, led = await self._aacross_workers(key, fn)
+            future.set_result(value)
+            return copy.deepcopy(value), led
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved, so an unjoined failure is not logged as lost
+            raise
+        finally:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+    async def _aacross_workers(self, key: str, fn) -> Tuple[object, bool]:
+        cache = self.shared_cache
+        if cache is None:
+            await sync_to_async(self._count)("led")
+            return await fn(), True
+        lock_key, value_key = f"{KEY_PREFIX}:lock:{key}", f"{KEY_PREFIX}:value:{key}"
+        try:
+            acquired = await cache.aadd(lock_key, 1, timeout=self._lock_timeout())
+        except Exception as e:
+            logger.warning("Single-flight lock failed: %s", e)
+            await sync_to_async(self._count)("led")
+            return await fn(), True
+        if acquired:
+            await sync_to_async(self._count)("led")
+            try:
+                value = await fn()
+                await cache.aset(value_key, value, timeout=int(self.config["WAIT_TIMEOUT"]))
+                return value, True
+            finally:
+                await cache.adelete(lock_key)
+
+        deadline = time.monotonic() + self.config["WAIT_TIMEOUT"]
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.config["POLL_INTERVAL"])
+            value = await cache.aget(value_key)
+            if value is not None:
+                await sync_to_async(self._count)("joined")
+                return value, False
+            if await cache.aget(lock_key) is None:
+                break
+        await sync_to_async(self._count)("wait_timeouts")
+        return await fn(), True
+
+    @staticmethod
+    def _count(stat: str) -> None:
+        increment(f"{KEY_PREFIX}:stats:{stat}")
+
+
+def single_flight_stats() -> Dict:
+    values = read_counters(f"{KEY_PREFIX}:stats:{stat}" for stat in STATS)
+    counts = {stat: values[f"{KEY_PREFIX}:stats:{stat}"] for stat in STATS}
+    calls = counts["led"] + counts["joined"]
+    counts["coalesced_ratio"] = round(counts["joined"] / calls, 4) if calls else 0.0
+    return counts
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Returns the process-wide SingleFlight; in-flight calls are only shared through it."""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,102 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.utils import timezone
+
+from app.features.chat.ai_func import get_summary_agent
+from app.features.chat.history import compact_content, recent_message_count
+from app.features.chat.models import ChatSession
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "TRIGGER_MESSAGES": 12,
+    "MODEL": "gpt-4o-mini",
+}
+LOCK_TIMEOUT = 120  # seconds
+
+
+def _config():
+    return {**DEFAULT_CONFIG, **getattr(settings, "RECIPE_CONVERSATION_SUMMARY", {})}
+
+
+def unsummarized_messages(chat):
+    """Messages of the chat that are not yet folded into its rolling summary."""
+    messages = chat.messages.all()
+    if chat.summary_until_message_id:
+        messages = messages.filter(id__gt=chat.summary_until_message_id)
+    return messages
+
+
+def schedule_summary_update(chat) -> bool:
+    """Starts a background summary update once TRIGGER_MESSAGES messages have
+    aged out of the verbatim history window. Returns whether one was scheduled.
+
+    The backlog comes from the session's denormalised counters, so a turn
+    pays no extra query for it; chat.message_count must include the turn."""
+    config = _config()
+    if not config["ENABLED"]:
+        return False
+    unsummarized = chat.message_count - chat.summarized_message_count
+    pending = unsummarized - recent_message_count()
+    if pending < config["TRIGGER_MESSAGES"]:
+        return False
+    chat_id = chat.id
+    transaction.on_commit(
+        lambda: threading.Thread(
+            target=_update_in_background, args=(chat_id,), daemon=True
+        ).start()
+    )
+    return True
+
+
+def _update_in_background(chat_id):
+    try:
+        update_summary(chat_id)
+    except Exception as e:
+        logger.warning("Summary update for chat %s failed: %s", chat_id, e)
+    finally:
+        connections.close_all()
+
+
+def update_summary(chat_id, summary_agent=None) -> bool:
+    """Folds every unsummarised message outside the verbatim window into the
+    chat's summary. A cache lock keeps concurrent turns from doing it twice."""
+    lock_key = f"chat-summary-lock:{chat_id}"
+    if not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        return False
+    try:
+        chat = ChatSession.objects.get(id=chat_id)
+        messages = list(
+            unsummarized_messages(chat)
+            .order_by("created_at", "id")
+            .select_related("recipe")
+            .only("id", "sender", "message_type", "content", "extra_data", "recipe__details")
+        )
+        recent = recent_message_count()
+        to_fold = messages[:-recent] if recent else messages
+        if not to_fold:
+            return False
+
+        lines = []
+        for msg in to_fold:
+            content = compact_content(msg)
+            if content:
+                lines.append({"sender": msg.sender, "content": content})
+        agent = summary_agent or get_summary_agent(model=_config()["MODEL"])
+        summary = agent.run(chat.summary, lines)
+
+        # update() leaves updated_at alone, so the chat keeps its place in the sidebar
+        ChatSession.objects.filter(id=chat_id).update(
+            summary=summary,
+            summary_until_message_id=to_fold[-1].id,
+            summary_updated_at=timezone.now(),
+            summarized_message_count=chat.messages.filter(id__lte=to_fold[-1].id).count(),
+        )
+        return True
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,90 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.features.chat import rate_limit
+
+REPLY = json.dumps(
+    {"reply": {"type": "conversation", "response": "Boil the pasta.", "items": None}}
+)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Minimal /chat/completions endpoint: fails the first `failures` calls with
+    a 500, then answers with a BotReply JSON object, streamed as chunks
+    followed by a usage chunk when the request asks for a stream."""
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(request)
+        self.server.calls += 1
+        if self.server.calls <= self.server.failures:
+            self._send(500, {"error": {"message": "upstream overloaded", "type": "server_error"}})
+            return
+        if request.get("stream"):
+            self._stream()
+            return
+        self._send(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "fake-model",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": REPLY},
+            }],
+            "usage": self.server.usage,
+        })
+
+    def _stream(self):
+        half = len(REPLY) // 2
+        chunks = [
+            {"index": 0, "delta": {"role": "assistant", "content": REPLY[:half]}, "finish_reason": None},
+            {"index": 0, "delta": {"content": REPLY[half:]}, "finish_reason": None},
+            {"index": 0, "delta": {}, "finish_reason": "stop"},
+        ]
+        events = [{"choices": [choice]} for choice in chunks] + [{"choices": [], "usage": self.server.usage}]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for event in events:
+            body = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0, "model": "fake-model", **event}
+            self.wfile.write(f"data: {json.dumps(body)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    server.calls, server.failures, server.requests = 0, 0, []
+    server.usage = {"prompt_tokens": 12, "completion_tokens": 8, "total_tokens": 20}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_API_BASE", f"http://127.0.0.1:{server.server_port}/v1")
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def rate_limit_buckets(settings, tmp_path, monkeypatch):
+    """Gives each test its own bucket file, so test runs do not spend the
+    host-wide rate limit budget a dev server on the same machine uses."""
+    settings.RECIPE_LLM_RATE_LIMIT = {
+        **getattr(settings, "RECIPE_LLM_RATE_LIMIT", {}),
+        "FILE_PATH": str(tmp_path / "rate-limit.sqlite3"),
+    }
+    monkeypatch.setattr(rate_limit, "_rate_limiter", None)
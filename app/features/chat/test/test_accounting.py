@@ -0,0 +1,116 @@
+from decimal import Decimal
+
+import pytest
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.accounts.models import User
+from app.features.chat.accounting import (OVERFLOW_MS, TurnTrace, ai_usage_daily_stats,
+                                          record_turn, turn_cost)
+from app.features.chat.models import AiLatencyBucket, AiUsageDaily, Ai_model_logs, ChatMessage
+
+PRICING = {"fake-priced": {"INPUT": 2.50, "CACHED_INPUT": 1.25, "OUTPUT": 10.00}}
+USAGE = {"model": "fake-priced", "input_tokens": 1500, "cached_input_tokens": 1000, "output_tokens": 200}
+
+
+def _trace(llm_ms, total_ms, usage=USAGE, **attrs):
+    trace = TurnTrace()
+    trace.phase_ms = {"history": 3, "llm": llm_ms, "persist": 5}
+    trace.usage = usage
+    trace.started -= total_ms / 1000
+    for name, value in attrs.items():
+        setattr(trace, name, value)
+    return trace
+
+
+def test_turn_cost_prices_cached_input_separately():
+    # 500 * 2.50 + 1000 * 1.25 + 200 * 10.00 = 4500 micro-USD
+    assert turn_cost(USAGE, PRICING) == Decimal("0.004500")
+    assert turn_cost({**USAGE, "model": "unpriced"}, PRICING) is None
+    assert turn_cost(None, PRICING) is None
+
+
+@pytest.mark.django_db
+def test_record_turn_updates_the_log_and_the_daily_aggregates(settings):
+    settings.RECIPE_LLM_ACCOUNTING = {"PRICING": PRICING, "LATENCY_BUCKETS_MS": [100, 1000]}
+    log = Ai_model_logs.objects.create(
+        title="Omelette", overview="", rating="4/5", ingredients=[], ingredient_items=[], instructions=""
+    )
+
+    record_turn(_trace(80, 120), log)
+    record_turn(_trace(2500, 2600, usage=None, model="fake-priced", error_class="APITimeoutError"))
+
+    log.refresh_from_db()
+    assert (log.model_name, log.prompt_tokens, log.cached_prompt_tokens, log.completion_tokens) == (
+        "fake-priced", 1500, 1000, 200,
+    )
+    assert log.cost_usd == Decimal("0.004500") and log.llm_ms == 80 and log.total_ms >= 120
+
+    daily = AiUsageDaily.objects.get(model_name="fake-priced")
+    assert (daily.turns, daily.errors, daily.prompt_tokens, daily.cost_usd) == (
+        2, 1, 1500, Decimal("0.004500"),
+    )
+    llm_counts = dict(
+        AiLatencyBucket.objects.filter(phase="llm").values_list("upper_ms", "count")
+    )
+    assert llm_counts == {100: 1, 1000: 0, OVERFLOW_MS: 1}
+
+
+@pytest.mark.django_db
+def test_daily_stats_report_histogram_percentiles(settings):
+    settings.RECIPE_LLM_ACCOUNTING = {"PRICING": PRICING, "LATENCY_BUCKETS_MS": [100, 500, 1000]}
+    for llm_ms in [50] * 90 + [400] * 8 + [900] * 2:
+        record_turn(_trace(llm_ms, llm_ms))
+
+    (today,) = ai_usage_daily_stats(days=1)
+    assert today["turns"] == 100
+    assert today["cost_usd"] == "0.450000"
+    assert (today["llm_p50_ms"], today["llm_p95_ms"], today["llm_p99_ms"]) == (100, 500, 1000)
+    assert today["avg_history_ms"] == 3.0
+
+
+@pytest.mark.django_db
+def test_send_message_records_the_turn(fake_llm, client, settings):
+    settings.RECIPE_RESPONSE_CACHE = {"ENABLED": False}
+    settings.RECIPE_MODEL_ROUTING = {"ROUTES": {"primary": {"MODEL": "fake-accounted", "TEMPERATURE": 0}}}
+    user = User.objects.create_user(email="accounting@example.com", password="pass")
+    token = RefreshToken.for_user(user).access_token
+
+    response = client.post(
+        "/api/v1/chats/send_message/",
+        {"message": "how long do I boil pasta?"},
+        content_type="application/json",
+        HTTP_AUTHORIZATION=f"Bearer {token}",
+    )
+
+    assert response.status_code == 200
+    daily = AiUsageDaily.objects.get(model_name="fake-accounted")
+    assert daily.turns == 1 and daily.llm_ms <= daily.total_ms
+    assert AiLatencyBucket.objects.filter(model_name="fake-accounted", phase="total", count=1).exists()
+
+
+@pytest.mark.django_db
+def test_streamed_turn_records_its_token_usage(fake_llm, client, settings):
+    settings.RECIPE_RESPONSE_CACHE = {"ENABLED": False}
+    settings.RECIPE_MODEL_ROUTING = {"ROUTES": {"primary": {"MODEL": "fake-priced", "TEMPERATURE": 0}}}
+    settings.RECIPE_LLM_ACCOUNTING = {"PRICING": PRICING}
+    fake_llm.usage = {
+        "prompt_tokens": 1500, "completion_tokens": 200, "total_tokens": 1700,
+        "prompt_tokens_details": {"cached_tokens": 1000},
+    }
+    user = User.objects.create_user(email="stream-accounting@example.com", password="pass")
+    token = RefreshToken.for_user(user).access_token
+
+    response = client.post(
+        "/api/v1/chats/send_message/stream/",
+        {"message": "how long do I boil pasta?"},
+        content_type="application/json",
+        HTTP_AUTHORIZATION=f"Bearer {token}",
+    )
+    body = b"".join(response.streaming_content).decode()
+
+    assert "event: done" in body and "Boil the pasta." in body
+    assert fake_llm.requests[-1]["stream_options"] == {"include_usage": True}
+    reply = ChatMessage.objects.get(sender="assistant")
+    assert (reply.input_tokens, reply.cached_input_tokens, reply.output_tokens) == (1500, 1000, 200)
+    daily = AiUsageDaily.objects.get(model_name="fake-priced")
+    assert (daily.turns, daily.prompt_tokens, daily.cost_usd) == (1, 1500, Decimal("0.004500"))
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from app.features.chat import ai_func
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    ai_func._reset_agent_registry()
+    yield
+    ai_func._reset_agent_registry()
+
+
+def test_agent_is_reused_per_model_configuration():
+    first = ai_func.get_recipe_agent()
+    assert ai_func.get_recipe_agent() is first
+    assert ai_func.get_recipe_agent(model="gpt-4o-mini") is not first
+
+
+def test_registry_is_rebuilt_in_a_new_process(monkeypatch):
+    first = ai_func.get_recipe_agent()
+    monkeypatch.setattr(ai_func, "_agent_registry_pid", os.getpid() + 1)
+    assert ai_func.get_recipe_agent() is not first
+
+
+def test_deadline_chains_are_compiled_once_per_second_of_timeout():
+    agent = ai_func.get_recipe_agent()
+    assert agent._chain_within(None) is agent.chain
+    assert agent._chain_within(agent.timeout + 1) is agent.chain
+    assert agent._chain_within(2.7) is agent._chain_within(2.2) is not agent.chain
+    assert agent._chain_within(0.3) is agent._chain_within(1.9)
@@ -0,0 +1,33 @@
+import pytest
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.accounts.models import User
+from app.features.chat.models import ChatMessage
+
+
+async def fake_response(user_input, conversation_history, trace=None):
+    return {"response_type": "conversation", "conversation_details": {"response": "Hi!"}}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_send_message_persists_turn(client, monkeypatch):
+    monkeypatch.setattr("app.features.chat.views.aget_recipe_response", fake_response)
+    user = User.objects.create_user(email="async@example.com", password="pass")
+    token = RefreshToken.for_user(user).access_token
+
+    response = client.post(
+        "/api/v1/chats/send_message/async/",
+        {"message": "hello"},
+        content_type="application/json",
+        HTTP_AUTHORIZATION=f"Bearer {token}",
+    )
+
+    assert response.status_code == 200
+    assert response.json()["conversation_details"]["response"] == "Hi!"
+    assert ChatMessage.objects.filter(chat_id=response.json()["chat_id"]).count() == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_send_message_requires_token(client):
+    response = client.post("/api/v1/chats/send_message/async/", {}, content_type="application/json")
+    assert response.status_code == 401
@@ -0,0 +1,66 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.accounts.models import User
+from app.features.chat.models import ChatMessage, ChatSession
+from app.features.chat.services import persist_turn
+
+RECIPE_RESULT = {
+    "response_type": "recipe",
+    "recipe_details": {"title": "Pancakes", "ingredients": ["2 eggs"], "instructions": "Fry."},
+}
+
+
+def _reply(text):
+    return {"response_type": "conversation", "conversation_details": {"response": text}}
+
+
+@pytest.mark.django_db
+def test_sessions_page_with_a_last_message_preview_in_one_query(client):
+    user = User.objects.create_user(email="listing@example.com", password="pass")
+    auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+    chats = [ChatSession.objects.create(user=user, title=f"chat {i}") for i in range(5)]
+    for chat in chats:
+        persist_turn(user, user.profile, chat, "pancakes", RECIPE_RESULT)
+    persist_turn(user, user.profile, chats[0], "and a dessert?", _reply("x" * 500))
+    ChatSession.objects.create(user=user, title="empty")
+
+    with CaptureQueriesContext(connection) as queries:
+        first = client.get("/api/v1/chats/sessions/?page_size=4", **auth).json()
+    chat_reads = [q["sql"] for q in queries if q["sql"].startswith("SELECT") and '"chat_' in q["sql"]]
+    assert len(chat_reads) == 1 and "chat_chatmessage" not in chat_reads[0]
+
+    assert [chat["title"] for chat in first["results"]] == ["empty", "chat 0", "chat 4", "chat 3"]
+    assert first["results"][0]["last_message"] is None
+    assert first["results"][1]["message_count"] == 4
+    assert first["results"][1]["last_message"]["preview"] == "x" * 120
+    assert first["results"][2]["last_message"] == {
+        "preview": "Pancakes", "message_type": "recipe",
+        "created_at": first["results"][2]["last_message"]["created_at"],
+    }
+
+    second = client.get(first["next"], **auth).json()
+    assert [chat["title"] for chat in second["results"]] == ["chat 2", "chat 1"]
+    assert second["next"] is None
+
+
+@pytest.mark.django_db
+def test_backfill_recomputes_the_columns_from_messages():
+    user = User.objects.create_user(email="backfill@example.com", password="pass")
+    chat = ChatSession.objects.create(user=user, title="old chat")
+    ChatMessage.objects.create(chat=chat, sender="user", content="hi")
+    last = ChatMessage.objects.create(
+        chat=chat, sender="assistant", message_type="error", extra_data={"title": "Recipe Request Invalid"}
+    )
+    updated_at = ChatSession.objects.get(pk=chat.pk).updated_at
+
+    call_command("backfill_chat_session_stats", batch_size=1)
+
+    chat.refresh_from_db()
+    assert (chat.message_count, chat.last_message_type, chat.last_message_preview) == (
+        2, "error", "Recipe Request Invalid"
+    )
+    assert chat.last_activity_at == last.created_at and chat.updated_at == updated_at
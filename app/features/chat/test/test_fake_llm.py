@@ -0,0 +1,48 @@
+import pytest
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.accounts.models import User
+from app.features.chat.ai_func import RecipeBotOutput, get_recipe_agent
+from app.features.chat.fake_llm import FakeRecipeAgent, fake_output
+
+FAKE_BACKEND = {
+    "AGENT_CLASS": "app.features.chat.fake_llm.FakeRecipeAgent",
+    "FAKE_LATENCY": 0,
+    "FAKE_STREAM_CHUNKS": 4,
+}
+
+
+def test_fake_output_is_deterministic_and_valid():
+    output = fake_output("Give me a dinner recipe with chicken and leeks")
+    assert output == fake_output("give me a DINNER recipe with chicken and leeks!")
+    parsed = RecipeBotOutput.model_validate(output)
+    assert parsed.response_type == "recipe"
+    assert parsed.recipe_details.ingredient_items == ["chicken", "leeks"]
+    assert fake_output("hello there")["response_type"] == "conversation"
+
+
+def test_fake_stream_grows_to_the_full_output():
+    agent = FakeRecipeAgent(latency=0, stream_chunks=4)
+    partials = list(agent.stream(user_input="cook rice", conversation_history=[]))
+    assert len(partials) == 4
+    assert partials[-1] == fake_output("cook rice")
+    assert len(str(partials[0])) < len(str(partials[-1]))
+
+
+@pytest.mark.django_db
+def test_send_message_runs_on_the_fake_backend(client, settings):
+    settings.RECIPE_LLM_BACKEND = FAKE_BACKEND
+    settings.RECIPE_RESPONSE_CACHE = {"ENABLED": False}
+    assert isinstance(get_recipe_agent(), FakeRecipeAgent)
+    user = User.objects.create_user(email="fake@example.com", password="pass")
+    token = RefreshToken.for_user(user).access_token
+
+    response = client.post(
+        "/api/v1/chats/send_message/",
+        {"message": "What can I cook with rice and eggs?"},
+        content_type="application/json",
+        HTTP_AUTHORIZATION=f"Bearer {token}",
+    )
+
+    assert response.status_code == 200
+    assert response.json()["response_type"] == "recipe"
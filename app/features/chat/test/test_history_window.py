@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.accounts.models import User
+from app.features.chat.history import build_history_window, fetch_history_rows
+from app.features.chat.models import ChatMessage, ChatSession
+from app.features.chat.recipes import store_recipe
+from app.features.chat.summary import unsummarized_messages
+
+
+def text(sender, content):
+    return SimpleNamespace(sender=sender, message_type="conversation", content=content, extra_data=None)
+
+
+def recipe(title):
+    return SimpleNamespace(
+        sender="assistant",
+        message_type="recipe",
+        content=None,
+        extra_data={"title": title, "ingredients": ["flour"] * 50, "instructions": "Bake. " * 50},
+    )
+
+
+def test_recent_turns_are_verbatim_and_older_recipes_collapse():
+    messages = [text("user", "banana bread"), recipe("Banana Bread"), text("user", "pancakes"), recipe("Pancakes")]
+
+    window = build_history_window(messages, "thanks", {"RECENT_TURNS": 1, "TOKEN_BUDGET": 3000})
+
+    contents = [m["content"] for m in window.messages]
+    assert contents[1] == "[Recipe shared earlier: Banana Bread]"
+    assert contents[3].startswith("{'title': 'Pancakes'")
+    assert contents[-1] == "thanks"
+    assert window.tokens_saved > 0
+
+
+def test_token_budget_drops_everything_older_than_the_first_overflow():
+    messages = [text("user", "old " * 100), text("assistant", "recent")]
+
+    window = build_history_window(messages, "hi", {"RECENT_TURNS": 4, "TOKEN_BUDGET": 50})
+
+    assert [m["content"] for m in window.messages] == ["recent", "hi"]
+    assert window.prompt_tokens <= 50
+
+
+@pytest.mark.django_db
+def test_fetch_reads_the_newest_unsummarised_rows_oldest_first():
+    user = User.objects.create_user(email="history-rows@example.com", password="pass")
+    chat = ChatSession.objects.create(user=user, title="chat")
+    sent = [ChatMessage.objects.create(chat=chat, sender="user", content=f"message {i}") for i in range(5)]
+    recipe = store_recipe({"title": "Pancakes", "ingredients": ["2 eggs"], "instructions": "Fry."})
+    ChatMessage.objects.create(chat=chat, sender="assistant", message_type="recipe", recipe=recipe)
+
+    rows = fetch_history_rows(chat.messages.all(), {"FETCH_LIMIT": 3})
+    assert [row.content for row in rows] == ["message 3", "message 4", None]
+    assert rows[-1].extra_data["title"] == "Pancakes"
+
+    chat.summary_until_message_id = sent[2].id
+    rows = fetch_history_rows(unsummarized_messages(chat), {"FETCH_LIMIT": 10})
+    assert [row.content for row in rows] == ["message 3", "message 4", None]
+    assert [row.sender for row in rows] == ["user", "user", "assistant"]
@@ -0,0 +1,26 @@
+import pytest
+
+from app.features.chat.ingredients import ParsedIngredient, ingredient_names, parse_ingredients
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("3 ripe bananas, mashed", (3.0, None, None, "banana", "ripe, mashed")),
+    ("1 1/2 cups all-purpose flour, sifted", (1.5, None, "cup", "flour", "sifted")),
+    ("2-3 cloves garlic, minced", (2.0, 3.0, "clove", "garlic", "minced")),
+    ("1 (14 oz) can diced tomatoes", (1.0, None, "can", "tomato", "diced, 14 oz")),
+    ("½ tsp. baking soda", (0.5, None, "tsp", "baking soda", "")),
+    ("200g spaghetti", (200.0, None, "g", "spaghetti", "")),
+    ("a pinch of salt", (1.0, None, "pinch", "salt", "")),
+    ("Salt and pepper to taste", (None, None, None, "salt and pepper", "to taste")),
+    ("2 tablespoons butter or margarine", (2.0, None, "tbsp", "butter", "or margarine")),
+    ("Juice of 1 lemon", (None, None, None, "lemon juice", "")),
+    ("10 oz asparagus", (10.0, None, "oz", "asparagus", "")),
+])
+def test_lines_split_into_quantity_unit_name_and_notes(line, expected):
+    (parsed,) = parse_ingredients([line])
+    assert parsed == ParsedIngredient(*expected)
+
+
+def test_names_are_distinct_and_split_on_and():
+    parsed = parse_ingredients(["2 eggs", "1 egg yolk", "salt and pepper", "2 tsp kosher salt", None])
+    assert ingredient_names(parsed) == ["egg", "egg yolk", "salt", "pepper"]
@@ -0,0 +1,33 @@
+import pytest
+
+from app.features.chat.intent_router import IntentRouter
+
+
+@pytest.mark.parametrize("text", ["Hi!", "hello there", "Thanks a lot", "thank you so much", "ok", "Bye"])
+def test_trivial_turns_are_answered_locally(text):
+    assert IntentRouter().route(text)["response_type"] == "conversation"
+
+
+@pytest.mark.parametrize(
+    "text", ["hi, give me a pancake recipe", "thanks, can I use oat milk instead?", "banana bread"]
+)
+def test_anything_about_food_goes_to_the_model(text):
+    assert IntentRouter().route(text) is None
+
+
+@pytest.mark.parametrize("text", ["sure", "ok", "alright"])
+def test_acknowledging_an_offer_goes_to_the_model(text):
+    history = [
+        {"sender": "user", "content": "banana bread please"},
+        {"sender": "assistant", "content": "Here it is. Would you like a vegan version?"},
+        {"sender": "user", "content": text},
+    ]
+    assert IntentRouter().route(text, history) is None
+
+
+def test_acknowledging_a_plain_answer_is_answered_locally():
+    history = [
+        {"sender": "user", "content": "how long do I rest the dough"},
+        {"sender": "assistant", "content": "Rest it for 30 minutes."},
+    ]
+    assert IntentRouter().route("ok", history)["response_type"] == "conversation"
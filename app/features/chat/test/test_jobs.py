@@ -0,0 +1,149 @@
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.accounts.models import User
+from app.features.chat import jobs
+from app.features.chat.models import ChatMessage, ChatSession, GenerationJob
+
+
+def _auth(user):
+    return {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+
+@pytest.mark.django_db
+def test_queued_turn_is_run_by_the_worker_and_polled(fake_llm, client, settings):
+    settings.RECIPE_RESPONSE_CACHE = {"ENABLED": False}
+    user = User.objects.create_user(email="jobs@example.com", password="pass")
+
+    response = client.post(
+        "/api/v1/chats/send_message/job/",
+        {"message": "how long do I boil pasta?"},
+        content_type="application/json",
+        **_auth(user),
+    )
+    assert response.status_code == 202
+    job_url = f"/api/v1/chats/jobs/{response.json()['job_id']}/"
+    queued = client.get(job_url, **_auth(user))
+    assert queued.json()["status"] == "queued" and queued["Retry-After"] == "1"
+    assert fake_llm.calls == 0
+
+    assert jobs.run_worker(lambda: False, once=True) == 1
+
+    done = client.get(job_url, **_auth(user)).json()
+    assert done["status"] == "done"
+    assert done["result"]["conversation_details"]["response"] == "Boil the pasta."
+    assert done["result"]["chat_id"] == done["chat_id"]
+    assert ChatMessage.objects.filter(chat_id=done["chat_id"]).count() == 2
+    other = User.objects.create_user(email="other@example.com", password="pass")
+    assert client.get(job_url, **_auth(other)).status_code == 404
+
+
+@pytest.mark.django_db
+def test_a_job_is_claimed_once_and_lost_jobs_are_requeued_or_failed(settings):
+    settings.RECIPE_GENERATION_JOBS = {"STALE_AFTER": 60, "MAX_ATTEMPTS": 2}
+    user = User.objects.create_user(email="claims@example.com", password="pass")
+    chat = ChatSession.objects.create(user=user, title="chat")
+    first = GenerationJob.objects.create(user=user, chat=chat, message="one")
+
+    assert jobs.claim_next_job().pk == first.pk
+    assert jobs.claim_next_job() is None
+
+    long_ago = timezone.now() - timedelta(seconds=120)
+    GenerationJob.objects.filter(pk=first.pk).update(started_at=long_ago)
+    lost_twice = GenerationJob.objects.create(
+        user=user, chat=chat, message="two", status=GenerationJob.RUNNING,
+        started_at=long_ago, attempts=2, generation_reserved=True,
+    )
+    user.profile.recipe_generate = 1
+    user.profile.save()
+
+    assert jobs.requeue_stale_jobs() == 1
+    first.refresh_from_db()
+    lost_twice.refresh_from_db()
+    assert first.status == GenerationJob.QUEUED
+    assert lost_twice.status == GenerationJob.FAILED
+    user.profile.refresh_from_db()
+    assert user.profile.recipe_generate == 0
+
+
+@pytest.mark.django_db
+def test_concurrent_sweeps_fail_a_lost_job_and_release_its_slot_once(settings, monkeypatch):
+    settings.RECIPE_GENERATION_JOBS = {"STALE_AFTER": 60, "MAX_ATTEMPTS": 1}
+    user = User.objects.create_user(email="sweeps@example.com", password="pass")
+    chat = ChatSession.objects.create(user=user, title="chat")
+    GenerationJob.objects.create(
+        user=user, chat=chat, message="lost", status=GenerationJob.RUNNING,
+        started_at=timezone.now() - timedelta(seconds=120), attempts=1, generation_reserved=True,
+    )
+    user.profile.recipe_generate = 2
+    user.profile.save()
+
+    release = jobs.GenerationSlot.release
+    swept = []
+
+    def release_while_another_worker_sweeps(slot):
+        if not swept:
+            swept.append(jobs.requeue_stale_jobs())
+        release(slot)
+
+    monkeypatch.setattr(jobs.GenerationSlot, "release", release_while_another_worker_sweeps)
+    jobs.requeue_stale_jobs()
+
+    user.profile.refresh_from_db()
+    assert user.profile.recipe_generate == 1
+    assert GenerationJob.objects.get().status == GenerationJob.FAILED
+
+
+@pytest.mark.django_db
+def test_worker_survives_queue_errors(settings, monkeypatch):
+    settings.RECIPE_GENERATION_JOBS = {"POLL_INTERVAL": 0, "MAX_BACKOFF": 0}
+    claims = iter([RuntimeError("connection already closed"), None])
+
+    def claim():
+        outcome = next(claims)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(jobs, "claim_next_job", claim)
+    assert jobs.run_worker(lambda: False, once=True) == 0
+
+
+@pytest.mark.django_db
+def test_results_are_pushed_to_allowed_callback_hosts_only(client, settings, monkeypatch):
+    settings.RECIPE_GENERATION_JOBS = {
+        "CALLBACK_ALLOWED_HOSTS": ["hooks.example.com"], "CALLBACK_SECRET": "s3cret",
+    }
+    user = User.objects.create_user(email="hooks@example.com", password="pass")
+    rejected = client.post(
+        "/api/v1/chats/send_message/job/",
+        {"message": "pasta?", "callback_url": "http://169.254.169.254/latest"},
+        content_type="application/json",
+        **_auth(user),
+    )
+    assert rejected.status_code == 400
+
+    posted = []
+
+    class Sent:
+        def raise_for_status(self):
+            pass
+
+    monkeypatch.setattr(jobs.httpx, "post", lambda url, **kwargs: posted.append((url, kwargs)) or Sent())
+    chat = ChatSession.objects.create(user=user, title="chat")
+    job = GenerationJob.objects.create(
+        user=user, chat=chat, message="pasta?", callback_url="https://hooks.example.com/recipes"
+    )
+    jobs._finish(job, GenerationJob.DONE, result={"response_type": "conversation"})
+
+    (url, kwargs), = posted
+    assert url == "https://hooks.example.com/recipes"
+    assert json.loads(kwargs["content"])["job_id"] == str(job.id)
+    expected = hmac.new(b"s3cret", kwargs["content"], hashlib.sha256).hexdigest()
+    assert kwargs["headers"]["X-Recipe-Signature"] == f"sha256={expected}"
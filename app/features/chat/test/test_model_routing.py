@@ -0,0 +1,57 @@
+from django.conf import settings
+
+from app.features.chat.ai_func import (AgentResult, ModelRouter, RecipeBotOutput,
+                                       RecipeOrchestrator, normalize_usage)
+from app.features.chat.response_cache import RecipeResponseCache
+
+HISTORY = [
+    {"sender": "user", "content": "banana bread recipe"},
+    {"sender": "assistant", "content": "{'title': 'Banana Bread'}"},
+    {"sender": "user", "content": "can I freeze it?"},
+]
+
+
+class FakeAgent:
+    def __init__(self, response_type):
+        self.response_type = response_type
+        self.calls = 0
+
+    def invoke(self, user_input, conversation_history, timeout=None):
+        self.calls += 1
+        details = {"response": "Yes."} if self.response_type == "conversation" else None
+        return AgentResult(
+            RecipeBotOutput(response_type=self.response_type, conversation_details=details),
+            normalize_usage({"input_tokens": 10, "output_tokens": 5}, "fake"),
+        )
+
+
+class RoutedOrchestrator(RecipeOrchestrator):
+    def __init__(self, agents):
+        super().__init__(
+            response_cache=RecipeResponseCache({"ENABLED": False}),
+            model_router=ModelRouter(settings.RECIPE_MODEL_ROUTING),
+        )
+        self.agents = agents
+
+    def _agent_for(self, route):
+        return self.agents[route]
+
+
+def test_fresh_chats_and_recipe_requests_use_the_primary_model():
+    router = ModelRouter(settings.RECIPE_MODEL_ROUTING)
+    assert router.choose("can I freeze it?", HISTORY[-1:]) == "primary"
+    assert router.choose("now give me a pancake recipe", HISTORY) == "primary"
+    assert router.choose("can I freeze it?", HISTORY) == "fast"
+
+
+def test_follow_up_stays_on_the_fast_model():
+    agents = {"fast": FakeAgent("conversation"), "primary": FakeAgent("conversation")}
+    result = RoutedOrchestrator(agents).run_analysis("can I freeze it?", HISTORY)
+    assert result["conversation_details"]["response"] == "Yes."
+    assert (agents["fast"].calls, agents["primary"].calls) == (1, 0)
+
+
+def test_fast_model_recipe_output_is_escalated():
+    agents = {"fast": FakeAgent("error"), "primary": FakeAgent("conversation")}
+    RoutedOrchestrator(agents).run_analysis("can I freeze it?", HISTORY)
+    assert (agents["fast"].calls, agents["primary"].calls) == (1, 1)
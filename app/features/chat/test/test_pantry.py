@@ -0,0 +1,94 @@
+import pytest
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.accounts.models import User
+from app.features.chat import pantry
+from app.features.chat.ai_func import RecipeAgent, RecipeOrchestrator
+from app.features.chat.pantry import PantryMatcher, parse_pantry_message
+from app.features.chat.recipes import store_recipe
+from app.features.chat.response_cache import RecipeResponseCache
+
+
+def _recipe(title, ingredients):
+    return store_recipe({"title": title, "ingredients": ingredients, "instructions": "Cook."})
+
+
+@pytest.fixture
+def recipes(db):
+    return {
+        "fried_rice": _recipe("Fried Rice", ["2 cups rice", "2 eggs", "1 tsp salt", "1 tbsp oil"]),
+        "paella": _recipe("Paella", ["2 chicken thighs", "1 cup rice", "1 onion", "saffron"]),
+        "omelette": _recipe("Omelette", ["3 eggs", "50 g cheddar", "salt"]),
+    }
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("I have chicken, rice and 2 onions", ["chicken", "rice", "onion"]),
+    ("What can I cook with eggs & some spinach?", ["egg", "spinach"]),
+    ("in my fridge: leftover rice, eggs, kimchi. Ideas?", ["rice", "egg", "kimchi"]),
+    ("I have a question about rice", None),
+    ("Give me a recipe for lasagne", None),
+])
+def test_pantry_messages_are_recognised(message, expected):
+    assert parse_pantry_message(message) == expected
+
+
+def test_recipes_rank_by_coverage_ignoring_staples(recipes):
+    matches = PantryMatcher().match(["rice", "eggs", "chicken"], min_coverage=0.5)
+
+    assert [(m.recipe.pk, m.coverage, m.missing) for m in matches] == [
+        (recipes["fried_rice"].pk, 1.0, []),
+        (recipes["paella"].pk, 0.5, ["onion", "saffron"]),
+        (recipes["omelette"].pk, 0.5, ["cheddar"]),
+    ]
+    # recipes stored later are matched on the next call
+    late = _recipe("Egg Rice Bowl", ["rice", "egg", "chicken breast"])
+    assert PantryMatcher().match(["rice", "egg", "chicken"], limit=1)[0].recipe == late
+
+
+def test_ingredient_lists_are_answered_from_stored_recipes(recipes, fake_llm):
+    orchestrator = RecipeOrchestrator(
+        recipe_agent=RecipeAgent(model="fake-pantry"),
+        response_cache=RecipeResponseCache({"ENABLED": False}),
+        pantry=PantryMatcher({"CHAT_MIN_COVERAGE": 1.0}),
+    )
+
+    offered = orchestrator.run_analysis("I have rice and eggs", [])
+    assert offered == {
+        "response_type": "recipe", "recipe_details": recipes["fried_rice"].details, "source": "pantry",
+    }
+    # already shown in this chat, and nothing else is fully covered
+    shown = [{"sender": "assistant", "content": str(recipes["fried_rice"].details)}]
+    orchestrator.run_analysis("I have rice and eggs", shown)
+    assert fake_llm.calls == 1
+    assert pantry.pantry_stats()["offered"] >= 1
+
+
+def test_pantry_offer_does_not_use_up_the_free_quota(recipes, fake_llm, client, monkeypatch, settings):
+    settings.RECIPE_RESPONSE_CACHE = {"ENABLED": False}
+    monkeypatch.setattr(pantry, "_matcher", None)
+    user = User.objects.create_user(email="pantry-quota@example.com", password="pass")
+    auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    response = client.post(
+        "/api/v1/chats/send_message/", {"message": "I have rice and eggs"},
+        content_type="application/json", **auth,
+    )
+
+    assert response.json()["recipe_details"]["title"] == "Fried Rice"
+    assert fake_llm.calls == 0
+    user.profile.refresh_from_db()
+    assert user.profile.recipe_generate == 0
+    recipes["fried_rice"].refresh_from_db()
+    assert recipes["fried_rice"].times_generated == 1
+
+
+def test_pantry_api_lists_missing_ingredients(recipes, client, monkeypatch):
+    monkeypatch.setattr(pantry, "_matcher", None)
+    user = User.objects.create_user(email="pantry@example.com", password="pass")
+    auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    assert client.get("/api/v1/chats/recipes/pantry/", **auth).status_code == 400
+    response = client.get("/api/v1/chats/recipes/pantry/?ingredients=chicken,rice,onion&min_coverage=0.7", **auth)
+    (result,) = response.json()["results"]
+    assert result["title"] == "Paella" and result["coverage"] == 0.75 and result["missing"] == ["saffron"]
@@ -0,0 +1,52 @@
+import pytest
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.accounts.models import User
+from app.features.chat.ai_func import RecipeAgent
+from app.features.chat.models import ChatMessage
+
+HISTORY = [
+    {"sender": "summary", "content": "The user is vegetarian."},
+    {"sender": "user", "content": "banana bread recipe"},
+    {"sender": "assistant", "content": "{'title': 'Banana Bread'}"},
+    {"sender": "user", "content": "can I freeze it?"},
+]
+
+
+def test_static_instructions_come_first_and_history_follows_as_messages(fake_llm):
+    agent = RecipeAgent(model="fake-layout")
+    agent.invoke(user_input="hello", conversation_history=[{"sender": "user", "content": "hello"}])
+    agent.invoke(user_input="can I freeze it?", conversation_history=HISTORY)
+
+    first, second = (request["messages"] for request in fake_llm.requests)
+    assert first[0] == second[0] and first[0]["role"] == "system"
+    assert first[1:] == [{"role": "user", "content": "hello"}]
+    assert [m["role"] for m in second[1:]] == ["system", "user", "assistant", "user"]
+    assert second[-1]["content"] == "can I freeze it?"
+    assert fake_llm.requests[0]["response_format"] == fake_llm.requests[1]["response_format"]
+
+
+@pytest.mark.django_db
+def test_token_usage_is_stored_with_the_turn(fake_llm, client, settings):
+    settings.RECIPE_RESPONSE_CACHE = {"ENABLED": False}
+    settings.RECIPE_MODEL_ROUTING = {"ROUTES": {"primary": {"MODEL": "fake-usage", "TEMPERATURE": 0}}}
+    fake_llm.usage = {
+        "prompt_tokens": 1500, "completion_tokens": 40, "total_tokens": 1540,
+        "prompt_tokens_details": {"cached_tokens": 1280},
+    }
+    user = User.objects.create_user(email="usage@example.com", password="pass")
+    token = RefreshToken.for_user(user).access_token
+
+    response = client.post(
+        "/api/v1/chats/send_message/",
+        {"message": "how long do I boil pasta?"},
+        content_type="application/json",
+        HTTP_AUTHORIZATION=f"Bearer {token}",
+    )
+
+    assert response.status_code == 200
+    assert "usage" not in response.json()
+    reply = ChatMessage.objects.get(chat_id=response.json()["chat_id"], sender="assistant")
+    assert (reply.model_name, reply.input_tokens, reply.cached_input_tokens, reply.output_tokens) == (
+        "fake-usage", 1500, 1280, 40,
+    )
@@ -0,0 +1,36 @@
+import pytest
+
+from app.accounts.models import User
+from app.features.chat.quota import FREE_RECIPE_LIMIT, reserve_generation_slot
+
+
+@pytest.fixture
+def profile():
+    return User.objects.create_user(email="quota@example.com", password="pass").profile
+
+
+@pytest.mark.django_db
+def test_slots_run_out_at_the_free_limit(profile):
+    slots = [reserve_generation_slot(profile) for _ in range(FREE_RECIPE_LIMIT)]
+    assert all(slots)
+    assert reserve_generation_slot(profile) is None
+    profile.refresh_from_db()
+    assert profile.recipe_generate == FREE_RECIPE_LIMIT
+
+
+@pytest.mark.django_db
+def test_non_recipe_turns_give_the_slot_back(profile):
+    slot = reserve_generation_slot(profile)
+    slot.settle({"response_type": "conversation"})
+    slot.settle({"error": "An unexpected error occurred."})
+    profile.refresh_from_db()
+    assert profile.recipe_generate == 0
+
+
+@pytest.mark.django_db
+def test_subscribers_are_not_metered(profile):
+    profile.is_subs = True
+    profile.recipe_generate = 10
+    profile.save()
+    slot = reserve_generation_slot(profile)
+    assert slot is not None and not slot.reserved
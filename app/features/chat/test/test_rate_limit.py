@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from app.features.chat import resilience
+from app.features.chat.ai_func import RecipeAgent, RecipeOrchestrator
+from app.features.chat.rate_limit import (ConcurrencyLimitExceeded, RateLimiter, RateLimitExceeded,
+                                          estimate_prompt_tokens)
+from app.features.chat.response_cache import RecipeResponseCache
+
+
+def _limiter(**config):
+    return RateLimiter({"CACHE_ALIAS": None, "FILE_PATH": None, "OUTPUT_TOKENS": 0, **config})
+
+
+def test_calls_over_the_request_budget_are_shed_with_a_retry_hint():
+    limiter = _limiter(MAX_WAIT=0, LIMITS={"fake-rpm": {"RPM": 2}})
+    limiter.acquire("fake-rpm", 10)
+    limiter.acquire("fake-rpm", 10)
+    with pytest.raises(RateLimitExceeded) as shed:
+        limiter.acquire("fake-rpm", 10)
+    assert 25 < shed.value.retry_after <= 30
+    limiter.acquire("unlimited-model", 10**6)
+
+
+def test_calls_queue_for_token_budget_within_max_wait():
+    limiter = _limiter(MAX_WAIT=1, LIMITS={"fake-tpm": {"TPM": 600}})
+    limiter.acquire("fake-tpm", 600)
+    started = time.monotonic()
+    limiter.acquire("fake-tpm", 2)  # 10 tokens/s refill: about 0.2s
+    assert 0.15 < time.monotonic() - started < 1
+    assert not limiter.try_acquire("fake-tpm", 600)
+
+
+def test_workers_share_one_budget_through_the_bucket_file(tmp_path):
+    path = str(tmp_path / "buckets.sqlite3")
+    workers = [
+        _limiter(FILE_PATH=path, LOCAL_WORKERS=4, MAX_WAIT=0, LIMITS={"fake-shared": {"RPM": 2}})
+        for _ in range(2)
+    ]
+    workers[0].acquire("fake-shared", 10)
+    workers[1].acquire("fake-shared", 10)
+    with pytest.raises(RateLimitExceeded):
+        workers[0].acquire("fake-shared", 10)
+    assert not workers[1].try_acquire("fake-shared", 10)
+
+
+def test_per_process_buckets_split_the_limits_and_warn(caplog):
+    limiter = _limiter(LOCAL_WORKERS=4, MAX_WAIT=0, LIMITS={"fake-split": {"RPM": 8}})
+    assert "1/4 of the limits" in caplog.text
+    limiter.acquire("fake-split", 10)
+    limiter.acquire("fake-split", 10)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("fake-split", 10)
+
+
+def test_concurrency_gate_sheds_when_all_slots_are_held():
+    limiter = _limiter(MAX_WAIT=0, MAX_CONCURRENCY=1)
+    with limiter.slot("fake-gate"):
+        with pytest.raises(ConcurrencyLimitExceeded):
+            with limiter.slot("fake-gate"):
+                pass
+    with limiter.slot("fake-gate"):
+        pass
+
+
+def test_shed_turns_get_a_busy_reply_without_calling_the_provider(fake_llm, monkeypatch):
+    limiter = _limiter(MAX_WAIT=0, LIMITS={"fake-limited": {"RPM": 1}})
+    monkeypatch.setattr(resilience, "get_rate_limiter", lambda: limiter)
+    agent = RecipeAgent(model="fake-limited")
+    orchestrator = RecipeOrchestrator(
+        recipe_agent=agent, response_cache=RecipeResponseCache({"ENABLED": False})
+    )
+
+    assert "response_type" in orchestrator.run_analysis("how long do I boil pasta?", [])
+    busy = orchestrator.run_analysis("and how long for rice?", [])
+
+    assert busy["error_type"] == "rate_limited" and busy["retry_after"] >= 1
+    assert fake_llm.calls == 1
+    # the system prompt is charged too, not just the user's words
+    assert agent.prompt_tokens("pasta?", []) > estimate_prompt_tokens("pasta?", []) + 100
@@ -0,0 +1,57 @@
+import pytest
+
+from app.accounts.models import User
+from app.features.chat.history import build_history_window, fetch_history_rows
+from app.features.chat.models import Ai_model_logs, ChatMessage, ChatSession, Recipe
+from app.features.chat.recipes import recipe_fingerprint, store_recipe
+from app.features.chat.serializers import AiModelLogsSerializer, ChatMessageSerializer
+from app.features.chat.services import persist_turn
+
+BANANA_BREAD = {
+    "title": "Banana Bread",
+    "overview/details": "Moist and easy.",
+    "rating": "4.8/5",
+    "ingredients": ["3 ripe bananas, mashed", "1/3 cup melted butter"],
+    "ingrediants items": ["bananas", "butter"],
+    "instructions": "Mix.\nBake.",
+}
+
+
+def test_fingerprint_ignores_title_case_quantities_and_order():
+    assert recipe_fingerprint("Banana Bread!", ["banana", "butter"]) == recipe_fingerprint(
+        "banana  bread", ["butter", "banana", "banana"]
+    )
+    assert recipe_fingerprint("Banana Bread", ["banana"]) != recipe_fingerprint("Banana Bread", ["banana", "butter"])
+
+
+@pytest.mark.django_db
+def test_recipe_is_stored_once_with_its_parsed_ingredients():
+    recipe = store_recipe(BANANA_BREAD)
+    again = store_recipe({**BANANA_BREAD, "title": "banana bread", "ingredients": ["2 bananas", "butter"]})
+
+    assert again.pk == recipe.pk and again.details == BANANA_BREAD
+    assert Recipe.objects.get().times_generated == 2
+    assert recipe.ingredient_items == ["banana", "butter"]
+    assert recipe.parsed_ingredients[1] == {
+        "quantity": 0.333, "quantity_max": None, "unit": "cup", "name": "butter", "notes": "melted",
+    }
+
+
+@pytest.mark.django_db
+def test_turns_reference_the_shared_recipe_and_render_it_unchanged():
+    user = User.objects.create_user(email="recipes@example.com", password="pass")
+    chat = ChatSession.objects.create(user=user, title="chat")
+    result = {"response_type": "recipe", "recipe_details": BANANA_BREAD}
+    for _ in range(2):
+        log = persist_turn(user, user.profile, chat, "banana bread", result)
+
+    assistant = ChatMessage.objects.filter(sender="assistant").select_related("recipe")
+    assert Recipe.objects.count() == 1 and {m.recipe_id for m in assistant} == {log.recipe_id}
+    assert all(m.extra_data is None for m in assistant)
+    assert ChatMessageSerializer(assistant[0]).data["extra_data"] == BANANA_BREAD
+    assert AiModelLogsSerializer(Ai_model_logs.objects.get(pk=log.pk)).data["overview"] == "Moist and easy."
+
+    rows = fetch_history_rows(ChatMessage.objects.filter(chat=chat))
+    assert rows[-1].extra_data == BANANA_BREAD
+    window = build_history_window(rows, "thanks", config={"RECENT_TURNS": 1})
+    assert window.messages[1]["content"] == "[Recipe shared earlier: Banana Bread]"
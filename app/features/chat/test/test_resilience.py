@@ -0,0 +1,101 @@
+import time
+
+import httpx
+import pytest
+
+from app.features.chat.ai_func import RecipeAgent, RecipeOrchestrator
+from app.features.chat.fake_llm import FakeRecipeAgent
+from app.features.chat.resilience import CircuitOpenError, ResilientAgent, resilience_config
+from app.features.chat.response_cache import RecipeResponseCache
+
+
+def _config(**overrides):
+    return {**resilience_config(), "BACKOFF_INITIAL": 0, "BACKOFF_MAX": 0, **overrides}
+
+
+def test_transient_server_errors_are_retried(fake_llm):
+    fake_llm.failures = 2
+    agent = ResilientAgent(RecipeAgent(model="fake-retry"), _config(MAX_ATTEMPTS=3))
+    result = agent.invoke(user_input="pasta?", conversation_history=[])
+    assert result.output.conversation_details.response == "Boil the pasta."
+    assert fake_llm.calls == 3
+
+
+def test_breaker_opens_and_fails_fast(fake_llm):
+    fake_llm.failures = 100
+    config = _config(MAX_ATTEMPTS=1, BREAKER_FAILURE_THRESHOLD=2, BREAKER_RESET_TIMEOUT=60)
+    agent = ResilientAgent(RecipeAgent(model="fake-breaker"), config)
+    for _ in range(2):
+        with pytest.raises(Exception):
+            agent.invoke(user_input="pasta?", conversation_history=[])
+    with pytest.raises(CircuitOpenError):
+        agent.invoke(user_input="pasta?", conversation_history=[])
+    assert fake_llm.calls == 2
+
+    result = RecipeOrchestrator(
+        recipe_agent=agent.agent, response_cache=RecipeResponseCache({"ENABLED": False})
+    ).run_analysis("pasta?", [])
+    assert result["error"] == "The recipe assistant is temporarily unavailable."
+    assert fake_llm.calls == 2
+
+
+def test_half_open_breaker_closes_after_a_successful_trial(fake_llm):
+    fake_llm.failures = 1
+    config = _config(MAX_ATTEMPTS=1, BREAKER_FAILURE_THRESHOLD=1, BREAKER_RESET_TIMEOUT=0)
+    agent = ResilientAgent(RecipeAgent(model="fake-half-open"), config)
+    with pytest.raises(Exception):
+        agent.invoke(user_input="pasta?", conversation_history=[])
+    agent.invoke(user_input="pasta?", conversation_history=[])
+    assert agent.breaker.state == "closed"
+
+
+class StubAgent:
+    """Streams two partials; invoke answers after `latency`, or raises `error` after it."""
+
+    def __init__(self, model, calls=()):
+        self.model = model
+        self.calls = list(calls)
+
+    def stream(self, user_input, conversation_history, on_usage=None):
+        yield {"response_type": "conversation"}
+        yield {"response_type": "conversation", "conversation_details": {"response": "Yes."}}
+
+    def invoke(self, user_input, conversation_history, timeout=None):
+        latency, error = self.calls.pop(0)
+        time.sleep(latency)
+        if error:
+            raise error
+        return "answer"
+
+
+def test_closing_a_half_open_stream_early_ends_the_trial():
+    config = _config(BREAKER_FAILURE_THRESHOLD=1, BREAKER_RESET_TIMEOUT=0)
+    agent = ResilientAgent(StubAgent("stub-stream-closed"), config)
+    agent.breaker.record_failure()
+    assert agent.breaker.state == "half-open"
+
+    stream = agent.stream(user_input="pasta?", conversation_history=[])
+    next(stream)
+    # the SSE client disconnects
+    stream.close()
+
+    assert list(agent.stream(user_input="pasta?", conversation_history=[]))
+    assert agent.breaker.state == "closed"
+
+
+def test_hedge_answers_when_the_first_call_fails_while_it_runs():
+    config = _config(MAX_ATTEMPTS=1, HEDGE_ENABLED=True, HEDGE_MIN_SAMPLES=1)
+    agent = ResilientAgent(
+        StubAgent("stub-hedge", [(0.2, RuntimeError("bad request")), (0.3, None)]), config
+    )
+    agent.latency.add(0.05)
+    assert agent.invoke(user_input="pasta?", conversation_history=[]) == "answer"
+
+
+def test_every_attempt_stays_within_the_total_deadline():
+    config = _config(MAX_ATTEMPTS=3, CALL_TIMEOUT=5, TOTAL_DEADLINE=0.3)
+    agent = ResilientAgent(FakeRecipeAgent(model="fake-deadline", latency=2), config)
+    started = time.monotonic()
+    with pytest.raises(httpx.TimeoutException):
+        agent.invoke(user_input="pasta?", conversation_history=[])
+    assert time.monotonic() - started < 1
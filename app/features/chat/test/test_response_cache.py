@@ -0,0 +1,37 @@
+import pytest
+
+from app.features.chat.response_cache import RecipeResponseCache
+
+RESULT = {"response_type": "recipe", "recipe_details": {"title": "Banana Bread"}}
+
+
+@pytest.fixture
+def response_cache():
+    cache = RecipeResponseCache(
+        {"CACHE_ALIAS": "recipe_responses", "SIMILARITY_THRESHOLD": 0.85}
+    )
+    cache.cache.clear()
+    return cache
+
+
+def history(*messages):
+    return [{"sender": "user", "content": m} for m in messages]
+
+
+def test_exact_hit_ignores_case_and_punctuation(response_cache):
+    response_cache.set("Banana bread recipe!", history("Banana bread recipe!"), RESULT)
+    assert response_cache.get("banana  BREAD recipe", history("banana BREAD recipe")) == RESULT
+    assert response_cache.stats()["exact_hit"] == 1
+
+
+def test_similar_prompt_hits_only_without_history(response_cache):
+    response_cache.set("banana bread recipe", history("banana bread recipe"), RESULT)
+    assert response_cache.get("give me a recipe for banana bread", history("x")) == RESULT
+    assert response_cache.get("banana bread", history("earlier turn", "banana bread")) is None
+    stats = response_cache.stats()
+    assert (stats["similar_hit"], stats["miss"]) == (1, 1)
+
+
+def test_error_payloads_are_not_cached(response_cache):
+    response_cache.set("vegan beef", history("vegan beef"), {"error": "boom"})
+    assert response_cache.get("vegan beef", history("vegan beef")) is None
@@ -0,0 +1,52 @@
+import pytest
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.accounts.models import User
+from app.features.chat import search
+from app.features.chat.recipes import store_recipe
+
+
+def _recipe(title, ingredients, instructions="Cook.", overview=""):
+    return store_recipe({
+        "title": title, "overview/details": overview, "ingredients": ingredients, "instructions": instructions,
+    })
+
+
+@pytest.fixture
+def recipes(db, monkeypatch):
+    # a fresh in-process index per test: SQLite reuses ids of rolled-back rows
+    monkeypatch.setattr(search, "_memory_index", None)
+    return {
+        "paella": _recipe("Chicken Paella", ["2 chicken thighs", "1 cup rice", "saffron"], "Simmer the rice."),
+        "fried_rice": _recipe("Egg Fried Rice", ["2 cups cooked rice", "2 eggs"], "Fry the chicken stock-free rice."),
+        "soup": _recipe("Chicken Noodle Soup", ["1 chicken breast", "noodles"], overview="A rice-free classic."),
+    }
+
+
+def test_ingredient_words_match_canonical_names(recipes):
+    found = search.search_recipes(ingredients=["Chicken", "rice"])
+    assert [recipe.pk for recipe in found] == [recipes["paella"].pk]
+    assert {r.pk for r in search.search_recipes(ingredients=["chicken breasts"])} == {recipes["soup"].pk}
+
+
+def test_text_matches_need_every_word_and_rank_title_first(recipes):
+    found = search.search_recipes("rice")
+    assert [recipe.pk for recipe in found][:1] == [recipes["fried_rice"].pk]
+    assert {recipe.pk for recipe in found} == {r.pk for r in recipes.values()}
+    assert [r.pk for r in search.search_recipes("chicken rice", ingredients=["egg"])] == [recipes["fried_rice"].pk]
+    assert search.search_recipes("lasagne") == []
+    # recipes stored after the index was built are picked up on the next search
+    late = _recipe("Lasagne", ["9 lasagne sheets"])
+    assert search.search_recipes("lasagne") == [late]
+
+
+def test_search_api_requires_a_query(recipes, client):
+    user = User.objects.create_user(email="search@example.com", password="pass")
+    auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    assert client.get("/api/v1/chats/recipes/search/", **auth).status_code == 400
+    response = client.get("/api/v1/chats/recipes/search/?q=paella&ingredients=rice,chicken", **auth)
+    assert response.status_code == 200
+    (result,) = response.json()["results"]
+    assert result["title"] == "Chicken Paella" and result["details"]["instructions"] == "Simmer the rice."
+    assert result["rank"] > 0
@@ -0,0 +1,28 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from app.accounts.models import User
+from app.features.chat.models import Ai_model_logs, ChatMessage, ChatSession
+from app.features.chat.services import persist_turn
+
+RECIPE_RESULT = {
+    "response_type": "recipe",
+    "recipe_details": {"title": "Pancakes", "ingredients": ["2 eggs"], "instructions": "Fry."},
+}
+
+
+@pytest.mark.django_db
+def test_recipe_turn_is_written_in_one_transaction():
+    user = User.objects.create_user(email="turn@example.com", password="pass")
+    chat = ChatSession.objects.create(user=user, title="chat")
+
+    with CaptureQueriesContext(connection) as queries:
+        log = persist_turn(user, user.profile, chat, "pancakes", RECIPE_RESULT)
+
+    writes = [q["sql"] for q in queries if q["sql"].startswith(("INSERT", "UPDATE"))]
+    assert len(writes) == 5  # recipe, messages, log, counter, updated_at
+    assert list(ChatMessage.objects.filter(chat=chat).values_list("sender", flat=True)) == ["user", "assistant"]
+    assert Ai_model_logs.objects.get() == log and log.title == "Pancakes"
+    user.profile.refresh_from_db()
+    assert user.profile.recipe_generate == 1
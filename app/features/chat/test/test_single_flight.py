@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+
+from app.features.chat.accounting import TurnTrace
+from app.features.chat.ai_func import AgentResult, RecipeBotOutput, RecipeOrchestrator, normalize_usage
+from app.features.chat.response_cache import RecipeResponseCache
+from app.features.chat.single_flight import SingleFlight, single_flight_key
+
+
+class SlowAgent:
+    model = "fake-slow"
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, user_input, conversation_history, timeout=None):
+        self.calls += 1
+        time.sleep(0.2)
+        return AgentResult(
+            RecipeBotOutput(response_type="conversation", conversation_details={"response": "Yes."}),
+            normalize_usage({"input_tokens": 10, "output_tokens": 5}, "fake-slow"),
+        )
+
+
+def test_identical_concurrent_turns_share_one_model_call():
+    agent = SlowAgent()
+    orchestrator = RecipeOrchestrator(
+        recipe_agent=agent,
+        response_cache=RecipeResponseCache({"ENABLED": False}),
+        single_flight=SingleFlight({"CACHE_ALIAS": None}),
+    )
+    traces = [TurnTrace() for _ in range(5)]
+    results = [None] * 5
+
+    def turn(i):
+        results[i] = orchestrator.run_analysis("Pasta carbonara?", [], trace=traces[i])
+
+    threads = [threading.Thread(target=turn, args=(i,)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert agent.calls == 1
+    assert all(result["conversation_details"]["response"] == "Yes." for result in results)
+    assert results[0] is not results[1]
+    assert sum(trace.usage is not None for trace in traces) == 1
+    assert sum(trace.cache_hit for trace in traces) == 4
+
+
+def test_workers_share_a_call_through_the_cache_lock():
+    # two SingleFlight instances stand in for two worker processes
+    config = {"CACHE_ALIAS": "default", "POLL_INTERVAL": 0.01}
+    first, second = SingleFlight(config), SingleFlight(config)
+    key = single_flight_key("pancakes please", [])
+    started = threading.Event()
+    calls = []
+
+    def slow():
+        started.set()
+        calls.append("first")
+        time.sleep(0.2)
+        return {"result": "pancakes"}
+
+    leader = threading.Thread(target=lambda: first.do(key, slow))
+    leader.start()
+    started.wait()
+    value, led = second.do(key, lambda: calls.append("second") or {"result": "again"})
+    leader.join()
+
+    assert (value, led) == ({"result": "pancakes"}, False)
+    assert calls == ["first"]
+
+
+def test_async_callers_on_one_loop_share_a_call():
+    single_flight = SingleFlight({"CACHE_ALIAS": None})
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"result": "soup"}
+
+    async def burst():
+        key = single_flight_key("Soup?", [])
+        return await asyncio.gather(*(single_flight.ado(key, slow) for _ in range(4)))
+
+    outcomes = asyncio.run(burst())
+    assert len(calls) == 1
+    assert [led for _value, led in outcomes].count(True) == 1
+    assert all(value == {"result": "soup"} for value, _led in outcomes)
@@ -0,0 +1,43 @@
+import pytest
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.accounts.models import User
+from app.features.chat.models import Ai_model_logs, ChatMessage
+
+RECIPE = {
+    "title": "Banana Bread",
+    "overview/details": "Moist and easy.",
+    "rating": "4.8/5",
+    "ingredients": ["3 ripe bananas, mashed"],
+    "ingrediants items": ["bananas"],
+    "instructions": "Mix.\nBake.",
+}
+
+
+def fake_stream(user_input, conversation_history, trace=None):
+    yield "partial", {"response_type": "recipe", "recipe_details": {"title": "Banana"}}
+    yield "partial", {"response_type": "recipe", "recipe_details": {"title": "Banana Bread"}}
+    yield "result", {"response_type": "recipe", "recipe_details": RECIPE}
+
+
+@pytest.mark.django_db
+def test_stream_emits_partials_then_persists_turn(client, monkeypatch):
+    monkeypatch.setattr("app.features.chat.views.stream_recipe_response", fake_stream)
+    user = User.objects.create_user(email="stream@example.com", password="pass")
+    token = RefreshToken.for_user(user).access_token
+
+    response = client.post(
+        "/api/v1/chats/send_message/stream/",
+        {"message": "banana bread"},
+        content_type="application/json",
+        HTTP_AUTHORIZATION=f"Bearer {token}",
+    )
+    body = b"".join(response.streaming_content).decode()
+
+    assert response["Content-Type"] == "text/event-stream"
+    assert body.index("event: chat") < body.index("event: partial") < body.index("event: done")
+    assert body.count("event: partial") == 2
+    assert ChatMessage.objects.filter(message_type="recipe").count() == 1
+    assert Ai_model_logs.objects.get().title == "Banana Bread"
+    user.profile.refresh_from_db()
+    assert user.profile.recipe_generate == 1
@@ -0,0 +1,44 @@
+from openai.lib._parsing._completions import type_to_response_format_param
+
+from app.features.chat.ai_func import BotReply, expand_reply, to_recipe_bot_output
+
+
+def test_recipe_reply_maps_back_to_the_api_shape():
+    reply = BotReply.model_validate({"reply": {
+        "type": "recipe", "title": "Omelette", "overview": "Quick.", "rating": "4.5/5",
+        "ingredients": ["2 eggs"], "items": ["eggs"], "instructions": "1. Whisk.\n2. Fry.",
+    }})
+    assert to_recipe_bot_output(reply).model_dump(by_alias=True, exclude_none=True) == {
+        "response_type": "recipe",
+        "recipe_details": {
+            "title": "Omelette", "overview/details": "Quick.", "rating": "4.5/5",
+            "ingredients": ["2 eggs"], "ingrediants items": ["eggs"],
+            "instructions": "1. Whisk.\n2. Fry.",
+        },
+    }
+
+
+def test_conversation_and_error_replies_map_back():
+    conversation = BotReply.model_validate(
+        {"reply": {"type": "conversation", "response": "Yes.", "items": None}}
+    )
+    assert to_recipe_bot_output(conversation).model_dump(by_alias=True, exclude_none=True) == {
+        "response_type": "conversation", "conversation_details": {"response": "Yes."},
+    }
+    error = BotReply.model_validate(
+        {"reply": {"type": "error", "title": "Invalid", "reason": "Pork is haram.", "items": ["pork"]}}
+    )
+    assert to_recipe_bot_output(error).error_details.overview == "Pork is haram."
+
+
+def test_partial_replies_expand_field_by_field():
+    assert expand_reply({}) == {}
+    assert expand_reply({"reply": {"type": "recipe", "title": "Ome"}}) == {
+        "response_type": "recipe", "recipe_details": {"title": "Ome"},
+    }
+
+
+def test_response_format_is_strict_and_compact():
+    response_format = type_to_response_format_param(BotReply)["json_schema"]
+    assert response_format["strict"] is True
+    assert "ingrediants items" not in str(response_format["schema"])
@@ -0,0 +1,49 @@
+import pytest
+
+from app.accounts.models import User
+from app.features.chat.models import ChatMessage, ChatSession
+from app.features.chat.summary import schedule_summary_update, unsummarized_messages, update_summary
+
+
+class FakeSummaryAgent:
+    def __init__(self):
+        self.calls = []
+
+    def run(self, summary, messages):
+        self.calls.append((summary, messages))
+        return f"summary of {len(messages)} messages"
+
+
+@pytest.mark.django_db
+def test_update_folds_only_messages_outside_the_verbatim_window(settings):
+    settings.RECIPE_HISTORY_WINDOW = {"RECENT_TURNS": 1}
+    user = User.objects.create_user(email="summary@example.com", password="pass")
+    chat = ChatSession.objects.create(user=user, title="long chat")
+    for i in range(5):
+        ChatMessage.objects.create(chat=chat, sender="user", content=f"message {i}")
+    ChatMessage.objects.create(
+        chat=chat, sender="assistant", message_type="recipe", extra_data={"title": "Pancakes"}
+    )
+    agent = FakeSummaryAgent()
+
+    assert update_summary(chat.id, summary_agent=agent) is True
+
+    chat.refresh_from_db()
+    assert chat.summary == "summary of 4 messages"
+    assert chat.summarized_message_count == 4
+    assert [m.content for m in unsummarized_messages(chat).order_by("id")] == ["message 4", None]
+    assert update_summary(chat.id, summary_agent=agent) is False
+
+
+@pytest.mark.django_db
+def test_summary_backlog_is_read_from_the_session_counters(settings, django_assert_num_queries):
+    settings.RECIPE_HISTORY_WINDOW = {"RECENT_TURNS": 1}
+    settings.RECIPE_CONVERSATION_SUMMARY = {"TRIGGER_MESSAGES": 4}
+    user = User.objects.create_user(email="summary-backlog@example.com", password="pass")
+    chat = ChatSession.objects.create(user=user, title="chat", message_count=7, summarized_message_count=2)
+
+    with django_assert_num_queries(0):
+        # 5 unsummarised, 2 of them still in the verbatim window
+        assert schedule_summary_update(chat) is False
+        chat.message_count += 1
+        assert schedule_summary_update(chat) is True
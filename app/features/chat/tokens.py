@@ -0,0 +1,37 @@
+import functools
+import logging
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING_MODEL = "gpt-4o"
+# Average characters per token for English text, used when no encoding is available.
+CHARS_PER_TOKEN = 4
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """Loads the tiktoken encoding once per process; None if it cannot be loaded
+    (tiktoken downloads the BPE file on first use and may be offline)."""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:  # model unknown to this tiktoken release
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning("tiktoken encoding unavailable, estimating tokens: %s", e)
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def count_tokens(text: str, model: str = DEFAULT_ENCODING_MODEL) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
@@ -1,11 +1,35 @@
-from rest_framework.decorators import api_view
+import json
+
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.generics import ListAPIView
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from app.features.chat.ai_func import get_recipe_response
+from app.accounts.models import UserProfile
+from app.features.chat.accounting import TurnTrace, ai_usage_daily_stats, record_turn
+from app.features.chat.ai_func import (ModelRouter, aget_recipe_response,
+                                       get_recipe_response, stream_recipe_response)
+from app.features.chat.history import history_window_stats
+from app.features.chat.response_cache import get_response_cache
+from app.features.chat.intent_router import intent_router_stats
+from app.features.chat.jobs import PENDING, callback_allowed, enqueue_generation, job_payload
+from app.features.chat.pantry import get_pantry_matcher, pantry_stats
+from app.features.chat.quota import PLAN_UPDATE_RESPONSE, reserve_generation_slot
+from app.features.chat.rate_limit import rate_limit_stats
+from app.features.chat.resilience import breaker_states
+from app.features.chat.search import search_recipes
+from app.features.chat.services import abuild_history, build_history, persist_turn
+from app.features.chat.single_flight import single_flight_stats
 
-from .models import Ai_model_logs, ChatMessage, ChatSession
-from .serializers import (AiModelLogsSerializer, ChatMessageSerializer,ChatAllSessionSerializer)
+from .models import Ai_model_logs, ChatMessage, ChatSession, GenerationJob
+from .serializers import (AiModelLogsSerializer, ChatMessageSerializer,ChatAllSessionSerializer,
+                          ChatSessionSerializer, RecipeSerializer)
 from datetime import datetime
 
 
@@ -13,135 +37,105 @@ from datetime import datetime
 def list_chats(request):
     """Return chat sessions with last message preview"""
     user = request.user
-    chats = ChatSession.objects.filter(user=user).order_by("-updated_at")
+    chats = (
+        ChatSession.objects.filter(user=user)
+        .order_by("-updated_at")
+        .prefetch_related(Prefetch("messages", ChatMessage.objects.select_related("recipe")))
+    )
     serializer = ChatAllSessionSerializer(chats, many=True)
     return Response(serializer.data, status=200)
 
 
+CHAT_LIST_FIELDS = (
+    "id", "title", "created_at", "updated_at", "message_count",
+    "last_message_preview", "last_message_type", "last_activity_at",
+)
+
+
+class ChatSessionCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    # id breaks ties between sessions updated in the same instant
+    ordering = ("-updated_at", "-id")
+
+
+@api_view(["GET"])
+def list_chat_sessions(request):
+    """Chat sessions for the sidebar, most recently active first, with a preview
+    of each one's last message instead of the whole conversation. Follow the
+    `next` link (?cursor=) for older sessions; ?page_size= up to 100"""
+    # one scan of the (user, -updated_at, -id) index; the preview is on the row
+    chats = ChatSession.objects.filter(user=request.user).only(*CHAT_LIST_FIELDS)
+    paginator = ChatSessionCursorPagination()
+    page = paginator.paginate_queryset(chats, request)
+    return paginator.get_paginated_response(ChatSessionSerializer(page, many=True).data)
+
+
+def _get_or_create_chat(user, chat_id):
+    """Returns the user's chat session, a new one if no chat_id was sent, or None."""
+    if chat_id:
+        try:
+            return ChatSession.objects.get(id=chat_id, user=user)
+        except ChatSession.DoesNotExist:
+            return None
+    title = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    return ChatSession.objects.create(user=user, title=title)
+
+
+async def _aget_or_create_chat(user, chat_id):
+    if chat_id:
+        try:
+            return await ChatSession.objects.aget(id=chat_id, user=user)
+        except ChatSession.DoesNotExist:
+            return None
+    title = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    return await ChatSession.objects.acreate(user=user, title=title)
+
+
 @api_view(["POST"])
 def send_message(request):
+    trace = TurnTrace()
     user = request.user
     profile = user.profile
     message = request.data.get("message")
     chat_id = request.data.get("chat_id")
-    
-    title = request.data.get("title", "New Chat")
-    if profile.recipe_generate > 2 and profile.is_subs is False:
-        return Response(
-            {
-                "error": "You have already generated your free 3 recipe. Please upgrade your plan",
-                "error_type": "plan_update_message",
-            }
-        )
+
+    # --- Reserve a free-tier generation before anything is spent on it ---
+    slot = reserve_generation_slot(profile)
+    if slot is None:
+        return Response(PLAN_UPDATE_RESPONSE)
     if not message:
+        slot.release()
         return Response({"error": "Message cannot be empty"}, status=400)
 
     # --- Get or create chat ---
-    if chat_id:
-        try:
-            chat = ChatSession.objects.get(id=chat_id, user=user)
-        except ChatSession.DoesNotExist:
-            return Response({"error": "Chat not found"}, status=404)
-    else:
-        message = request.data.get("message")
-        title = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        chat = ChatSession.objects.create(user=user, title=title)
+    chat = _get_or_create_chat(user, chat_id)
+    if chat is None:
+        slot.release()
+        return Response({"error": "Chat not found"}, status=404)
 
     # --- Build conversation history ---
-    history = []
-    for msg in chat.messages.all().order_by("created_at"):
-        if msg.content:
-            history.append({"sender": msg.sender, "content": msg.content})
-        elif msg.extra_data:
-            history.append({"sender": msg.sender, "content": str(msg.extra_data)})
-    history.append({"sender": "user", "content": message})
+    with trace.phase("history"):
+        history = build_history(chat, message)
 
     # --- Call AI ---
-    result = get_recipe_response(user_input=message, conversation_history=history)
-
-    # --- Save user message ---
-    ChatMessage.objects.create(
-        chat=chat, sender="user", message_type="conversation", content=message
-    )
-
-    # --- Save assistant message depending on type ---
-    if result.get("response_type") == "conversation":
-        ChatMessage.objects.create(
-            chat=chat,
-            sender="assistant",
-            message_type="conversation",
-            content=result["conversation_details"]["response"],
-        )
-    elif result.get("response_type") == "recipe":
-        if profile.recipe_generate > 2 and profile.is_subs is False :
-            return Response({"error":"You have already generated your free 3 recipe. Please upgrade your plan","error_type":"plan_update_message"})
-        # Recipe response
-        recipe_details = result.get("recipe_details", {})
-
-        # Extract ingredient names from the ingredients list
-        ingredient_items = []
-        for ingredient in recipe_details.get("ingredients", []):
-            # Extract the item name (e.g., from "3 ripe bananas, mashed" -> "bananas")
-            item = ingredient.split(" ")[
-                -1
-            ]  # Get the last word as the ingredient item (this is basic)
-            ingredient_items.append(
-                item.lower()
-            )  # You can enhance this logic as needed
-
-        # Create an Ai_model_logs record for the recipe
-        Ai_model_logs.objects.create(
-            email=user.email if user else None,  # Save the user's email if needed
-            title=recipe_details.get("title", "Recipe"),
-            overview=recipe_details.get("overview", ""),
-            rating=recipe_details.get("rating", "N/A"),
-            ingredients=recipe_details.get("ingredients", []),
-            ingredient_items=ingredient_items,  # Now populated with ingredient item names
-            instructions=recipe_details.get("instructions", ""),
-        )
-
-        # Save assistant message with recipe details
-        ChatMessage.objects.create(
-            chat=chat,
-            sender="assistant",
-            message_type="recipe",
-            extra_data=recipe_details,
-        )
-        profile.recipe_generate = int(profile.recipe_generate) + 1
-        profile.save()
-    elif result.get("response_type") == "error":
-        if profile.recipe_generate > 2 and profile.is_subs is False :
-            return Response({"error":"You have already generated your free 3 recipe. Please upgrade your plan","error_type":"plan_update_message"})
-        error_details = result.get("error_details", {})
-
-        # Create an error log in Ai_model_logs
-        Ai_model_logs.objects.create(
-            email=request.user.email,
-            title=error_details.get("title", "Error"),
-            overview=error_details.get("overview", ""),
-            rating="N/A",  # Error logs might not have a rating
-            ingredients=error_details.get("ingredients", []),
-            ingredient_items=error_details.get("ingredient_items", []),
-            instructions="",  # Error logs might not have instructions
-        )
+    try:
+        with trace.phase("llm"):
+            result = get_recipe_response(
+                user_input=message, conversation_history=history, trace=trace
+            )
+    except Exception:
+        slot.release()
+        raise
+    slot.settle(result)
 
-        # Save assistant message
-        ChatMessage.objects.create(
-            chat=chat,
-            sender="assistant",
-            message_type="error",
-            extra_data=error_details,
+    with trace.phase("persist"):
+        log = persist_turn(
+            user, profile, chat, message, result,
+            generation_reserved=slot.reserved, usage=trace.usage,
         )
-    else:
-        # fallback in case of unexpected AI response
-        ChatMessage.objects.create(
-            chat=chat,
-            sender="assistant",
-            message_type="error",
-            extra_data={"overview": "Unexpected AI response", "raw": result},
-        )
-
-    chat.save()  # updates updated_at
+    record_turn(trace, log)
 
     # return full structured response + chat id
     response_data = result
@@ -149,6 +143,120 @@ def send_message(request):
     return Response(response_data, status=200)
 
 
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@api_view(["POST"])
+def send_message_stream(request):
+    """Same contract as send_message, delivered as Server-Sent Events.
+
+    Emits a `chat` event with the session id, `partial` events carrying the
+    output object as it grows (title first, then ingredients, then
+    instructions), and a final `done` event with the send_message payload once
+    the turn has been saved.
+    """
+    trace = TurnTrace()
+    user = request.user
+    profile = user.profile
+    message = request.data.get("message")
+    chat_id = request.data.get("chat_id")
+
+    slot = reserve_generation_slot(profile)
+    if slot is None:
+        return Response(PLAN_UPDATE_RESPONSE)
+    if not message:
+        slot.release()
+        return Response({"error": "Message cannot be empty"}, status=400)
+
+    chat = _get_or_create_chat(user, chat_id)
+    if chat is None:
+        slot.release()
+        return Response({"error": "Chat not found"}, status=404)
+
+    with trace.phase("history"):
+        history = build_history(chat, message)
+
+    def event_stream():
+        settled = False
+        try:
+            yield _sse_event("chat", {"chat_id": chat.id})
+            result = {}
+            with trace.phase("llm"):
+                for event, payload in stream_recipe_response(
+                    user_input=message, conversation_history=history, trace=trace
+                ):
+                    if event == "partial":
+                        yield _sse_event("partial", payload)
+                    else:
+                        result = payload
+            slot.settle(result)
+            settled = True
+        finally:
+            # client went away (or the stream failed) before the turn completed
+            if not settled:
+                slot.release()
+
+        with trace.phase("persist"):
+            log = persist_turn(
+                user, profile, chat, message, result,
+                generation_reserved=slot.reserved, usage=trace.usage,
+            )
+        record_turn(trace, log)
+        result["chat_id"] = chat.id
+        yield _sse_event("done", result)
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # keep nginx from buffering the stream
+    return response
+
+
+@api_view(["POST"])
+def send_message_job(request):
+    """Same contract as send_message, without waiting for the model.
+
+    Queues the turn for the generation worker and answers 202 with a job id
+    straight away. The send_message payload is then read from get_message_job,
+    or POSTed to `callback_url` when its host is in CALLBACK_ALLOWED_HOSTS.
+    """
+    user = request.user
+    profile = user.profile
+    message = request.data.get("message")
+    chat_id = request.data.get("chat_id")
+    callback_url = request.data.get("callback_url") or ""
+    if callback_url and not callback_allowed(callback_url):
+        return Response({"error": "callback_url host is not allowed"}, status=400)
+
+    slot = reserve_generation_slot(profile)
+    if slot is None:
+        return Response(PLAN_UPDATE_RESPONSE)
+    if not message:
+        slot.release()
+        return Response({"error": "Message cannot be empty"}, status=400)
+
+    chat = _get_or_create_chat(user, chat_id)
+    if chat is None:
+        slot.release()
+        return Response({"error": "Chat not found"}, status=404)
+
+    job = enqueue_generation(user, chat, message, slot, callback_url)
+    return Response(job_payload(job), status=202)
+
+
+@api_view(["GET"])
+def get_message_job(request, job_id):
+    """Status of a queued send_message turn; `result` holds its payload once done"""
+    try:
+        job = GenerationJob.objects.get(id=job_id, user=request.user)
+    except GenerationJob.DoesNotExist:
+        return Response({"error": "Job not found"}, status=404)
+    response = Response(job_payload(job), status=200)
+    if job.status in PENDING:
+        response["Retry-After"] = "1"
+    return response
+
+
 @api_view(["GET"])
 def get_chat_messages(request, chat_id):
     """Return full conversation messages (with pagination if needed)"""
@@ -158,7 +266,8 @@ def get_chat_messages(request, chat_id):
     except ChatSession.DoesNotExist:
         return Response({"error": "Chat not found"}, status=404)
 
-    messages = chat.messages.all().order_by("created_at")
+    # messages of one turn are bulk-inserted and may share a timestamp
+    messages = chat.messages.select_related("recipe").order_by("created_at", "id")
     serializer = ChatMessageSerializer(messages, many=True)
     return Response(
         {"chat_id": chat.id, "title": chat.title, "messages": serializer.data},
@@ -166,6 +275,168 @@ def get_chat_messages(request, chat_id):
     )
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def search_recipes_view(request):
+    """Stored recipes matching ?q= (title, overview and instructions) and
+    containing every one of ?ingredients=chicken,rice; ?limit= and ?offset= page"""
+    query = request.query_params.get("q", "")
+    ingredients = [name for name in request.query_params.get("ingredients", "").split(",") if name.strip()]
+    if not query.strip() and not ingredients:
+        return Response({"error": "q or ingredients is required"}, status=400)
+    try:
+        limit = int(request.query_params.get("limit", 0)) or None
+        offset = max(int(request.query_params.get("offset", 0)), 0)
+    except ValueError:
+        return Response({"error": "limit and offset must be integers"}, status=400)
+    recipes = search_recipes(query, ingredients, limit=limit, offset=offset)
+    return Response({"results": RecipeSerializer(recipes, many=True).data}, status=200)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def pantry_recipes_view(request):
+    """Stored recipes ranked by how much of them ?ingredients=chicken,rice,onion
+    covers, with the ingredients still missing; ?min_coverage= (0-1) and ?limit="""
+    ingredients = [name for name in request.query_params.get("ingredients", "").split(",") if name.strip()]
+    if not ingredients:
+        return Response({"error": "ingredients is required"}, status=400)
+    try:
+        limit = int(request.query_params.get("limit", 0)) or None
+        min_coverage = request.query_params.get("min_coverage")
+        min_coverage = min(max(float(min_coverage), 0.0), 1.0) if min_coverage else None
+    except ValueError:
+        return Response({"error": "limit and min_coverage must be numbers"}, status=400)
+    matches = get_pantry_matcher().match(ingredients, limit=limit, min_coverage=min_coverage)
+    return Response(
+        {
+            "results": [
+                {**RecipeSerializer(match.recipe).data, "coverage": match.coverage, "missing": match.missing}
+                for match in matches
+            ]
+        },
+        status=200,
+    )
+
+
+def _jwt_user(request):
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return authenticated[0] if authenticated else None
+
+
+async def send_message_async(request):
+    """Async variant of send_message for the ASGI deployment.
+
+    DRF views are synchronous, so JWT authentication and body parsing happen
+    here; the model call is awaited and no worker thread is held while it runs.
+    """
+    if request.method != "POST":
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+    trace = TurnTrace()
+    user = await sync_to_async(_jwt_user)(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."}, status=401
+        )
+    try:
+        data = json.loads(request.body or b"{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+    profile = await UserProfile.objects.aget(user=user)
+    message = data.get("message")
+    chat_id = data.get("chat_id")
+
+    slot = await sync_to_async(reserve_generation_slot)(profile)
+    if slot is None:
+        return JsonResponse(PLAN_UPDATE_RESPONSE)
+    if not message:
+        await sync_to_async(slot.release)()
+        return JsonResponse({"error": "Message cannot be empty"}, status=400)
+
+    chat = await _aget_or_create_chat(user, chat_id)
+    if chat is None:
+        await sync_to_async(slot.release)()
+        return JsonResponse({"error": "Chat not found"}, status=404)
+
+    with trace.phase("history"):
+        history = await abuild_history(chat, message)
+    try:
+        with trace.phase("llm"):
+            result = await aget_recipe_response(
+                user_input=message, conversation_history=history, trace=trace
+            )
+    except Exception:
+        await sync_to_async(slot.release)()
+        raise
+    await sync_to_async(slot.settle)(result)
+
+    with trace.phase("persist"):
+        log = await sync_to_async(persist_turn)(
+            user, profile, chat, message, result,
+            generation_reserved=slot.reserved, usage=trace.usage,
+        )
+    await sync_to_async(record_turn)(trace, log)
+
+    response_data = result
+    response_data["chat_id"] = chat.id
+    return JsonResponse(response_data, status=200)
+
+
+# JWT-authenticated like the DRF views; csrf_exempt itself only wraps sync views on Django 4.2.
+send_message_async.csrf_exempt = True
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def response_cache_stats(request):
+    """Hit/miss counters of the recipe response cache, of in-flight call sharing
+    and of stored recipes offered for ingredient lists"""
+    return Response(
+        {**get_response_cache().stats(), "single_flight": single_flight_stats(), "pantry": pantry_stats()},
+        status=200,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def history_window_metrics(request):
+    """Prompt tokens sent and saved by the bounded history window"""
+    return Response(history_window_stats(), status=200)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def intent_router_metrics(request):
+    """Share of turns answered without the model and the latency that saved"""
+    return Response(intent_router_stats(), status=200)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def model_route_metrics(request):
+    """Calls, latency and token usage per model route, this worker's circuit breakers
+    and how many calls the rate limiter queued or shed"""
+    return Response(
+        {**ModelRouter().stats(), "breakers": breaker_states(), "rate_limit": rate_limit_stats()},
+        status=200,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def ai_usage_daily_metrics(request):
+    """Turns, tokens, cost and latency percentiles per day, from the aggregate tables"""
+    try:
+        days = min(max(int(request.query_params.get("days", 30)), 1), 366)
+    except ValueError:
+        return Response({"error": "days must be an integer"}, status=400)
+    return Response(ai_usage_daily_stats(days), status=200)
+
+
 class AiModelLogsListView(ListAPIView):
-    queryset = Ai_model_logs.objects.all()  # Retrieve all records
+    queryset = Ai_model_logs.objects.select_related("recipe")  # Retrieve all records
     serializer_class = AiModelLogsSerializer
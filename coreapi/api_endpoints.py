@@ -41,7 +41,14 @@ urlpatterns = [
     path('admin/profile/', admin_views.admin_profile_view, name='admin-profile'),
     #
     path("chats/list/", chat_views.list_chats, name="list-chats"),
+    path("chats/sessions/", chat_views.list_chat_sessions, name="list-chat-sessions"),
     path("chats/send_message/", chat_views.send_message, name="send-message"),
+    path("chats/send_message/stream/", chat_views.send_message_stream, name="send-message-stream"),
+    path("chats/send_message/async/", chat_views.send_message_async, name="send-message-async"),
+    path("chats/send_message/job/", chat_views.send_message_job, name="send-message-job"),
+    path("chats/jobs/<uuid:job_id>/", chat_views.get_message_job, name="message-job"),
+    path("chats/recipes/search/", chat_views.search_recipes_view, name="search-recipes"),
+    path("chats/recipes/pantry/", chat_views.pantry_recipes_view, name="pantry-recipes"),
     path('admin/user/subscription/<str:id>/update-status/', admin_views.update_subscription, name='update-subscription'),
     #
     path("make/subscribtion/payment/",subs_views.CreateStripeCheckoutSessionView.as_view(),name="subscribe"),
@@ -54,6 +61,11 @@ urlpatterns = [
     path('api/dashboard/', DashboardView.as_view(), name='dashboard'),
     #
     path('ai-model-logs/',chat_views.AiModelLogsListView.as_view(), name='ai_model_logs_list'),
+    path('admin/ai/response-cache/stats/', chat_views.response_cache_stats, name='response-cache-stats'),
+    path('admin/ai/history-window/stats/', chat_views.history_window_metrics, name='history-window-stats'),
+    path('admin/ai/intent-router/stats/', chat_views.intent_router_metrics, name='intent-router-stats'),
+    path('admin/ai/model-routes/stats/', chat_views.model_route_metrics, name='model-route-stats'),
+    path('admin/ai/usage/daily/', chat_views.ai_usage_daily_metrics, name='ai-usage-daily'),
 ]
 
 if settings.DEBUG: